@@ -0,0 +1,294 @@
+"""Startup calibration of torch threads, batch size and executor width
+
+The best intra-op thread count, batch size and number of concurrent
+forward passes differ between a 4-core pod and a 32-core batch node. With
+ML_AUTOTUNE on, the service benchmarks a small grid of these settings on
+synthetic inputs after loading the model and keeps the configuration with
+the highest throughput whose p95 batch latency fits the latency budget.
+
+The choice is stored in a JSON profile keyed by host shape (CPUs available
+to the process, CPU model, torch version, model version, backend and
+quantization), so later starts on the same shape reuse it instead of
+calibrating again.
+
+Inter-op threads are not swept: torch fixes that pool the first time it is
+used, and the forward pass doesn't use it. The profile records the value
+applied at startup, which can be edited there.
+"""
+
+import hashlib
+import json
+import logging
+import math
+import os
+import platform
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+SETTINGS = ("torch_threads", "interop_threads", "workers", "batch_size")
+
+
+def available_cpus() -> int:
+    """CPUs this process may use: its affinity mask, capped by a cgroup CPU quota"""
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = os.cpu_count() or 1
+    for quota_file, period_file in (
+        ("/sys/fs/cgroup/cpu.max", None),
+        ("/sys/fs/cgroup/cpu/cpu.cfs_quota_us", "/sys/fs/cgroup/cpu/cpu.cfs_period_us"),
+    ):
+        try:
+            with open(quota_file, encoding="utf-8") as f:
+                fields = f.read().split()
+            if period_file:
+                with open(period_file, encoding="utf-8") as f:
+                    fields.append(f.read().strip())
+            quota, period = fields[0], fields[1]
+            if quota not in ("max", "-1"):
+                cpus = min(cpus, max(1, math.ceil(int(quota) / int(period))))
+            break
+        except (OSError, IndexError, ValueError):
+            continue
+    return cpus
+
+
+def cpu_model() -> str:
+    try:
+        with open("/proc/cpuinfo", encoding="utf-8") as f:
+            for line in f:
+                if line.startswith("model name"):
+                    return line.split(":", 1)[1].strip()
+    except OSError:
+        pass
+    return platform.processor() or platform.machine()
+
+
+def host_shape(model_version: str, backend: str, quantization: str) -> Dict[str, Any]:
+    """What the tuned settings depend on"""
+    import torch
+
+    return {
+        "cpus": available_cpus(),
+        "cpu_model": cpu_model(),
+        "torch": torch.__version__,
+        "model_version": model_version,
+        "backend": backend,
+        "quantization": quantization,
+    }
+
+
+def shape_key(shape: Dict[str, Any]) -> str:
+    return hashlib.sha1(json.dumps(shape, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+
+
+def candidate_grid(cpus: int, batch_sizes: List[int], fixed: Dict[str, int]) -> List[Dict[str, int]]:
+    """(workers, torch_threads, batch_size) combinations worth trying on ``cpus`` cores
+
+    Workers go up in powers of two; each gets either its full share of the
+    cores or half of it. Settings in ``fixed`` are not varied.
+    """
+    if "workers" in fixed:
+        worker_counts = [fixed["workers"]]
+    else:
+        worker_counts = [2 ** i for i in range(int(math.log2(cpus)) + 1)]
+    batch_sizes = [fixed["batch_size"]] if "batch_size" in fixed else sorted(set(batch_sizes))
+
+    grid = []
+    for workers in worker_counts:
+        share = max(1, cpus // workers)
+        thread_counts = [fixed["torch_threads"]] if "torch_threads" in fixed else sorted({share, max(1, share // 2)})
+        for threads in reversed(thread_counts):
+            for batch_size in batch_sizes:
+                grid.append({"workers": workers, "torch_threads": threads, "batch_size": batch_size})
+    return grid
+
+
+def run_trial(predict_batch: Callable[[List[str]], Any], texts: List[str], workers: int,
+              torch_threads: int, batch_size: int, seconds: float) -> Dict[str, Any]:
+    """Run ``workers`` threads calling the model back to back on ``batch_size`` texts"""
+    import torch
+
+    torch.set_num_threads(torch_threads)
+    batch = texts[:batch_size]
+    predict_batch(batch)
+
+    deadline = time.perf_counter() + seconds
+
+    def worker(_):
+        latencies = []
+        while len(latencies) < 2 or time.perf_counter() < deadline:
+            start = time.perf_counter()
+            predict_batch(batch)
+            latencies.append(time.perf_counter() - start)
+        return latencies
+
+    # Fresh threads: torch applies the intra-op setting to a thread on its first parallel op
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="autotune") as pool:
+        latencies = sorted(latency for own in pool.map(worker, range(workers)) for latency in own)
+    elapsed = time.perf_counter() - started
+
+    return {
+        "workers": workers,
+        "torch_threads": torch_threads,
+        "batch_size": batch_size,
+        "calls": len(latencies),
+        "texts_per_second": round(len(latencies) * len(batch) / elapsed, 2),
+        "p50_ms": round(latencies[max(0, math.ceil(len(latencies) * 0.5) - 1)] * 1000, 2),
+        "p95_ms": round(latencies[max(0, math.ceil(len(latencies) * 0.95) - 1)] * 1000, 2),
+    }
+
+
+class Autotuner:
+    """Chooses and remembers per-host settings for the inference path
+
+    ``fixed`` holds settings the operator set explicitly; they are kept as
+    given and only the rest are tuned.
+    """
+
+    def __init__(self, profile_path: str, latency_budget_ms: float = 250.0,
+                 batch_sizes: Optional[List[int]] = None, trial_seconds: float = 1.0,
+                 fixed: Optional[Dict[str, int]] = None, interop_threads: int = 1):
+        self.profile_path = profile_path
+        self.latency_budget_ms = latency_budget_ms
+        self.batch_sizes = [size for size in (batch_sizes or [4, 8, 16, 32]) if size > 0]
+        self.trial_seconds = trial_seconds
+        self.fixed = dict(fixed or {})
+        self.interop_threads = interop_threads
+        self.shape: Optional[Dict[str, Any]] = None
+        self.settings: Optional[Dict[str, Any]] = None
+        self.source: Optional[str] = None
+        self.trials: List[Dict[str, Any]] = []
+        self.seconds = 0.0
+
+    def _load_profiles(self) -> Dict[str, Any]:
+        try:
+            with open(self.profile_path, encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable autotune profile {self.profile_path}: {e}")
+            return {}
+
+    def _save_profile(self, key: str, profile: Dict[str, Any]):
+        profiles = self._load_profiles()
+        profiles[key] = profile
+        tmp_path = f"{self.profile_path}.tmp"
+        try:
+            directory = os.path.dirname(self.profile_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(profiles, f, indent=2, sort_keys=True)
+                f.write("\n")
+            os.replace(tmp_path, self.profile_path)
+        except OSError as e:
+            logger.warning(f"Could not save autotune profile to {self.profile_path}: {e}")
+
+    def lookup(self, shape: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Stored settings for this host shape, with explicitly set values taking precedence"""
+        self.shape = shape
+        profile = self._load_profiles().get(shape_key(shape))
+        if not profile:
+            return None
+        settings = {name: profile["settings"][name] for name in SETTINGS if name in profile["settings"]}
+        if set(settings) != set(SETTINGS):
+            return None
+        settings.update(self.fixed)
+        self.settings, self.source = settings, "profile"
+        self.trials = profile.get("trials", [])
+        logger.info(f"Autotune: using stored settings for this host shape ({self.describe()})")
+        return settings
+
+    def calibrate(self, predict_batch: Callable[[List[str]], Any], texts: List[str],
+                  shape: Dict[str, Any]) -> Dict[str, Any]:
+        """Benchmark the grid, pick the fastest configuration within budget and store it
+
+        ``texts`` must hold at least as many texts as the largest batch size.
+        For each (workers, threads) pair batch sizes are tried in increasing
+        order, stopping at the first one over the latency budget.
+        """
+        self.shape = shape
+        started = time.perf_counter()
+        grid = candidate_grid(shape["cpus"], self.batch_sizes, self.fixed)
+        logger.info(f"Autotune: calibrating {len(grid)} configurations on {shape['cpus']} CPUs...")
+
+        trials = []
+        over_budget = set()
+        for candidate in grid:
+            pair = (candidate["workers"], candidate["torch_threads"])
+            if pair in over_budget:
+                continue
+            trial = run_trial(predict_batch, texts, seconds=self.trial_seconds, **candidate)
+            trials.append(trial)
+            logger.info(
+                f"Autotune: workers={trial['workers']} threads={trial['torch_threads']} "
+                f"batch={trial['batch_size']}: {trial['texts_per_second']:.1f} texts/s, "
+                f"p95 {trial['p95_ms']:.1f}ms"
+            )
+            if trial["p95_ms"] > self.latency_budget_ms:
+                over_budget.add(pair)
+
+        within_budget = [trial for trial in trials if trial["p95_ms"] <= self.latency_budget_ms]
+        if within_budget:
+            best = max(within_budget, key=lambda trial: trial["texts_per_second"])
+        else:
+            best = min(trials, key=lambda trial: trial["p95_ms"])
+            logger.warning(
+                f"Autotune: no configuration meets the {self.latency_budget_ms:.0f}ms budget; "
+                f"using the lowest-latency one"
+            )
+
+        self.settings = {
+            "torch_threads": best["torch_threads"],
+            "interop_threads": self.interop_threads,
+            "workers": best["workers"],
+            "batch_size": best["batch_size"],
+        }
+        self.source = "calibrated"
+        self.trials = trials
+        self.seconds = round(time.perf_counter() - started, 3)
+        self._save_profile(shape_key(shape), {
+            "shape": shape,
+            "settings": self.settings,
+            "latency_budget_ms": self.latency_budget_ms,
+            "calibrated_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "trials": trials,
+        })
+        logger.info(f"Autotune: chose {self.describe()} after {self.seconds:.1f}s")
+        return self.settings
+
+    def best_trial(self) -> Optional[Dict[str, Any]]:
+        """The trial measured for the chosen settings, if any"""
+        if self.settings is None:
+            return None
+        for trial in self.trials:
+            if all(trial[name] == self.settings[name] for name in ("workers", "torch_threads", "batch_size")):
+                return trial
+        return None
+
+    def describe(self) -> str:
+        settings = ", ".join(f"{name}={self.settings[name]}" for name in SETTINGS)
+        trial = self.best_trial()
+        if trial:
+            settings += f"; {trial['texts_per_second']:.1f} texts/s at p95 {trial['p95_ms']:.1f}ms"
+        return settings
+
+    def stats(self) -> Dict[str, Any]:
+        """Report the chosen settings, where they came from and the measured grid"""
+        return {
+            "settings": self.settings,
+            "source": self.source,
+            "shape": self.shape,
+            "shape_key": shape_key(self.shape) if self.shape else None,
+            "latency_budget_ms": self.latency_budget_ms,
+            "fixed": self.fixed,
+            "calibration_seconds": self.seconds,
+            "profile_path": self.profile_path,
+            "trials": self.trials,
+        }
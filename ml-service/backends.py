@@ -0,0 +1,189 @@
+import inspect
+import json
+import logging
+import os
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import torch
+
+logger = logging.getLogger(__name__)
+
+BACKENDS = ("eager", "torchscript", "onnx")
+
+
+def artifact_key(model_source: str, model_version: str, quantization: str) -> Dict[str, str]:
+    """What a converted model artifact was built from"""
+    return {"model_source": model_source, "model_version": model_version, "quantization": quantization or "none"}
+
+
+def artifact_is_current(path: str, key: Optional[Dict[str, str]]) -> bool:
+    """Whether ``path`` exists and its sidecar says it was built from ``key``
+
+    Artifacts without a sidecar (or with another key) are stale: a changed
+    model path, version or quantization must not keep serving an old graph.
+    """
+    if not os.path.exists(path):
+        return False
+    if key is None:
+        return True
+    try:
+        with open(f"{path}.json", encoding="utf-8") as f:
+            return json.load(f) == key
+    except (OSError, ValueError):
+        return False
+
+
+def record_artifact(path: str, key: Optional[Dict[str, str]]):
+    """Write the sidecar that marks ``path`` as built from ``key``"""
+    if key is None:
+        return
+    with open(f"{path}.json", "w", encoding="utf-8") as f:
+        json.dump(key, f, sort_keys=True)
+        f.write("\n")
+
+
+def ensure_parent(path: str):
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+
+class InferenceBackend:
+    """Runs a padded batch of token ids through the classifier
+
+    Every backend takes the same padded tensors produced by the shared
+    tokenizer path and returns raw logits as a (batch, num_labels) array;
+    softmax and result formatting happen once, outside the backend.
+    """
+
+    name = "base"
+
+    def logits(self, inputs: Dict[str, torch.Tensor]) -> np.ndarray:
+        raise NotImplementedError
+
+
+class EagerBackend(InferenceBackend):
+    """Plain PyTorch forward pass"""
+
+    name = "eager"
+
+    def __init__(self, model):
+        self.model = model
+
+    def logits(self, inputs: Dict[str, torch.Tensor]) -> np.ndarray:
+        with torch.no_grad():
+            return self.model(**inputs).logits.numpy()
+
+
+class _LogitsOnly(torch.nn.Module):
+    """Positional-argument wrapper so the model can be traced or exported"""
+
+    def __init__(self, model, input_names: List[str]):
+        super().__init__()
+        self.model = model
+        self.input_names = input_names
+
+    def forward(self, *args):
+        outputs = self.model(**dict(zip(self.input_names, args)), return_dict=False)
+        return outputs[0]
+
+
+def example_inputs(tokenizer) -> Tuple[List[str], Tuple[torch.Tensor, ...]]:
+    """Input names and a small padded batch to trace or export with"""
+    encoded = tokenizer(
+        ["Your account has been suspended", "Hello, see you at the appointment tomorrow"],
+        return_tensors="pt",
+        padding=True
+    )
+    names = list(encoded.keys())
+    return names, tuple(encoded[name] for name in names)
+
+
+class TorchScriptBackend(InferenceBackend):
+    """Traced and frozen TorchScript graph of the model"""
+
+    name = "torchscript"
+
+    def __init__(self, model, tokenizer, path: str = "", key: Optional[Dict[str, str]] = None):
+        self.input_names, example = example_inputs(tokenizer)
+
+        if path and artifact_is_current(path, key):
+            logger.info(f"Loading TorchScript graph from {path}")
+            self.graph = torch.jit.load(path)
+        else:
+            with torch.no_grad():
+                traced = torch.jit.trace(_LogitsOnly(model, self.input_names).eval(), example, check_trace=False)
+            try:
+                traced = torch.jit.optimize_for_inference(torch.jit.freeze(traced))
+            except Exception as e:
+                # Some modules (e.g. quantized ones) can't be frozen; the plain trace still works
+                logger.warning(f"TorchScript freeze skipped: {e}")
+            self.graph = traced
+            if path:
+                ensure_parent(path)
+                torch.jit.save(self.graph, path)
+                record_artifact(path, key)
+                logger.info(f"Saved TorchScript graph to {path}")
+
+    def logits(self, inputs: Dict[str, torch.Tensor]) -> np.ndarray:
+        with torch.no_grad():
+            return self.graph(*(inputs[name] for name in self.input_names)).numpy()
+
+
+def export_onnx(model, tokenizer, path: str, key: Optional[Dict[str, str]] = None):
+    """Export the model to ONNX with dynamic batch and sequence axes"""
+    ensure_parent(path)
+    names, example = example_inputs(tokenizer)
+    dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in names}
+    dynamic_axes["logits"] = {0: "batch"}
+    # Newer torch defaults to the dynamo exporter, which ignores dynamic_axes
+    extra = {"dynamo": False} if "dynamo" in inspect.signature(torch.onnx.export).parameters else {}
+    with torch.no_grad():
+        torch.onnx.export(
+            _LogitsOnly(model, names).eval(),
+            example,
+            path,
+            input_names=names,
+            output_names=["logits"],
+            dynamic_axes=dynamic_axes,
+            opset_version=17,
+            **extra
+        )
+    record_artifact(path, key)
+    logger.info(f"Exported ONNX model to {path}")
+
+
+class OnnxBackend(InferenceBackend):
+    """ONNX Runtime session on the CPU execution provider"""
+
+    name = "onnx"
+
+    def __init__(self, path: str, intra_op_threads: int = 0):
+        try:
+            import onnxruntime as ort
+        except ImportError:
+            raise RuntimeError("ML_BACKEND=onnx requires the onnxruntime package")
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if intra_op_threads > 0:
+            options.intra_op_num_threads = intra_op_threads
+        self.session = ort.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+        self.input_names = [i.name for i in self.session.get_inputs()]
+
+    def logits(self, inputs: Dict[str, torch.Tensor]) -> np.ndarray:
+        feed = {name: inputs[name].numpy() for name in self.input_names}
+        return self.session.run(["logits"], feed)[0]
+
+
+def quantize_onnx(path: str, key: Optional[Dict[str, str]] = None) -> str:
+    """Write an int8 dynamically-quantized copy of an ONNX model next to it"""
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    quantized_path = path.replace(".onnx", "") + ".int8.onnx"
+    if not artifact_is_current(quantized_path, key):
+        quantize_dynamic(path, quantized_path, weight_type=QuantType.QInt8)
+        record_artifact(quantized_path, key)
+        logger.info(f"Wrote int8 ONNX model to {quantized_path}")
+    return quantized_path
@@ -0,0 +1,207 @@
+import asyncio
+import logging
+import time
+from collections import Counter
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import timing
+from executor import InferenceExecutor, InferenceOverloaded
+from metrics import QUEUE_WAIT_SECONDS
+
+logger = logging.getLogger(__name__)
+
+QUEUE_WAIT = QUEUE_WAIT_SECONDS.labels("batcher")
+
+
+class MicroBatcher:
+    """Collect concurrent prediction requests into batched model calls
+
+    Requests are queued and a single worker task drains the queue, forming a
+    batch once either ``max_batch_size`` texts are waiting or ``max_wait_ms``
+    has passed since the first text of the batch arrived. Batches run on the
+    given executor, one per executor worker; while all workers are busy the
+    queue keeps filling, so the next batch is larger.
+    """
+
+    def __init__(
+        self,
+        predict_batch: Callable[[List[str]], List[Dict[str, Any]]],
+        max_batch_size: int = 16,
+        max_wait_ms: float = 5.0,
+        executor: Optional[InferenceExecutor] = None,
+        max_queue_size: int = 0,
+    ):
+        self.predict_batch = predict_batch
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000.0
+        self.executor = executor
+        self.max_queue_size = max(0, max_queue_size)
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._slot_count = 0
+        self._retired_slots = 0
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._in_flight = set()
+        self._batch_sizes: Counter = Counter()
+
+    async def start(self):
+        """Start the background batching worker"""
+        if self._worker is not None:
+            return
+        self._queue = asyncio.Queue(maxsize=self.max_queue_size)
+        self._slot_count = self.executor.max_workers if self.executor else 1
+        self._slots = asyncio.Semaphore(self._slot_count)
+        self._loop = asyncio.get_running_loop()
+        self._worker = asyncio.create_task(self._run())
+        logger.info(
+            f"Micro-batching started (max_batch_size={self.max_batch_size}, "
+            f"max_wait_ms={self.max_wait * 1000:.1f})"
+        )
+
+    async def stop(self):
+        """Stop the worker and fail any requests still waiting"""
+        if self._worker is None:
+            return
+        self._worker.cancel()
+        try:
+            await self._worker
+        except asyncio.CancelledError:
+            pass
+        self._worker = None
+        for task in list(self._in_flight):
+            task.cancel()
+        while not self._queue.empty():
+            _, future, _, _ = self._queue.get_nowait()
+            if not future.done():
+                future.set_exception(RuntimeError("Batcher stopped"))
+
+    def resize(self, max_batch_size: int, max_workers: int):
+        """Change the batch size and how many batches run at once; safe to call from any thread"""
+        self.max_batch_size = max(1, max_batch_size)
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._resize_slots, max(1, max_workers))
+
+    def _resize_slots(self, slots: int):
+        change = slots - self._slot_count
+        self._slot_count = slots
+        for _ in range(max(0, change)):
+            self._slots.release()
+        # Slots can't be taken back while batches hold them; drop them as they come back
+        self._retired_slots += max(0, -change)
+
+    def _release_slot(self):
+        if self._retired_slots:
+            self._retired_slots -= 1
+        else:
+            self._slots.release()
+
+    async def submit(self, text: str) -> Dict[str, Any]:
+        """Queue a text for prediction and wait for its result"""
+        if self._worker is None:
+            raise RuntimeError("Batcher not started")
+        future = asyncio.get_running_loop().create_future()
+        try:
+            self._queue.put_nowait((text, future, time.perf_counter(), timing.current()))
+        except asyncio.QueueFull:
+            raise InferenceOverloaded(f"Batch queue full ({self.max_queue_size} waiting)")
+        return await future
+
+    async def _collect(self) -> List[Tuple[str, asyncio.Future, float, Tuple[timing.RequestTiming, ...]]]:
+        """Wait for the first request, then fill the batch until full or timed out"""
+        batch = [await self._queue.get()]
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.max_wait
+
+        while len(batch) < self.max_batch_size:
+            # Take whatever is already queued before waiting on the clock
+            if not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+                continue
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+
+        return batch
+
+    async def _run(self):
+        """Worker loop: wait for a free executor slot, then form and dispatch a batch"""
+        while True:
+            await self._slots.acquire()
+            try:
+                batch = await self._collect()
+            except BaseException:
+                self._release_slot()
+                raise
+
+            # Callers that gave up (e.g. client disconnected) are dropped
+            formed = time.perf_counter()
+            live = []
+            timings = []
+            for text, future, enqueued, request_timings in batch:
+                if not future.cancelled():
+                    QUEUE_WAIT.observe(formed - enqueued)
+                    for request_timing in request_timings:
+                        request_timing.add("queue", formed - enqueued)
+                    timings.extend(request_timings)
+                    live.append((text, future))
+            batch = live
+            if not batch:
+                self._release_slot()
+                continue
+
+            self._batch_sizes[len(batch)] += 1
+            task = asyncio.create_task(self._dispatch(batch, timings))
+            self._in_flight.add(task)
+            task.add_done_callback(self._in_flight.discard)
+
+    async def _dispatch(self, batch: List[Tuple[str, asyncio.Future]], timings: List[timing.RequestTiming]):
+        """Run one batch and resolve each caller's future"""
+        # The model call's stages count towards every request in the batch
+        timing.bind(timings)
+        try:
+            texts = [text for text, _ in batch]
+            try:
+                results = await self._execute(texts)
+            except asyncio.CancelledError:
+                # stop() cancels batches in flight; their callers must not wait forever
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(RuntimeError("Batcher stopped"))
+                raise
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                return
+
+            for (_, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+        finally:
+            self._release_slot()
+
+    async def _execute(self, texts: List[str]) -> List[Dict[str, Any]]:
+        """Run the batch prediction function, on the executor when one is set"""
+        if self.executor is not None:
+            return await self.executor.run(self.predict_batch, texts)
+        return self.predict_batch(texts)
+
+    def stats(self) -> Dict[str, Any]:
+        """Report the batch sizes formed so far"""
+        batches = sum(self._batch_sizes.values())
+        items = sum(size * count for size, count in self._batch_sizes.items())
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000,
+            "batches": batches,
+            "requests": items,
+            "mean_batch_size": items / batches if batches else 0.0,
+            "batch_size_counts": {str(size): count for size, count in sorted(self._batch_sizes.items())},
+            "queue_depth": self._queue.qsize() if self._queue is not None else 0,
+            "batches_in_flight": len(self._in_flight),
+        }
@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+"""
+Microbenchmarks for the scoring paths, with a JSON baseline for regressions
+
+Times three things across SMS, email and long-paste inputs:
+
+- simple/<length>: predict_fraud_simple on one text
+- tokenize/<length>/b<batch>: the tokenizer call predict_fraud_batch makes
+- predict/<length>/b<batch>: predict_fraud_batch end to end (tokenize,
+  padding, forward pass, postprocessing)
+
+Each case reports the median and p90 time per call. --save-baseline writes
+the results as JSON; --baseline compares a run against such a file and
+exits with status 1 when a case's median is slower than the baseline by
+more than --threshold. Baselines only compare like with like: the model,
+torch version and CPU count are recorded and a mismatch is reported.
+
+--tiny swaps in a randomly initialized 2-layer BERT with a small
+WordPiece vocabulary built on the fly, so the suite runs in seconds on any
+CPU box without downloading anything.
+"""
+
+import argparse
+import json
+import os
+import platform
+import re
+import statistics
+import sys
+import tempfile
+import time
+from typing import Any, Callable, Dict, List
+
+from load_test import LEGIT_MESSAGES, SCAM_MESSAGES, MessageGenerator
+
+# Approximate character counts for each input class
+TEXT_LENGTHS = {
+    "sms": 160,
+    "email": 1500,
+    "long": 12000,
+}
+
+
+def make_texts(length: str, count: int, seed: int = 0) -> List[str]:
+    """``count`` distinct texts of roughly TEXT_LENGTHS[length] characters"""
+    generator = MessageGenerator(seed=seed, synthetic_ratio=1.0)
+    target = TEXT_LENGTHS[length]
+    texts = []
+    for i in range(count):
+        # Distinct prefixes keep predict_fraud_batch from deduplicating the batch
+        parts = [f"{i}."]
+        while sum(len(part) + 1 for part in parts) < target:
+            parts.append(generator.message())
+        texts.append(" ".join(parts)[:target])
+    return texts
+
+
+def build_tiny_model(seed: int = 0):
+    """Randomly initialized small BERT plus a WordPiece tokenizer over a generated vocabulary"""
+    import torch
+    from transformers import BertConfig, BertForSequenceClassification, BertTokenizerFast
+
+    words = set()
+    generator = MessageGenerator(seed=seed, synthetic_ratio=1.0)
+    for text in [generator.message() for _ in range(500)] + SCAM_MESSAGES + LEGIT_MESSAGES:
+        words.update(re.findall(r"[a-z]+", text.lower()))
+    characters = [chr(c) for c in range(ord("a"), ord("z") + 1)] + list("0123456789")
+    vocab = (
+        ["[PAD]", "[UNK]", "[CLS]", "[SEP]", "[MASK]"]
+        + list("!\"#$%&'()*+,-./:;<=>?@[\\]^_`{|}~")
+        + characters
+        + [f"##{c}" for c in characters]
+        + sorted(words - set(characters))
+    )
+
+    with tempfile.TemporaryDirectory() as directory:
+        vocab_file = os.path.join(directory, "vocab.txt")
+        with open(vocab_file, "w", encoding="utf-8") as f:
+            f.write("\n".join(vocab) + "\n")
+        tokenizer = BertTokenizerFast(vocab_file=vocab_file, do_lower_case=True)
+
+    torch.manual_seed(seed)
+    config = BertConfig(
+        vocab_size=len(vocab),
+        hidden_size=128,
+        num_hidden_layers=2,
+        num_attention_heads=2,
+        intermediate_size=512,
+        max_position_embeddings=512,
+        num_labels=3,
+    )
+    return BertForSequenceClassification(config).eval(), tokenizer
+
+
+def load_service(tiny: bool):
+    """Import the service and load either the tiny model or the configured one"""
+    import main as service
+    from backends import EagerBackend
+    from executor import configure_torch_threads
+
+    configure_torch_threads(service.INFERENCE_WORKERS, service.TORCH_THREADS)
+    if tiny:
+        model, tokenizer = build_tiny_model()
+        service.activate_model(service.LoadedModel("tiny", EagerBackend(model), tokenizer, model))
+    else:
+        service.load_model()
+    return service
+
+
+def time_case(fn: Callable[[], Any], min_time: float, min_runs: int, warmup: int) -> Dict[str, float]:
+    """Run ``fn`` until both ``min_time`` seconds and ``min_runs`` calls have passed"""
+    for _ in range(warmup):
+        fn()
+    samples = []
+    started = time.perf_counter()
+    while len(samples) < min_runs or time.perf_counter() - started < min_time:
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    samples.sort()
+    return {
+        "median_ms": round(statistics.median(samples) * 1000, 4),
+        "p90_ms": round(samples[min(len(samples) - 1, int(len(samples) * 0.9))] * 1000, 4),
+        "runs": len(samples),
+    }
+
+
+def run_suite(service, lengths: List[str], batch_sizes: List[int], pattern: str,
+              min_time: float, min_runs: int, warmup: int) -> Dict[str, Dict[str, float]]:
+    from main_simple import predict_fraud_simple
+
+    def tokenize(texts):
+        return service.active_model.tokenizer(
+            [service.clip_text(text) for text in texts],
+            truncation=True,
+            max_length=service.MAX_TOKENS,
+            stride=service.WINDOW_OVERLAP if service.LONG_TEXT_WINDOWS else 0,
+            return_overflowing_tokens=service.LONG_TEXT_WINDOWS,
+        )
+
+    cases = {}
+    for length in lengths:
+        text = make_texts(length, 1)[0]
+        cases[f"simple/{length}"] = lambda text=text: predict_fraud_simple(text)
+        for batch_size in batch_sizes:
+            texts = make_texts(length, batch_size)
+            cases[f"tokenize/{length}/b{batch_size}"] = lambda texts=texts: tokenize(texts)
+            cases[f"predict/{length}/b{batch_size}"] = lambda texts=texts: service.predict_fraud_batch(texts)
+
+    results = {}
+    for name, fn in cases.items():
+        if pattern and not re.search(pattern, name):
+            continue
+        results[name] = time_case(fn, min_time, min_runs, warmup)
+        print(f"  {name:<24} median {results[name]['median_ms']:>10.3f}ms   "
+              f"p90 {results[name]['p90_ms']:>10.3f}ms   ({results[name]['runs']} runs)")
+    return results
+
+
+def environment(tiny: bool, service) -> Dict[str, Any]:
+    import torch
+
+    return {
+        "model": "tiny" if tiny else service.MODEL_SOURCE,
+        "backend": "eager" if tiny else service.BACKEND,
+        "quantization": "" if tiny else service.QUANTIZATION,
+        "pipeline": service.PIPELINE_ENABLED,
+        "torch": torch.__version__,
+        "torch_threads": torch.get_num_threads(),
+        "cpu_count": os.cpu_count(),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+    }
+
+
+def compare(results: Dict[str, Dict[str, float]], baseline: Dict[str, Any], threshold: float) -> List[str]:
+    """Print each case against the baseline and return the names of regressed cases"""
+    regressions = []
+    print(f"\n📈 Compared with baseline (threshold +{threshold:.0%})")
+    print("=" * 60)
+    for name, result in results.items():
+        before = baseline["results"].get(name)
+        if before is None:
+            print(f"  {name:<24} (not in baseline)")
+            continue
+        change = result["median_ms"] / before["median_ms"] - 1 if before["median_ms"] else 0.0
+        regressed = change > threshold
+        marker = "❌" if regressed else "✅"
+        print(f"  {marker} {name:<24} {before['median_ms']:>10.3f}ms -> {result['median_ms']:>10.3f}ms  ({change:+.1%})")
+        if regressed:
+            regressions.append(name)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tiny", action="store_true", help="Use a random 2-layer BERT (no download)")
+    parser.add_argument("--lengths", default="sms,email,long", help="Comma-separated subset of sms,email,long")
+    parser.add_argument("--batch-sizes", default="1,8,32", help="Comma-separated batch sizes for tokenize/predict")
+    parser.add_argument("--filter", default="", help="Only run cases whose name matches this regex")
+    parser.add_argument("--min-time", type=float, default=1.0, help="Minimum seconds per case")
+    parser.add_argument("--min-runs", type=int, default=5, help="Minimum calls per case")
+    parser.add_argument("--warmup", type=int, default=2, help="Untimed calls before each case")
+    parser.add_argument("--baseline", help="Compare against this baseline JSON")
+    parser.add_argument("--threshold", type=float, default=0.15,
+                        help="Allowed median slowdown vs. the baseline (0.15 = 15%%)")
+    parser.add_argument("--save-baseline", help="Write this run's results to a baseline JSON")
+    args = parser.parse_args()
+
+    lengths = [length for length in args.lengths.split(",") if length]
+    unknown = set(lengths) - set(TEXT_LENGTHS)
+    if unknown:
+        parser.error(f"Unknown lengths: {', '.join(sorted(unknown))}")
+    batch_sizes = [int(size) for size in args.batch_sizes.split(",") if size]
+
+    print(f"🚀 Loading {'tiny random' if args.tiny else 'configured'} model...")
+    service = load_service(args.tiny)
+    env = environment(args.tiny, service)
+    print(f"⏱️  Running benchmarks ({env['model']}, torch {env['torch']}, {env['torch_threads']} threads)")
+    results = run_suite(service, lengths, batch_sizes, args.filter, args.min_time, args.min_runs, args.warmup)
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w", encoding="utf-8") as f:
+            json.dump({"environment": env, "results": results}, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"\n💾 Baseline saved to {args.save_baseline}")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        mismatched = {
+            key: (baseline["environment"].get(key), value)
+            for key, value in env.items() if baseline["environment"].get(key) != value
+        }
+        for key, (before, now) in mismatched.items():
+            print(f"⚠️  Baseline {key} was {before}, now {now}; timings may not be comparable")
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"\n❌ {len(regressions)} regression(s): {', '.join(regressions)}")
+            sys.exit(1)
+        print("\n✅ No regressions")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class PredictionCache:
+    """Bounded LRU cache of prediction results with TTL and request coalescing
+
+    Entries are keyed by a SHA-256 of the model version and the message text,
+    so the text itself is never kept in memory or written to disk. Concurrent
+    lookups of the same missing key share a single computation.
+    """
+
+    def __init__(self, max_entries: int = 100_000, ttl_seconds: float = 3600.0):
+        self.max_entries = max(1, max_entries)
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    @staticmethod
+    def make_key(text: str, model_version: str) -> str:
+        """Strong hash of the model version and text"""
+        digest = hashlib.sha256()
+        digest.update(model_version.encode("utf-8"))
+        digest.update(b"\0")
+        digest.update(text.encode("utf-8"))
+        return digest.hexdigest()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Return a fresh cached result and mark it most recently used"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at <= time.time():
+            del self._entries[key]
+            self.expirations += 1
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def put(self, key: str, value: Dict[str, Any]):
+        """Store a result, evicting the least recently used entries if full"""
+        self._entries[key] = (time.time() + self.ttl_seconds, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    async def get_or_compute(
+        self,
+        text: str,
+        model_version: str,
+        compute: Callable[[str], Awaitable[Dict[str, Any]]],
+    ) -> Dict[str, Any]:
+        """Return the cached result or compute it once for all concurrent callers"""
+        key = self.make_key(text, model_version)
+        while True:
+            value = self.get(key)
+            if value is not None:
+                self.hits += 1
+                return value
+
+            inflight = self._inflight.get(key)
+            if inflight is None:
+                break
+            self.coalesced += 1
+            try:
+                return await asyncio.shield(inflight)
+            except asyncio.CancelledError:
+                # The caller doing the work went away; take over from it
+                if inflight.cancelled():
+                    continue
+                raise
+
+        self.misses += 1
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            value = await compute(text)
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Nobody else may be waiting; avoid "exception never retrieved"
+            future.exception()
+            raise
+        else:
+            self.put(key, value)
+            future.set_result(value)
+            return value
+        finally:
+            self._inflight.pop(key, None)
+
+    def lookup_many(self, texts: List[str], model_version: str) -> Tuple[List[Optional[Dict[str, Any]]], List[str]]:
+        """Look up several texts; returns per-text results (None on miss) and their keys"""
+        keys = [self.make_key(text, model_version) for text in texts]
+        results = []
+        for key in keys:
+            value = self.get(key)
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            results.append(value)
+        return results, keys
+
+    def clear(self):
+        """Drop every entry"""
+        self._entries.clear()
+
+    def save(self, path: str):
+        """Snapshot unexpired entries to disk (written atomically)"""
+        now = time.time()
+        entries = [[key, expires_at, value] for key, (expires_at, value) in self._entries.items() if expires_at > now]
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"version": 1, "entries": entries}, f)
+        os.replace(tmp_path, path)
+        logger.info(f"Saved {len(entries)} cache entries to {path}")
+
+    def load(self, path: str) -> int:
+        """Restore entries from a snapshot, skipping expired ones"""
+        if not os.path.exists(path):
+            return 0
+        try:
+            with open(path) as f:
+                snapshot = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable cache snapshot {path}: {e}")
+            return 0
+
+        now = time.time()
+        loaded = 0
+        # Snapshot is in LRU order, so replaying it keeps recency intact
+        for key, expires_at, value in snapshot.get("entries", []):
+            if expires_at > now:
+                self._entries[key] = (expires_at, value)
+                loaded += 1
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        logger.info(f"Loaded {loaded} cache entries from {path}")
+        return loaded
+
+    def stats(self) -> Dict[str, Any]:
+        """Report size and hit/miss/eviction counters"""
+        lookups = self.hits + self.misses + self.coalesced
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "hit_ratio": (self.hits + self.coalesced) / lookups if lookups else 0.0,
+            "in_flight": len(self._inflight),
+        }
@@ -0,0 +1,234 @@
+"""Near-duplicate index of recent risky messages (MinHash + LSH)
+
+Scam blasts reuse one template with a different name, amount or link per
+recipient, so the exact-text cache misses them. Each message scored HIGH or
+MEDIUM by the model starts a cluster holding its MinHash signature and
+verdict; later messages whose estimated Jaccard similarity to a cluster is
+at least ``threshold`` reuse that verdict without running the model.
+
+Signatures are built from character 5-gram shingles of a normalized text
+(lowercased, whitespace collapsed, links and digit runs replaced by
+placeholders) and bucketed by LSH bands, so a lookup only compares against
+clusters that share at least one band. Candidates are then checked against
+the full signature. Only signatures are kept, never message text.
+"""
+
+import re
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+
+SHINGLE_SIZE = 5
+# Shingles hashed per step, bounding the (num_perm x shingles) working matrix
+SIGNATURE_CHUNK = 2048
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64(0xFFFFFFFF)
+
+_URL = re.compile(r"(https?://|www\.)\S+|\b[\w-]+\.(com|net|org|info|biz|co|io|ly|xyz)(/\S*)?\b")
+_DIGITS = re.compile(r"\d+")
+_SPACE = re.compile(r"\s+")
+
+
+def normalize(text: str) -> str:
+    """Collapse the parts scam variants usually differ in"""
+    text = _URL.sub(" <url> ", text.lower())
+    text = _DIGITS.sub("0", text)
+    return _SPACE.sub(" ", text).strip()
+
+
+def shingle_hashes(text: str, size: int = SHINGLE_SIZE) -> np.ndarray:
+    """32-bit polynomial hashes of every ``size``-byte window of the UTF-8 text"""
+    data = np.frombuffer(text.encode("utf-8"), dtype=np.uint8).astype(np.uint64)
+    if len(data) < size:
+        data = np.pad(data, (0, size - len(data)))
+    hashes = np.zeros(len(data) - size + 1, dtype=np.uint64)
+    for offset in range(size):
+        hashes = (hashes * np.uint64(257) + data[offset:len(data) - size + 1 + offset]) & _MAX_HASH
+    return np.unique(hashes)
+
+
+class Cluster:
+    """One campaign: the signature and verdict of its first message plus hit counts"""
+
+    __slots__ = ("id", "signature", "band_keys", "result", "model_version", "created", "last_seen", "hits")
+
+    def __init__(self, cluster_id: int, signature: np.ndarray, band_keys: List[bytes],
+                 result: Dict[str, Any], model_version: str, now: float):
+        self.id = cluster_id
+        self.signature = signature
+        self.band_keys = band_keys
+        self.result = result
+        self.model_version = model_version
+        self.created = now
+        self.last_seen = now
+        self.hits = 0
+
+
+class CampaignIndex:
+    """Bounded MinHash/LSH index mapping near-duplicate messages to a shared verdict
+
+    ``num_perm`` hash functions are split into ``bands`` of equal size; with
+    the defaults (64 = 16 x 4) pairs at Jaccard 0.7 collide in some band
+    with probability ~0.99, pairs at 0.3 with ~0.12. Clusters idle for
+    longer than ``ttl_seconds`` expire, and the least recently matched ones
+    are evicted beyond ``max_clusters``.
+    """
+
+    def __init__(self, threshold: float = 0.7, max_clusters: int = 10_000, ttl_seconds: float = 3600.0,
+                 labels: Iterable[str] = ("HIGH", "MEDIUM"), num_perm: int = 64, bands: int = 16,
+                 seed: int = 1):
+        if num_perm % bands:
+            raise ValueError(f"num_perm ({num_perm}) must be a multiple of bands ({bands})")
+        if not 0.0 < threshold <= 1.0:
+            raise ValueError(f"Invalid similarity threshold {threshold}")
+        self.threshold = threshold
+        self.max_clusters = max(1, max_clusters)
+        self.ttl_seconds = ttl_seconds
+        self.labels = set(labels)
+        self.bands = bands
+        self.rows = num_perm // bands
+        rng = np.random.RandomState(seed)
+        self._a = rng.randint(1, 1 << 32, size=num_perm, dtype=np.uint64)[:, None]
+        self._b = rng.randint(0, 1 << 32, size=num_perm, dtype=np.uint64)[:, None]
+        self._clusters: "OrderedDict[int, Cluster]" = OrderedDict()
+        self._buckets: List[Dict[bytes, Set[int]]] = [{} for _ in range(bands)]
+        self._next_id = 1
+        self.lookups = 0
+        self.hits = 0
+        self.added = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def signature(self, text: str) -> np.ndarray:
+        """MinHash signature of the normalized text
+
+        Doesn't touch the index, so it is safe to compute off the event loop.
+        Callers should clip very long texts first.
+        """
+        hashes = shingle_hashes(normalize(text))
+        signature = np.full(self._a.shape[0], _MAX_HASH, dtype=np.uint64)
+        for start in range(0, len(hashes), SIGNATURE_CHUNK):
+            chunk = hashes[None, start:start + SIGNATURE_CHUNK]
+            np.minimum(signature, (((self._a * chunk + self._b) % _MERSENNE_PRIME) & _MAX_HASH).min(axis=1),
+                       out=signature)
+        return signature.astype(np.uint32)
+
+    def _band_keys(self, signature: np.ndarray) -> List[bytes]:
+        return [signature[i * self.rows:(i + 1) * self.rows].tobytes() for i in range(self.bands)]
+
+    def _remove(self, cluster: Cluster):
+        del self._clusters[cluster.id]
+        for bucket, key in zip(self._buckets, cluster.band_keys):
+            members = bucket.get(key)
+            if members is not None:
+                members.discard(cluster.id)
+                if not members:
+                    del bucket[key]
+
+    def _expire(self, now: float):
+        # Clusters are kept in last-seen order, so expired ones are at the front
+        while self._clusters:
+            cluster = next(iter(self._clusters.values()))
+            if now - cluster.last_seen < self.ttl_seconds:
+                break
+            self._remove(cluster)
+            self.expirations += 1
+
+    def _best_match(self, signature: np.ndarray, band_keys: List[bytes],
+                    model_version: str) -> Tuple[Optional[Cluster], float]:
+        candidates = set()
+        for bucket, key in zip(self._buckets, band_keys):
+            candidates.update(bucket.get(key, ()))
+        best, best_similarity = None, 0.0
+        for cluster_id in candidates:
+            cluster = self._clusters[cluster_id]
+            if cluster.model_version != model_version:
+                continue
+            similarity = float(np.mean(cluster.signature == signature))
+            if similarity > best_similarity:
+                best, best_similarity = cluster, similarity
+        return best, best_similarity
+
+    def lookup(self, text: str, model_version: str,
+               signature: Optional[np.ndarray] = None) -> Tuple[Optional[Dict[str, Any]], np.ndarray]:
+        """Verdict of the closest cluster at or above the threshold (or None), plus the text's signature
+
+        ``signature`` may be precomputed with ``signature(text)``. Pass the
+        returned signature back to ``add`` after scoring a miss, to avoid
+        hashing the text twice.
+        """
+        now = time.time()
+        self._expire(now)
+        self.lookups += 1
+        if signature is None:
+            signature = self.signature(text)
+        cluster, similarity = self._best_match(signature, self._band_keys(signature), model_version)
+        if cluster is None or similarity < self.threshold:
+            return None, signature
+        cluster.hits += 1
+        cluster.last_seen = now
+        self._clusters.move_to_end(cluster.id)
+        self.hits += 1
+        return cluster.result, signature
+
+    def add(self, signature: np.ndarray, result: Dict[str, Any], model_version: str):
+        """Start a cluster for a freshly scored message if its label is tracked"""
+        if result["label"] not in self.labels:
+            return
+        band_keys = self._band_keys(signature)
+        # A concurrent request may have created a matching cluster meanwhile
+        cluster, similarity = self._best_match(signature, band_keys, model_version)
+        if cluster is not None and similarity >= self.threshold:
+            return
+
+        now = time.time()
+        cluster = Cluster(self._next_id, signature, band_keys, result, model_version, now)
+        self._next_id += 1
+        self._clusters[cluster.id] = cluster
+        for bucket, key in zip(self._buckets, band_keys):
+            bucket.setdefault(key, set()).add(cluster.id)
+        self.added += 1
+        while len(self._clusters) > self.max_clusters:
+            self._remove(next(iter(self._clusters.values())))
+            self.evictions += 1
+
+    def clear(self):
+        """Drop every cluster"""
+        self._clusters.clear()
+        for bucket in self._buckets:
+            bucket.clear()
+
+    def top_clusters(self, limit: int = 20) -> List[Dict[str, Any]]:
+        """Most-matched live clusters, i.e. the most active campaigns"""
+        now = time.time()
+        clusters = sorted(self._clusters.values(), key=lambda c: c.hits, reverse=True)[:max(0, limit)]
+        return [
+            {
+                "id": cluster.id,
+                "label": cluster.result["label"],
+                "risk_score": cluster.result["risk_score"],
+                "hits": cluster.hits,
+                "age_seconds": round(now - cluster.created, 1),
+                "idle_seconds": round(now - cluster.last_seen, 1),
+                "model_version": cluster.model_version,
+            }
+            for cluster in clusters
+        ]
+
+    def stats(self) -> Dict[str, Any]:
+        """Report size, hit rate and eviction counters"""
+        return {
+            "clusters": len(self._clusters),
+            "max_clusters": self.max_clusters,
+            "ttl_seconds": self.ttl_seconds,
+            "threshold": self.threshold,
+            "labels": sorted(self.labels),
+            "lookups": self.lookups,
+            "hits": self.hits,
+            "hit_ratio": self.hits / self.lookups if self.lookups else 0.0,
+            "clusters_added": self.added,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
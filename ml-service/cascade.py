@@ -0,0 +1,93 @@
+import time
+from collections import deque
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+
+class TierStats:
+    """Call counts and recent latencies for one cascade tier"""
+
+    def __init__(self, window: int = 1024):
+        self.texts = 0
+        self.calls = 0
+        self.total_ms = 0.0
+        self._recent = deque(maxlen=window)
+
+    def record(self, elapsed_ms: float, texts: int = 1):
+        self.texts += texts
+        self.calls += 1
+        self.total_ms += elapsed_ms
+        self._recent.append(elapsed_ms)
+
+    def summary(self) -> Dict[str, Any]:
+        recent = sorted(self._recent)
+
+        def pick(pct: float) -> float:
+            return recent[min(len(recent) - 1, int(pct * len(recent)))] if recent else 0.0
+
+        return {
+            "texts": self.texts,
+            "calls": self.calls,
+            "mean_ms": self.total_ms / self.calls if self.calls else 0.0,
+            "p50_ms": pick(0.50),
+            "p95_ms": pick(0.95),
+        }
+
+
+class CascadeRouter:
+    """Score with the cheap keyword model first and escalate only uncertain texts
+
+    A keyword result is accepted when its risk score is below ``low`` (clearly
+    clean) or at least ``high`` (clearly a scam); anything in between is left
+    for the BERT tier.
+    """
+
+    def __init__(
+        self,
+        cheap_batch: Callable[[List[str]], List[Dict[str, Any]]],
+        low: float = 0.3,
+        high: float = 0.8,
+    ):
+        if not 0.0 <= low <= high <= 1.0:
+            raise ValueError(f"Invalid cascade band [{low}, {high}]")
+        self.cheap_batch = cheap_batch
+        self.low = low
+        self.high = high
+        self.keyword_tier = TierStats()
+        self.model_tier = TierStats()
+
+    def is_confident(self, result: Dict[str, Any]) -> bool:
+        return result["risk_score"] < self.low or result["risk_score"] >= self.high
+
+    def route(self, texts: List[str]) -> Tuple[List[Optional[Dict[str, Any]]], List[int]]:
+        """Run the keyword tier; returns accepted results (None where escalated) and escalated indices"""
+        start = time.perf_counter()
+        cheap = self.cheap_batch(texts)
+        self.keyword_tier.record((time.perf_counter() - start) * 1000, len(texts))
+
+        results: List[Optional[Dict[str, Any]]] = []
+        escalated = []
+        for i, result in enumerate(cheap):
+            if self.is_confident(result):
+                results.append(result)
+            else:
+                results.append(None)
+                escalated.append(i)
+        return results, escalated
+
+    def record_model(self, elapsed_ms: float, texts: int = 1):
+        """Record a call to the model tier"""
+        self.model_tier.record(elapsed_ms, texts)
+
+    def stats(self) -> Dict[str, Any]:
+        """Routing ratios and per-tier latencies"""
+        total = self.keyword_tier.texts
+        escalated = self.model_tier.texts
+        return {
+            "band": [self.low, self.high],
+            "texts": total,
+            "answered_by_keywords": total - escalated,
+            "escalated_to_model": escalated,
+            "escalation_ratio": escalated / total if total else 0.0,
+            "keyword_tier": self.keyword_tier.summary(),
+            "model_tier": self.model_tier.summary(),
+        }
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Check that every inference backend gives the same predictions as eager PyTorch
+
+Each backend is built from the same model and scores the corpus through the
+service's shared tokenizer and postprocessing path. The run fails (exit code
+1) if any probability differs from the eager result by more than the
+tolerance. Per-backend timings are printed to help pick the fastest runtime.
+"""
+
+import argparse
+import sys
+import time
+
+from compare_quantization import DEFAULT_CORPUS, load_corpus
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--corpus", help="JSONL or CSV file with a text column")
+    parser.add_argument("--model", help="Model name or directory (default: MODEL_PATH or main.MODEL_NAME)")
+    parser.add_argument("--backends", default="eager,torchscript,onnx", help="Comma-separated backends to check")
+    parser.add_argument("--tolerance", type=float, default=1e-4, help="Max allowed absolute probability difference")
+    args = parser.parse_args()
+
+    import main as service
+    from model_loader import create_backend
+
+    texts = [text for text, _ in (load_corpus(args.corpus) if args.corpus else DEFAULT_CORPUS)]
+    model_name = args.model or service.MODEL_SOURCE
+    version = service.source_version(model_name)
+
+    print("🧪 Checking backend parity...")
+    print("=" * 50)
+
+    reference = None
+    failed = False
+    for name in ["eager"] + [b for b in args.backends.split(",") if b and b != "eager"]:
+        try:
+            backend, model, tokenizer = create_backend(
+                name, model_name, onnx_path=service.onnx_artifact_path(version),
+                torchscript_path=service.TORCHSCRIPT_PATH, model_version=version
+            )
+            service.activate_model(service.LoadedModel(f"{model_name}-{name}", backend, tokenizer, model))
+        except Exception as e:
+            print(f"❌ {name}: could not build backend: {e}")
+            failed = True
+            continue
+
+        # Warm up, then time one pass over the corpus
+        service.predict_fraud_batch(texts[:1])
+        start = time.perf_counter()
+        results = service.predict_fraud_batch(texts)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+
+        if reference is None:
+            reference = results
+            print(f"✅ {name}: reference ({elapsed_ms:.1f} ms)")
+            continue
+
+        max_diff = max(
+            abs(result["probabilities"][label] - expected["probabilities"][label])
+            for result, expected in zip(results, reference)
+            for label in expected["probabilities"]
+        )
+        same_labels = all(r["label"] == e["label"] for r, e in zip(results, reference))
+        if max_diff <= args.tolerance and same_labels:
+            print(f"✅ {name}: max diff {max_diff:.2e} ({elapsed_ms:.1f} ms)")
+        else:
+            print(f"❌ {name}: max diff {max_diff:.2e}, labels match: {same_labels} ({elapsed_ms:.1f} ms)")
+            failed = True
+
+    print("\n" + "=" * 50)
+    if failed:
+        print("❌ Backend parity check failed")
+        sys.exit(1)
+    print("🎉 All backends agree within tolerance")
+
+
+if __name__ == "__main__":
+    main()
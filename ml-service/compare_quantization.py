@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+"""
+Compare fp32 and int8-quantized BERT inference on a labeled corpus
+
+Reports load time, resident memory, per-batch latency and accuracy for each
+variant, plus how often the two agree on the label and how far their
+probabilities drift apart. Each variant runs in its own process so memory
+numbers are not mixed up.
+
+Corpus files are JSONL ({"text": ..., "label": ...}) or CSV with text and
+label columns; the label is optional.
+"""
+
+import argparse
+import csv
+import json
+import multiprocessing
+import os
+import resource
+import statistics
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+# Same messages test_prediction.py uses, for a quick run without a corpus
+DEFAULT_CORPUS = [
+    ("Your account has been suspended due to suspicious activity. Click here to verify your identity immediately.", "HIGH"),
+    ("Hello, this is a reminder about your upcoming appointment.", "LOW"),
+    ("You have won a prize! Claim your reward now by providing your personal information.", "HIGH"),
+]
+
+
+def load_corpus(path: str) -> List[Tuple[str, Optional[str]]]:
+    """Read (text, label) pairs from a JSONL or CSV file"""
+    corpus = []
+    with open(path, newline="", encoding="utf-8") as f:
+        if path.endswith(".csv"):
+            for row in csv.DictReader(f):
+                corpus.append((row["text"], row.get("label") or None))
+        else:
+            for line in f:
+                if line.strip():
+                    record = json.loads(line)
+                    corpus.append((record["text"], record.get("label")))
+    return corpus
+
+
+def current_rss_mb() -> float:
+    """Resident set size of this process in MB"""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    # Fall back to peak RSS (KB on Linux, bytes on macOS)
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if os.uname().sysname == "Darwin" else peak / 1024
+
+
+def run_variant(variant: str, model_name: Optional[str], texts: List[str], batch_size: int,
+                repeats: int, save_path: Optional[str]) -> Dict[str, Any]:
+    """Load one model variant and time predictions over the corpus (runs in a child process)"""
+    import torch
+    import main
+    from model_loader import build_model
+    from backends import EagerBackend
+
+    rss_before = current_rss_mb()
+    start = time.perf_counter()
+    model, tokenizer = build_model(
+        model_name or main.MODEL_SOURCE,
+        quantization="dynamic" if variant == "int8" else ""
+    )
+    main.activate_model(main.LoadedModel(variant, EagerBackend(model), tokenizer, model))
+    load_seconds = time.perf_counter() - start
+    rss_after_load = current_rss_mb()
+
+    if save_path:
+        torch.save(model.state_dict(), save_path)
+
+    batches = [texts[i:i + batch_size] for i in range(0, len(texts), batch_size)]
+
+    # Warm up so one-off allocation costs don't skew the first batch
+    main.predict_fraud_batch(batches[0])
+
+    latencies_ms = []
+    results = []
+    for _ in range(repeats):
+        results = []
+        for batch in batches:
+            start = time.perf_counter()
+            results.extend(main.predict_fraud_batch(batch))
+            latencies_ms.append((time.perf_counter() - start) * 1000)
+
+    return {
+        "variant": variant,
+        "load_seconds": load_seconds,
+        "model_rss_mb": rss_after_load - rss_before,
+        "rss_mb": current_rss_mb(),
+        "latencies_ms": latencies_ms,
+        "messages_scored": repeats * len(texts),
+        "results": results,
+    }
+
+
+def percentile(values: List[float], pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def summarize(run: Dict[str, Any], labels: List[Optional[str]]) -> Dict[str, Any]:
+    """Latency percentiles and accuracy for one variant"""
+    latencies = run["latencies_ms"]
+    labeled = [(r["label"], gold) for r, gold in zip(run["results"], labels) if gold]
+    return {
+        "variant": run["variant"],
+        "load_seconds": round(run["load_seconds"], 2),
+        "model_rss_mb": round(run["model_rss_mb"], 1),
+        "rss_mb": round(run["rss_mb"], 1),
+        "batch_p50_ms": round(statistics.median(latencies), 2),
+        "batch_p95_ms": round(percentile(latencies, 95), 2),
+        "per_message_ms": round(sum(latencies) / run["messages_scored"], 3),
+        "accuracy": round(sum(p == g for p, g in labeled) / len(labeled), 4) if labeled else None,
+    }
+
+
+def agreement(fp32: List[Dict[str, Any]], int8: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Label agreement and probability drift between the two variants"""
+    same_label = sum(a["label"] == b["label"] for a, b in zip(fp32, int8))
+    diffs = [
+        abs(a["probabilities"][label] - b["probabilities"][label])
+        for a, b in zip(fp32, int8)
+        for label in a["probabilities"]
+    ]
+    return {
+        "label_agreement": round(same_label / len(fp32), 4),
+        "max_probability_diff": round(max(diffs), 5),
+        "mean_probability_diff": round(sum(diffs) / len(diffs), 5),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--corpus", help="JSONL or CSV file with text and label")
+    parser.add_argument("--model", help="Model name or directory (default: MODEL_PATH or main.MODEL_NAME)")
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--repeats", type=int, default=3, help="Passes over the corpus per variant")
+    parser.add_argument("--save-quantized", help="Write the int8 state dict here for ML_QUANTIZED_WEIGHTS_PATH")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.corpus) if args.corpus else DEFAULT_CORPUS
+    texts = [text for text, _ in corpus]
+    labels = [label for _, label in corpus]
+
+    # A fresh process per variant keeps the memory figures independent
+    ctx = multiprocessing.get_context("spawn")
+    runs = {}
+    for variant in ("fp32", "int8"):
+        save_path = args.save_quantized if variant == "int8" else None
+        with ctx.Pool(1) as pool:
+            runs[variant] = pool.apply(
+                run_variant,
+                (variant, args.model, texts, args.batch_size, args.repeats, save_path)
+            )
+
+    report = {
+        "messages": len(texts),
+        "batch_size": args.batch_size,
+        "variants": [summarize(runs[v], labels) for v in ("fp32", "int8")],
+        "agreement": agreement(runs["fp32"]["results"], runs["int8"]["results"]),
+    }
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+
+    print(f"📊 fp32 vs int8 on {report['messages']} messages (batch size {report['batch_size']})")
+    print("=" * 60)
+    for summary in report["variants"]:
+        print(f"\n{summary['variant']}:")
+        for key, value in summary.items():
+            if key != "variant":
+                print(f"   {key}: {value}")
+    print("\nAgreement:")
+    for key, value in report["agreement"].items():
+        print(f"   {key}: {value}")
+    if args.save_quantized:
+        print(f"\n💾 int8 weights saved to {args.save_quantized}")
+
+
+if __name__ == "__main__":
+    main()
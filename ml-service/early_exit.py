@@ -0,0 +1,187 @@
+"""Early exit from intermediate BERT layers
+
+Small classifier heads sit on selected encoder layers. Each takes the [CLS]
+hidden state at its layer, in the same way BERT's pooler and classifier
+do after the last layer. During inference a text stops at the first head
+whose prediction is confident enough, i.e. whose entropy (normalized to
+0-1 by log(num_labels)) is below the threshold. Texts no head is sure
+about run through every layer and get the model's own classifier.
+
+Heads are trained by train_exit_heads.py against the full model's
+predictions and saved with ExitHeads.save.
+"""
+
+import logging
+import math
+import threading
+from typing import Any, Dict, Iterable, List
+
+import numpy as np
+import torch
+
+from backends import InferenceBackend
+
+logger = logging.getLogger(__name__)
+
+
+def normalized_entropy(logits: torch.Tensor) -> torch.Tensor:
+    """Entropy of softmax(logits) per row, divided by its maximum so it lies in [0, 1]"""
+    log_probs = torch.log_softmax(logits, dim=-1)
+    entropy = -(log_probs.exp() * log_probs).sum(dim=-1)
+    return entropy / math.log(logits.shape[-1])
+
+
+def encoder_parts(model):
+    """Embeddings, encoder layers, pooler and classifier of a BERT-style classifier"""
+    base = model.base_model
+    parts = (
+        getattr(base, "embeddings", None),
+        getattr(getattr(base, "encoder", None), "layer", None),
+        getattr(base, "pooler", None),
+        getattr(model, "classifier", None),
+    )
+    if any(part is None for part in parts):
+        raise ValueError(f"Early exit needs a BERT-style model with a pooler, not {type(model).__name__}")
+    return parts
+
+
+class ExitHeads(torch.nn.Module):
+    """One pooler-plus-classifier head per exit layer (layers counted from 1)"""
+
+    def __init__(self, layers: Iterable[int], hidden_size: int, num_labels: int):
+        super().__init__()
+        self.layers = sorted(set(layers))
+        self.hidden_size = hidden_size
+        self.num_labels = num_labels
+        self.heads = torch.nn.ModuleDict({
+            str(layer): torch.nn.Sequential(
+                torch.nn.Linear(hidden_size, hidden_size),
+                torch.nn.Tanh(),
+                torch.nn.Linear(hidden_size, num_labels),
+            )
+            for layer in self.layers
+        })
+
+    def forward(self, layer: int, cls_hidden: torch.Tensor) -> torch.Tensor:
+        return self.heads[str(layer)](cls_hidden)
+
+    def init_from(self, model):
+        """Start every head from the model's own pooler and classifier weights"""
+        _, _, pooler, classifier = encoder_parts(model)
+        for head in self.heads.values():
+            head[0].load_state_dict(pooler.dense.state_dict())
+            head[2].load_state_dict(classifier.state_dict())
+
+    def save(self, path: str, **metadata: Any):
+        torch.save({
+            "layers": self.layers,
+            "hidden_size": self.hidden_size,
+            "num_labels": self.num_labels,
+            "state_dict": self.state_dict(),
+            "metadata": metadata,
+        }, path)
+
+    @classmethod
+    def load(cls, path: str) -> "ExitHeads":
+        saved = torch.load(path)
+        heads = cls(saved["layers"], saved["hidden_size"], saved["num_labels"])
+        heads.load_state_dict(saved["state_dict"])
+        heads.metadata = saved.get("metadata", {})
+        return heads.eval()
+
+
+class EarlyExitBackend(InferenceBackend):
+    """Eager forward pass that drops texts from the batch once an exit head is confident"""
+
+    name = "early_exit"
+
+    def __init__(self, model, heads: ExitHeads, threshold: float = 0.2):
+        self.model = model
+        self.embeddings, self.layers, self.pooler, self.classifier = encoder_parts(model)
+        self.heads = heads.eval()
+        self.threshold = threshold
+        self.num_layers = len(self.layers)
+        if heads.num_labels != self.classifier.out_features:
+            raise ValueError(f"Exit heads predict {heads.num_labels} labels, the model {self.classifier.out_features}")
+        # Heads at or past the last layer would only duplicate the model's own classifier
+        self.exit_layers = {layer for layer in heads.layers if layer < self.num_layers}
+        self._lock = threading.Lock()
+        self._exits = [0] * (self.num_layers + 1)
+
+    def logits(self, inputs: Dict[str, torch.Tensor]) -> np.ndarray:
+        with torch.no_grad():
+            mask = inputs["attention_mask"]
+            hidden = self.embeddings(input_ids=inputs["input_ids"], token_type_ids=inputs.get("token_type_ids"))
+            logits = torch.empty(hidden.shape[0], self.heads.num_labels, dtype=torch.float32)
+            rows = torch.arange(hidden.shape[0])
+            exits = [0] * (self.num_layers + 1)
+
+            for depth, layer in enumerate(self.layers, start=1):
+                extended_mask = self.model.get_extended_attention_mask(mask, mask.shape)
+                hidden = layer(hidden, attention_mask=extended_mask)[0]
+                if depth not in self.exit_layers:
+                    continue
+                head_logits = self.heads(depth, hidden[:, 0]).float()
+                done = normalized_entropy(head_logits) < self.threshold
+                if not done.any():
+                    continue
+                logits[rows[done]] = head_logits[done]
+                exits[depth] += int(done.sum())
+                keep = ~done
+                if not keep.any():
+                    break
+                # Inputs are right-padded: trim columns only the exited texts needed
+                width = int(mask[keep].sum(dim=1).max())
+                rows, hidden, mask = rows[keep], hidden[keep, :width], mask[keep, :width]
+            else:
+                logits[rows] = self.classifier(self.pooler(hidden)).float()
+                exits[self.num_layers] += len(rows)
+
+        with self._lock:
+            for depth, count in enumerate(exits):
+                self._exits[depth] += count
+        return logits.numpy()
+
+    def exit_counts(self) -> Dict[str, int]:
+        """Texts answered at each layer; the last layer counts texts that ran the whole model"""
+        with self._lock:
+            return {str(depth): self._exits[depth] for depth in sorted(self.exit_layers | {self.num_layers})}
+
+    def stats(self) -> Dict[str, Any]:
+        """Report where texts exited and the average number of layers they ran"""
+        counts = self.exit_counts()
+        texts = sum(counts.values())
+        layers_run = sum(int(depth) * count for depth, count in counts.items())
+        return {
+            "threshold": self.threshold,
+            "exit_layers": sorted(self.exit_layers),
+            "num_layers": self.num_layers,
+            "texts": texts,
+            "exits_by_layer": counts,
+            "mean_layers": layers_run / texts if texts else 0.0,
+        }
+
+
+def simulate_exits(head_logits: Dict[int, torch.Tensor], final_logits: torch.Tensor, num_layers: int,
+                   threshold: float) -> Dict[str, Any]:
+    """Replay the exit rule on precomputed logits: each text's logits and the layer it stops at
+
+    ``head_logits`` maps exit layer -> (texts, labels) logits of that head.
+    """
+    logits = final_logits.clone()
+    exit_layer = torch.full((final_logits.shape[0],), num_layers, dtype=torch.long)
+    pending = torch.ones(final_logits.shape[0], dtype=torch.bool)
+    for layer in sorted(layer for layer in head_logits if layer < num_layers):
+        done = pending & (normalized_entropy(head_logits[layer]) < threshold)
+        logits[done] = head_logits[layer][done]
+        exit_layer[done] = layer
+        pending &= ~done
+    return {"logits": logits, "exit_layer": exit_layer}
+
+
+def cls_states(model, inputs: Dict[str, torch.Tensor], layers: List[int]) -> Dict[int, torch.Tensor]:
+    """[CLS] hidden state after each of ``layers`` for a padded batch"""
+    with torch.no_grad():
+        outputs = model.base_model(**inputs, output_hidden_states=True)
+    # hidden_states[0] is the embedding output, so layer n is at index n
+    return {layer: outputs.hidden_states[layer][:, 0] for layer in layers}
@@ -0,0 +1,128 @@
+import asyncio
+import contextvars
+import logging
+import os
+import time
+from collections import deque
+from concurrent.futures import Executor, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, Iterator, TypeVar
+
+import timing
+from metrics import QUEUE_WAIT_SECONDS
+
+logger = logging.getLogger(__name__)
+
+QUEUE_WAIT = QUEUE_WAIT_SECONDS.labels("executor")
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+class InferenceOverloaded(RuntimeError):
+    """Raised when too many inference calls are already waiting"""
+
+
+def configure_torch_threads(workers: int, torch_threads: int = 0, interop_threads: int = 1) -> int:
+    """Size torch's intra-op pool so executor workers don't oversubscribe the cores
+
+    With ``torch_threads`` left at 0 the available cores are split evenly
+    between the executor workers. Returns the thread count that was applied.
+    """
+    import torch
+
+    if torch_threads <= 0:
+        torch_threads = max(1, (os.cpu_count() or 1) // max(1, workers))
+    torch.set_num_threads(torch_threads)
+
+    # Inter-op parallelism only adds contention when requests already run
+    # side by side; it can only be set once per process.
+    try:
+        torch.set_num_interop_threads(max(1, interop_threads))
+    except RuntimeError:
+        pass
+
+    logger.info(f"Torch configured with {torch_threads} intra-op threads for {workers} inference workers")
+    return torch_threads
+
+
+def prefetch(fn: Callable[[T], R], items: Iterable[T], pool: Executor, depth: int = 2) -> Iterator[R]:
+    """Yield ``fn(item)`` for each item in order, computing up to ``depth`` results ahead on ``pool``
+
+    The consumer works on one result while the next ones are produced, and
+    at most ``depth`` results are waiting or in progress at any time.
+    Results not consumed when the iterator is closed are cancelled.
+    """
+    items = iter(items)
+    pending = deque()
+    try:
+        for item in items:
+            pending.append(pool.submit(fn, item))
+            if len(pending) >= max(1, depth):
+                break
+        while pending:
+            result = pending.popleft().result()
+            for item in items:
+                pending.append(pool.submit(fn, item))
+                break
+            yield result
+    finally:
+        for future in pending:
+            future.cancel()
+
+
+class InferenceExecutor:
+    """Dedicated, bounded thread pool for blocking model calls
+
+    At most ``max_workers`` calls run at once; up to ``max_pending`` calls may
+    be running or queued before new ones are rejected with InferenceOverloaded.
+    """
+
+    def __init__(self, max_workers: int = 1, max_pending: int = 256):
+        self.max_workers = max(1, max_workers)
+        self.max_pending = max(self.max_workers, max_pending)
+        self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="inference")
+        self._pending = 0
+        self._rejected = 0
+
+    async def run(self, fn: Callable[..., Any], *args: Any) -> Any:
+        """Run ``fn(*args)`` on the pool without blocking the event loop"""
+        if self._pending >= self.max_pending:
+            self._rejected += 1
+            raise InferenceOverloaded(f"Inference queue full ({self.max_pending} pending)")
+
+        submitted = time.perf_counter()
+
+        def call():
+            waited = time.perf_counter() - submitted
+            QUEUE_WAIT.observe(waited)
+            timing.record("queue", waited)
+            return fn(*args)
+
+        # Run in a copy of the caller's context so per-request timings follow the call
+        context = contextvars.copy_context()
+        self._pending += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._pool, context.run, call)
+        finally:
+            self._pending -= 1
+
+    def resize(self, max_workers: int):
+        """Switch to a new pool of ``max_workers`` threads; calls already submitted finish on the old one"""
+        previous = self._pool
+        self.max_workers = max(1, max_workers)
+        self.max_pending = max(self.max_workers, self.max_pending)
+        self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="inference")
+        previous.shutdown(wait=False)
+
+    def shutdown(self):
+        """Stop accepting work and drop anything not yet started"""
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> Dict[str, Any]:
+        """Report pool size, current load and rejections"""
+        return {
+            "max_workers": self.max_workers,
+            "max_pending": self.max_pending,
+            "pending": self._pending,
+            "rejected": self._rejected,
+        }
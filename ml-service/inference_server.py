@@ -0,0 +1,522 @@
+#!/usr/bin/env python3
+"""
+Dedicated inference process shared by every HTTP worker
+
+The server owns the only copy of the model. Each HTTP worker claims a slot:
+a request ring and a response ring in shared memory, plus a FIFO the server
+pokes when a response is ready. Requests from all slots are gathered into
+one batch (up to ML_BATCH_MAX_SIZE texts or ML_BATCH_MAX_WAIT_MS), so
+batching sees the traffic of every worker. Texts travel as length-prefixed
+UTF-8 and results come back as raw float64 probability rows; nothing is
+pickled.
+
+Run it next to the workers, with the same ML_INFERENCE_SERVER name:
+
+    ML_INFERENCE_SERVER=fraudshield python inference_server.py &
+    ML_INFERENCE_SERVER=fraudshield uvicorn main:app --workers 4
+"""
+
+import asyncio
+import fcntl
+import logging
+import os
+import random
+import select
+import signal
+import struct
+import tempfile
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from executor import InferenceOverloaded
+from shm_ring import ShmRing, attach_segment, create_segment
+
+logger = logging.getLogger(__name__)
+
+# Control segment layout
+MAGIC = b"FSINFER1"
+CONTROL = struct.Struct("<8sIIQQdQ64s256sQQQ")
+CONTROL_FIELDS = (
+    "magic", "slots", "state", "request_ring_bytes", "response_ring_bytes",
+    "heartbeat", "pid", "model_version", "error", "batches", "requests", "texts",
+)
+HEARTBEAT = struct.Struct("<d")
+HEARTBEAT_OFFSET = 32
+LOADING, READY, FAILED, STOPPED = range(4)
+STATE_NAMES = {LOADING: "loading", READY: "ready", FAILED: "failed", STOPPED: "stopped"}
+
+HEARTBEAT_INTERVAL = 0.5
+HEARTBEAT_TIMEOUT = 10.0
+
+REQUEST_HEADER = struct.Struct("<QI")    # request id, text count
+TEXT_LENGTH = struct.Struct("<I")
+RESPONSE_HEADER = struct.Struct("<QBI")  # request id, status, row count
+STATUS_OK, STATUS_ERROR = 0, 1
+
+# Request ids: a random tag for the connection in the high 32 bits and a
+# sequence number in the low 32
+CONNECTION_TAG_BITS = 32
+SEQUENCE_MASK = (1 << CONNECTION_TAG_BITS) - 1
+
+
+class RequestTooLarge(ValueError):
+    """Raised when a request is bigger than the whole request ring, so it can never be sent"""
+
+
+def encode_request(request_id: int, texts: List[str]) -> bytes:
+    parts = [REQUEST_HEADER.pack(request_id, len(texts))]
+    for text in texts:
+        data = text.encode("utf-8")
+        parts.append(TEXT_LENGTH.pack(len(data)))
+        parts.append(data)
+    return b"".join(parts)
+
+
+def decode_request(record: bytes) -> Tuple[int, List[str]]:
+    request_id, count = REQUEST_HEADER.unpack_from(record)
+    offset = REQUEST_HEADER.size
+    texts = []
+    for _ in range(count):
+        (length,) = TEXT_LENGTH.unpack_from(record, offset)
+        offset += TEXT_LENGTH.size
+        texts.append(record[offset:offset + length].decode("utf-8"))
+        offset += length
+    return request_id, texts
+
+
+def encode_response(request_id: int, probabilities: np.ndarray) -> bytes:
+    rows = np.ascontiguousarray(probabilities, dtype=np.float64)
+    return RESPONSE_HEADER.pack(request_id, STATUS_OK, len(rows)) + rows.tobytes()
+
+
+def encode_error(request_id: int, message: str) -> bytes:
+    return RESPONSE_HEADER.pack(request_id, STATUS_ERROR, 0) + message.encode("utf-8")
+
+
+def decode_response(record: bytes, num_labels: int) -> Tuple[int, int, Any]:
+    request_id, status, count = RESPONSE_HEADER.unpack_from(record)
+    payload = record[RESPONSE_HEADER.size:]
+    if status != STATUS_OK:
+        return request_id, status, payload.decode("utf-8", errors="replace")
+    return request_id, status, np.frombuffer(payload, dtype=np.float64).reshape(count, num_labels)
+
+
+def segment_names(name: str, slot: int) -> Tuple[str, str]:
+    return f"{name}-req{slot}", f"{name}-resp{slot}"
+
+
+def fifo_path(name: str, slot: Optional[int] = None) -> str:
+    suffix = "requests" if slot is None else f"slot{slot}"
+    return os.path.join(tempfile.gettempdir(), f"{name}-{suffix}.fifo")
+
+
+def open_fifo(path: str) -> int:
+    # O_RDWR keeps open() from blocking and writes from failing while the
+    # other side isn't connected yet
+    return os.open(path, os.O_RDWR | os.O_NONBLOCK)
+
+
+def ring_doorbell(fd: int):
+    try:
+        os.write(fd, b"\0")
+    except BlockingIOError:
+        pass  # Already full of unread wake-ups
+
+
+def drain_fifo(fd: int):
+    try:
+        while os.read(fd, 4096):
+            pass
+    except BlockingIOError:
+        pass
+
+
+class InferenceServer:
+    """Owns the shared memory slots and runs batches for all attached workers"""
+
+    def __init__(
+        self,
+        name: str,
+        slots: int = 8,
+        request_ring_bytes: int = 16 << 20,
+        response_ring_bytes: int = 1 << 20,
+        max_batch_size: int = 16,
+        max_wait_ms: float = 5.0,
+    ):
+        self.name = name
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000.0
+        self.stopping = threading.Event()
+        self.control = create_segment(f"{name}-ctl", CONTROL.size)
+        self._fields = dict(
+            zip(CONTROL_FIELDS, (MAGIC, slots, LOADING, request_ring_bytes, response_ring_bytes,
+                                 time.time(), os.getpid(), b"", b"", 0, 0, 0))
+        )
+        self._write_control()
+
+        self.requests = []
+        self.responses = []
+        self.doorbells = []
+        for slot in range(slots):
+            request_name, response_name = segment_names(name, slot)
+            self.requests.append(ShmRing.create(request_name, request_ring_bytes))
+            self.responses.append(ShmRing.create(response_name, response_ring_bytes))
+            self.doorbells.append(self._make_fifo(fifo_path(name, slot)))
+        self.wakeups = self._make_fifo(fifo_path(name))
+        self._next_slot = 0
+        self.dropped = 0
+
+        self._heartbeat = threading.Thread(target=self._beat, name="heartbeat", daemon=True)
+        self._heartbeat.start()
+
+    @staticmethod
+    def _make_fifo(path: str) -> int:
+        if os.path.exists(path):
+            os.unlink(path)
+        os.mkfifo(path)
+        return open_fifo(path)
+
+    def _write_control(self):
+        CONTROL.pack_into(self.control.buf, 0, *(self._fields[field] for field in CONTROL_FIELDS))
+
+    def _beat(self):
+        # Only the heartbeat word is written here, so it can't clobber other fields
+        while not self.stopping.wait(HEARTBEAT_INTERVAL):
+            self._fields["heartbeat"] = time.time()
+            HEARTBEAT.pack_into(self.control.buf, HEARTBEAT_OFFSET, self._fields["heartbeat"])
+
+    def set_state(self, state: int, model_version: str = "", error: str = ""):
+        self._fields.update(
+            state=state,
+            model_version=model_version.encode("utf-8")[:64],
+            error=error.encode("utf-8")[:256],
+        )
+        self._write_control()
+
+    def collect(self) -> List[Tuple[int, int, List[str]]]:
+        """Gather requests from every slot until the batch is full or max_wait has passed"""
+        batch = []
+        texts = 0
+        deadline = None
+        while not self.stopping.is_set():
+            slots = len(self.requests)
+            for step in range(slots):
+                slot = (self._next_slot + step) % slots
+                while texts < self.max_batch_size:
+                    record = self.requests[slot].get()
+                    if record is None:
+                        break
+                    request_id, request_texts = decode_request(record)
+                    batch.append((slot, request_id, request_texts))
+                    texts += len(request_texts)
+            # Start the next round elsewhere so one busy worker can't starve the rest
+            self._next_slot = (self._next_slot + 1) % slots
+
+            if batch and deadline is None:
+                deadline = time.monotonic() + self.max_wait
+            if batch and (texts >= self.max_batch_size or time.monotonic() >= deadline):
+                break
+            timeout = max(0.0, deadline - time.monotonic()) if batch else HEARTBEAT_INTERVAL
+            if select.select([self.wakeups], [], [], timeout)[0]:
+                drain_fifo(self.wakeups)
+        return batch
+
+    def respond(self, slot: int, record: bytes):
+        if not self.responses[slot].put(record):
+            # Only happens when the worker in that slot has stopped reading
+            self.dropped += 1
+            logger.warning(f"Response ring for slot {slot} is full; dropping a response")
+            return
+        ring_doorbell(self.doorbells[slot])
+
+    def serve(self, predict_batch: Callable[[List[str]], List[Dict[str, Any]]], labels: List[str]):
+        """Run batches until stopped"""
+        while not self.stopping.is_set():
+            batch = self.collect()
+            if not batch:
+                continue
+            texts = [text for _, _, request_texts in batch for text in request_texts]
+            try:
+                results = predict_batch(texts)
+                probabilities = np.array(
+                    [[result["probabilities"][label] for label in labels] for result in results],
+                    dtype=np.float64,
+                )
+            except Exception as e:
+                message = str(getattr(e, "detail", e))
+                logger.error(f"Batch of {len(texts)} texts failed: {message}")
+                for slot, request_id, _ in batch:
+                    self.respond(slot, encode_error(request_id, message))
+            else:
+                offset = 0
+                for slot, request_id, request_texts in batch:
+                    rows = probabilities[offset:offset + len(request_texts)]
+                    offset += len(request_texts)
+                    self.respond(slot, encode_response(request_id, rows))
+            self._fields["batches"] += 1
+            self._fields["requests"] += len(batch)
+            self._fields["texts"] += len(texts)
+            self._write_control()
+
+    def close(self):
+        self.stopping.set()
+        self._heartbeat.join()
+        self.set_state(STOPPED)
+        for ring in self.requests + self.responses:
+            ring.close()
+        for slot, fd in enumerate(self.doorbells):
+            os.close(fd)
+            os.unlink(fifo_path(self.name, slot))
+        os.close(self.wakeups)
+        os.unlink(fifo_path(self.name))
+        self.control.close()
+        self.control.unlink()
+
+
+def read_control(segment) -> Dict[str, Any]:
+    fields = dict(zip(CONTROL_FIELDS, CONTROL.unpack_from(segment.buf, 0)))
+    for field in ("magic", "model_version", "error"):
+        fields[field] = fields[field].rstrip(b"\0").decode("utf-8", errors="replace")
+    return fields
+
+
+class InferenceClient:
+    """HTTP-worker side of the inference server: claims a slot and awaits results
+
+    A watch task (re)connects whenever the server (re)appears and notices
+    when it stops heart-beating; responses are read as soon as the server
+    rings the slot's FIFO. A request not answered within ``timeout``
+    seconds fails.
+    """
+
+    def __init__(self, name: str, num_labels: int, timeout: float = 30.0):
+        self.name = name
+        self.num_labels = num_labels
+        self.timeout = timeout
+        self.slot: Optional[int] = None
+        self._control = None
+        self._requests: Optional[ShmRing] = None
+        self._responses: Optional[ShmRing] = None
+        self._lock_fd: Optional[int] = None
+        self._doorbell: Optional[int] = None
+        self._wakeups: Optional[int] = None
+        self._pending: Dict[int, asyncio.Future] = {}
+        self._connection_tag = 0
+        self._next_sequence = 0
+        self._watch: Optional[asyncio.Task] = None
+        self._requests_sent = 0
+        self._texts_sent = 0
+        self._rejected = 0
+        self._orphaned = 0
+        self._timed_out = 0
+
+    async def start(self):
+        """Start watching for the server"""
+        if self._watch is None:
+            self._watch = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._watch is not None:
+            self._watch.cancel()
+            try:
+                await self._watch
+            except asyncio.CancelledError:
+                pass
+            self._watch = None
+        self.disconnect("Inference client stopped")
+
+    def connect(self):
+        """Attach to the server's segments and claim a free slot"""
+        control = attach_segment(f"{self.name}-ctl")
+        fields = read_control(control)
+        if fields["magic"] != MAGIC.decode():
+            control.close()
+            raise RuntimeError(f"{self.name}-ctl is not an inference server segment")
+
+        for slot in range(fields["slots"]):
+            lock_fd = os.open(os.path.join(tempfile.gettempdir(), f"{self.name}-slot{slot}.lock"),
+                              os.O_RDWR | os.O_CREAT, 0o600)
+            try:
+                fcntl.flock(lock_fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                os.close(lock_fd)
+                continue
+            request_name, response_name = segment_names(self.name, slot)
+            self._control = control
+            self._lock_fd = lock_fd
+            self._requests = ShmRing.attach(request_name)
+            self._responses = ShmRing.attach(response_name)
+            # Answers meant for a previous worker in this slot are of no use.
+            # Requests it left in the request ring may still be answered, so
+            # ids are tagged per connection and those answers match nothing.
+            self._responses.discard()
+            self._connection_tag = random.getrandbits(CONNECTION_TAG_BITS) << CONNECTION_TAG_BITS
+            self._next_sequence = 0
+            self._wakeups = open_fifo(fifo_path(self.name))
+            self._doorbell = open_fifo(fifo_path(self.name, slot))
+            asyncio.get_running_loop().add_reader(self._doorbell, self._on_doorbell)
+            self.slot = slot
+            logger.info(f"Attached to inference server {self.name} (pid {fields['pid']}) on slot {slot}")
+            return
+
+        control.close()
+        raise RuntimeError(f"All {fields['slots']} inference server slots are taken")
+
+    def disconnect(self, reason: str):
+        """Release the slot and fail every request still waiting on it"""
+        for future in self._pending.values():
+            if not future.done():
+                future.set_exception(RuntimeError(reason))
+        self._pending.clear()
+        if self.slot is None:
+            return
+        asyncio.get_running_loop().remove_reader(self._doorbell)
+        os.close(self._doorbell)
+        os.close(self._wakeups)
+        self._requests.close()
+        self._responses.close()
+        self._control.close()
+        os.close(self._lock_fd)  # Releases the flock
+        self.slot = None
+        self._control = self._requests = self._responses = None
+        logger.warning(f"Detached from inference server {self.name}: {reason}")
+
+    def server_status(self) -> Dict[str, Any]:
+        if self.slot is None:
+            return {"state": "unavailable", "error": None}
+        fields = read_control(self._control)
+        state = STATE_NAMES.get(fields["state"], "unknown")
+        if state in ("loading", "ready") and time.time() - fields["heartbeat"] > HEARTBEAT_TIMEOUT:
+            state = "unresponsive"
+        return {
+            "state": state,
+            "error": fields["error"] or None,
+            "pid": fields["pid"],
+            "model_version": fields["model_version"],
+            "batches": fields["batches"],
+            "requests": fields["requests"],
+            "texts": fields["texts"],
+            "mean_batch_size": fields["texts"] / fields["batches"] if fields["batches"] else 0.0,
+        }
+
+    @property
+    def ready(self) -> bool:
+        return self.server_status()["state"] == "ready"
+
+    async def _run(self):
+        while True:
+            if self.slot is None:
+                try:
+                    self.connect()
+                except FileNotFoundError:
+                    pass  # Server not started yet
+                except Exception as e:
+                    logger.warning(f"Could not attach to inference server {self.name}: {e}")
+            else:
+                state = self.server_status()["state"]
+                if state in ("stopped", "unresponsive"):
+                    self.disconnect(f"Inference server is {state}")
+            await asyncio.sleep(HEARTBEAT_INTERVAL)
+
+    def _on_doorbell(self):
+        drain_fifo(self._doorbell)
+        while True:
+            record = self._responses.get()
+            if record is None:
+                return
+            request_id, status, payload = decode_response(record, self.num_labels)
+            future = self._pending.pop(request_id, None)
+            if future is None or future.done():
+                self._orphaned += 1
+            elif status == STATUS_OK:
+                future.set_result(payload)
+            else:
+                future.set_exception(RuntimeError(payload))
+
+    async def predict(self, texts: List[str]) -> np.ndarray:
+        """Score texts on the server; returns one row of class probabilities per text"""
+        if self.slot is None:
+            raise RuntimeError("Inference server not connected")
+        request_id = self._connection_tag | (self._next_sequence & SEQUENCE_MASK)
+        self._next_sequence += 1
+        record = encode_request(request_id, texts)
+        if not self._requests.fits(record):
+            raise RequestTooLarge(
+                f"Request of {len(record)} bytes exceeds the inference server's "
+                f"{self._requests.capacity}-byte request ring"
+            )
+        if not self._requests.put(record):
+            self._rejected += 1
+            raise InferenceOverloaded(f"Inference server request ring full (slot {self.slot})")
+
+        future = asyncio.get_running_loop().create_future()
+        self._pending[request_id] = future
+        self._requests_sent += 1
+        self._texts_sent += len(texts)
+        ring_doorbell(self._wakeups)
+        try:
+            return await asyncio.wait_for(future, self.timeout)
+        except asyncio.TimeoutError:
+            # E.g. the server dropped the response because this slot's ring was full
+            self._timed_out += 1
+            raise InferenceOverloaded(f"Inference server did not answer within {self.timeout:g}s")
+        finally:
+            self._pending.pop(request_id, None)
+
+    def stats(self) -> Dict[str, Any]:
+        """Traffic sent from this worker plus the server's batch counters"""
+        return {
+            "name": self.name,
+            "slot": self.slot,
+            "pending": len(self._pending),
+            "requests_sent": self._requests_sent,
+            "texts_sent": self._texts_sent,
+            "rejected": self._rejected,
+            "orphaned_responses": self._orphaned,
+            "timed_out": self._timed_out,
+            "server": self.server_status(),
+        }
+
+
+def main():
+    logging.basicConfig(level=logging.INFO)
+    import main as service
+
+    if not service.INFERENCE_SERVER:
+        raise SystemExit("Set ML_INFERENCE_SERVER to the shared memory name the HTTP workers use")
+
+    server = InferenceServer(
+        service.INFERENCE_SERVER,
+        slots=service.INFERENCE_SERVER_SLOTS,
+        request_ring_bytes=service.INFERENCE_RING_BYTES,
+        response_ring_bytes=service.INFERENCE_RING_BYTES // 16,
+        max_batch_size=service.BATCH_MAX_SIZE,
+        max_wait_ms=service.BATCH_MAX_WAIT_MS,
+    )
+    signal.signal(signal.SIGTERM, lambda *_: server.stopping.set())
+    signal.signal(signal.SIGINT, lambda *_: server.stopping.set())
+    logger.info(f"Inference server {service.INFERENCE_SERVER} listening on {len(server.requests)} slots")
+
+    try:
+        try:
+            service.load_and_warm_up()
+        except Exception as e:
+            # Stay up so the workers' /ready reports the failure
+            logger.error(f"Model failed to load: {e}")
+            server.set_state(FAILED, error=str(e))
+            server.stopping.wait()
+        else:
+            # The autotuner may have picked a different batch size
+            server.max_batch_size = service.BATCH_MAX_SIZE
+            server.set_state(READY, model_version=service.MODEL_VERSION)
+            server.serve(service.predict_fraud_batch, service.LABELS)
+    finally:
+        server.close()
+        logger.info("Inference server stopped")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+import re
+from typing import Dict, Iterable, List, Optional, Tuple
+
+
+def load_keywords(path: str) -> List[str]:
+    """Read keywords from a file, one per line; blank lines and '#' comments are skipped"""
+    keywords = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            keyword = line.split("#", 1)[0].strip()
+            if keyword:
+                keywords.append(keyword)
+    return keywords
+
+
+def _is_word_char(ch: str) -> bool:
+    return ch.isalnum() or ch == "_"
+
+
+class KeywordMatcher:
+    """Find every keyword in a text with a single regex pass
+
+    The keywords are compiled into one trie-shaped alternation, so the work
+    done at each text position depends on the length of the keywords rather
+    than on how many there are.
+
+    Keywords match anywhere in the text, as substrings. With
+    ``word_boundary`` set they only match as whole words, so 'account' no
+    longer matches inside 'accountant'.
+    """
+
+    def __init__(self, keywords: Iterable[str], word_boundary: bool = False):
+        self.word_boundary = word_boundary
+        self.keywords = list(dict.fromkeys(k.lower() for k in keywords if k.strip()))
+        if not self.keywords:
+            raise ValueError("KeywordMatcher needs at least one keyword")
+        self.index = {keyword: i for i, keyword in enumerate(self.keywords)}
+        self._casefolded = {keyword.casefold(): keyword for keyword in reversed(self.keywords)}
+
+        trie = self._build_trie(self.keywords)
+        self._implied = self._find_implied(trie)
+
+        keyword_group = f"({self._trie_pattern(trie)})"
+        if word_boundary:
+            pattern = rf"(?<!\w)(?={keyword_group}(?!\w))"
+        else:
+            pattern = rf"(?={keyword_group})"
+        # Zero-width lookahead so keywords nested in other keywords
+        # (e.g. 'account' in 'bank account') are found too. Matching runs on
+        # lowercased text, which is cheaper than a case-insensitive pattern.
+        self._pattern = re.compile(pattern)
+        self._pattern_ignorecase = re.compile(pattern, re.IGNORECASE)
+
+    @staticmethod
+    def _build_trie(keywords: List[str]) -> Dict:
+        trie: Dict = {}
+        for keyword in keywords:
+            node = trie
+            for ch in keyword:
+                node = node.setdefault(ch, {})
+            node[""] = keyword
+        return trie
+
+    def _trie_pattern(self, node: Dict) -> str:
+        """Render a trie as a regex; the greedy '?' makes longer keywords win"""
+        branches = [re.escape(ch) + self._trie_pattern(child) for ch, child in sorted(node.items()) if ch]
+        if not branches:
+            return ""
+        terminal = "" in node
+        if len(branches) == 1 and not terminal:
+            return branches[0]
+        return "(?:" + "|".join(branches) + ")" + ("?" if terminal else "")
+
+    def _find_implied(self, trie: Dict) -> Dict[str, List[str]]:
+        """For each keyword, the shorter keywords that are prefixes of it
+
+        The regex reports only the longest keyword at a position, so e.g.
+        'verify identity' also has to count 'verify'.
+        """
+        implied = {}
+        for keyword in self.keywords:
+            node = trie
+            prefixes = []
+            for i, ch in enumerate(keyword[:-1]):
+                node = node[ch]
+                if "" in node and (not self.word_boundary or not _is_word_char(keyword[i + 1])):
+                    prefixes.append(node[""])
+            if prefixes:
+                implied[keyword] = prefixes
+        return implied
+
+    def _canonical(self, matched: str) -> str:
+        """The keyword a matched span stands for
+
+        Case-insensitive matching also accepts fold-equivalent characters
+        (e.g. 'ſcam' for 'scam') that don't lowercase to the keyword.
+        """
+        keyword = matched.lower()
+        if keyword in self.index:
+            return keyword
+        keyword = self._casefolded.get(matched.casefold())
+        if keyword is not None:
+            return keyword
+        return next(k for k in self.keywords if re.fullmatch(re.escape(k), matched, re.IGNORECASE))
+
+    def scan(self, text: str) -> Tuple[List[Tuple[str, int, int]], int]:
+        """Return (keyword, start, end) for every match plus the text's word count"""
+        text_lower = text.lower()
+        if len(text_lower) == len(text):
+            found = self._pattern.finditer(text_lower)
+        else:
+            # Some characters change length when lowercased; keep spans exact
+            found = self._pattern_ignorecase.finditer(text)
+
+        matches = []
+        for m in found:
+            keyword = self._canonical(m.group(1))
+            start = m.start()
+            matches.append((keyword, start, m.end(1)))
+            for prefix in self._implied.get(keyword, ()):
+                matches.append((prefix, start, start + len(prefix)))
+        return matches, len(text.split())
+
+
+def build_matcher(keywords: List[str], keywords_path: Optional[str] = None, word_boundary: bool = False) -> KeywordMatcher:
+    """Build a matcher from a keyword file if given, else from the default list"""
+    if keywords_path:
+        keywords = load_keywords(keywords_path)
+    return KeywordMatcher(keywords, word_boundary=word_boundary)
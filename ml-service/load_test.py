@@ -0,0 +1,414 @@
+#!/usr/bin/env python3
+"""
+Load generator and latency-SLO check for the ML service
+
+Drives /predict or /predict/batch with messages drawn from the scam/legit
+corpora of the test scripts plus synthetic messages (which carry random
+names, amounts and links, so they don't all hit the result cache). Two load
+models:
+
+- closed loop (--concurrency N): N clients, each sending its next request as
+  soon as the previous one returns
+- open loop (--rate R): requests arrive at R per second (Poisson by default)
+  whether or not earlier ones have returned; latency is measured from the
+  scheduled arrival, so a stalled server can't hide its queueing delay
+
+Reports throughput, p50/p95/p99/max latency, error rate and status codes,
+and exits with status 1 when any --slo-* threshold is missed.
+
+With --in-process the requests go straight to the ASGI app without a
+network. The model is replaced by a stub tokenizer and backend that cost a
+configurable amount of time per batch and per token, so batching, caching,
+the executor and serialization run for real without a model download
+(pass --model to load a real model instead).
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import random
+import string
+import sys
+import time
+import zlib
+from collections import Counter
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+# Messages from test_prediction.py, test_system.py and test_message_analysis.py
+SCAM_MESSAGES = [
+    "Your account has been suspended due to suspicious activity. Click here to verify your identity immediately.",
+    "You have won a prize! Claim your reward now by providing your personal information.",
+    "Your account has been compromised. Please call this number immediately.",
+    "I need to verify my account information",
+    "URGENT: Click here to verify your account: http://fake.com",
+    "URGENT: Your bank account has been suspended due to suspicious activity.\n"
+    "Click here to verify your identity immediately: http://fake-bank.com/verify\n"
+    "This is the IRS. You owe $5000 in back taxes. Pay now or face arrest.\n"
+    "Your computer has been infected with a virus. Call 1-800-FAKE-NUMBER.",
+    "Hello, this is Microsoft Support calling about your computer.\n"
+    "We detected a virus on your system and need to help you remove it.\n"
+    "Please call us back at 1-800-FAKE-NUMBER immediately.\n"
+    "Your computer security is at risk.",
+]
+
+LEGIT_MESSAGES = [
+    "Hello, this is a reminder about your upcoming appointment.",
+    "Hi, this is a reminder that your Amazon order #123-4567890-1234567 has been shipped.\n"
+    "You can track your package at amazon.com/orders.\n"
+    "Expected delivery: Tomorrow by 8 PM.\n"
+    "Thank you for shopping with Amazon!",
+]
+
+SCAM_TEMPLATES = [
+    "URGENT: your {bank} account is locked. Verify within {hours} hours at {url} or it will be closed.",
+    "Congratulations {name}! You won a ${amount} gift card. Claim now: {url}",
+    "This is the IRS. You owe ${amount} in back taxes. Call {phone} immediately to avoid arrest.",
+    "{name}, we detected unusual sign-in activity. Confirm your password and SSN at {url}",
+    "Your package could not be delivered. Pay the ${amount} redelivery fee at {url} within {hours} hours.",
+    "Final notice: your {bank} card ending {digits} was charged ${amount}. If this wasn't you call {phone}.",
+]
+
+LEGIT_TEMPLATES = [
+    "Hi {name}, your appointment is confirmed for {day} at {hour}:00. Reply C to cancel.",
+    "Your {bank} statement for {month} is ready to view in the app.",
+    "Hey {name}, running {minutes} minutes late, see you at the cafe.",
+    "Order {digits} has shipped and should arrive {day}. Thanks for shopping with us!",
+    "Reminder: the team meeting moved to {hour}:30 on {day}. Agenda is in the shared folder.",
+    "Thanks {name}, I got the ${amount} for dinner. See you {day}!",
+]
+
+NAMES = ["Alex", "Sam", "Jordan", "Taylor", "Morgan", "Casey", "Riley", "Jamie"]
+BANKS = ["Chase", "Wells Fargo", "Bank of America", "Citi", "Capital One"]
+DAYS = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday"]
+MONTHS = ["January", "March", "May", "July", "September", "November"]
+
+
+class MessageGenerator:
+    """Mixes corpus messages with synthetic scam/legit messages of varying length"""
+
+    def __init__(self, seed: int = 0, synthetic_ratio: float = 0.8, scam_ratio: float = 0.5):
+        self.random = random.Random(seed)
+        self.synthetic_ratio = synthetic_ratio
+        self.scam_ratio = scam_ratio
+
+    def _fill(self, template: str) -> str:
+        r = self.random
+        return template.format(
+            name=r.choice(NAMES),
+            bank=r.choice(BANKS),
+            day=r.choice(DAYS),
+            month=r.choice(MONTHS),
+            hour=r.randint(8, 18),
+            hours=r.choice([2, 12, 24, 48]),
+            minutes=r.randint(5, 30),
+            amount=r.randint(20, 9999),
+            digits="".join(r.choices(string.digits, k=4)),
+            phone=f"1-800-{r.randint(200, 999)}-{r.randint(1000, 9999)}",
+            url=f"http://{''.join(r.choices(string.ascii_lowercase, k=8))}.com/{r.randint(1, 99999)}",
+        )
+
+    def message(self) -> str:
+        r = self.random
+        scam = r.random() < self.scam_ratio
+        if r.random() >= self.synthetic_ratio:
+            return r.choice(SCAM_MESSAGES if scam else LEGIT_MESSAGES)
+        templates = SCAM_TEMPLATES if scam else LEGIT_TEMPLATES
+        # Mostly SMS-sized, sometimes a few sentences, rarely a long email
+        sentences = r.choices([1, 3, 20], weights=[80, 17, 3])[0]
+        return " ".join(self._fill(r.choice(templates)) for _ in range(sentences))
+
+    def messages(self, count: int) -> List[str]:
+        return [self.message() for _ in range(count)]
+
+
+class Results:
+    """Latencies and outcomes of every request sent during the run"""
+
+    def __init__(self):
+        self.latencies: List[float] = []
+        self.statuses: Counter = Counter()
+        self.errors = 0
+        self.texts = 0
+
+    def record(self, latency: float, status: str, ok: bool, texts: int):
+        self.latencies.append(latency)
+        self.statuses[status] += 1
+        if ok:
+            self.texts += texts
+        else:
+            self.errors += 1
+
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, math.ceil(q / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+async def send(client: httpx.AsyncClient, args, generator: MessageGenerator,
+               results: Results, started: Optional[float] = None):
+    """Send one request and record its latency (from ``started`` when given)"""
+    if args.endpoint == "batch":
+        texts = generator.messages(args.batch_size)
+        path, payload = "/predict/batch", {"texts": texts}
+    else:
+        texts = [generator.message()]
+        path, payload = "/predict", {"text": texts[0]}
+
+    started = time.perf_counter() if started is None else started
+    try:
+        response = await client.post(path, json=payload, timeout=args.timeout)
+        status, ok = str(response.status_code), response.status_code == 200
+    except httpx.TimeoutException:
+        status, ok = "timeout", False
+    except httpx.HTTPError as e:
+        status, ok = type(e).__name__, False
+    results.record(time.perf_counter() - started, status, ok, len(texts))
+
+
+async def closed_loop(client: httpx.AsyncClient, args, generator: MessageGenerator, results: Results):
+    """``--concurrency`` clients back to back until the duration or request budget runs out"""
+    deadline = time.perf_counter() + args.duration
+    remaining = [args.requests]
+
+    async def client_loop():
+        while time.perf_counter() < deadline:
+            if args.requests:
+                if remaining[0] <= 0:
+                    return
+                remaining[0] -= 1
+            await send(client, args, generator, results)
+
+    await asyncio.gather(*(client_loop() for _ in range(args.concurrency)))
+
+
+async def open_loop(client: httpx.AsyncClient, args, generator: MessageGenerator, results: Results):
+    """Requests arrive at ``--rate`` per second regardless of how fast the server answers"""
+    arrivals = random.Random(args.seed + 1)
+    tasks = set()
+    start = time.perf_counter()
+    scheduled = start
+    sent = 0
+
+    while scheduled - start < args.duration and (not args.requests or sent < args.requests):
+        delay = scheduled - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        if len(tasks) >= args.max_in_flight:
+            # Shed instead of queueing in the client, and count it against the server
+            results.record(0.0, "client_overflow", False, 0)
+        else:
+            task = asyncio.create_task(send(client, args, generator, results, started=scheduled))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+        sent += 1
+        gap = arrivals.expovariate(args.rate) if args.arrivals == "poisson" else 1.0 / args.rate
+        scheduled += gap
+
+    if tasks:
+        await asyncio.gather(*tasks)
+
+
+def summarize(results: Results, elapsed: float) -> Dict[str, Any]:
+    latencies = sorted(results.latencies)
+    total = len(latencies)
+    return {
+        "requests": total,
+        "texts": results.texts,
+        "duration_s": round(elapsed, 3),
+        "throughput_rps": round(total / elapsed, 2) if elapsed else 0.0,
+        "texts_per_s": round(results.texts / elapsed, 2) if elapsed else 0.0,
+        "error_rate": round(results.errors / total, 4) if total else 0.0,
+        "latency_ms": {
+            "p50": round(percentile(latencies, 50) * 1000, 2),
+            "p95": round(percentile(latencies, 95) * 1000, 2),
+            "p99": round(percentile(latencies, 99) * 1000, 2),
+            "max": round(latencies[-1] * 1000, 2) if latencies else 0.0,
+            "mean": round(sum(latencies) / total * 1000, 2) if total else 0.0,
+        },
+        "status_counts": dict(results.statuses.most_common()),
+    }
+
+
+def check_slos(summary: Dict[str, Any], args) -> List[str]:
+    """Return one message per missed SLO"""
+    failures = []
+    latency = summary["latency_ms"]
+    for name, limit in (("p50", args.slo_p50_ms), ("p95", args.slo_p95_ms), ("p99", args.slo_p99_ms)):
+        if limit is not None and latency[name] > limit:
+            failures.append(f"{name} latency {latency[name]:.1f}ms > {limit:.1f}ms")
+    if args.slo_error_rate is not None and summary["error_rate"] > args.slo_error_rate:
+        failures.append(f"error rate {summary['error_rate']:.2%} > {args.slo_error_rate:.2%}")
+    if args.slo_min_rps is not None and summary["throughput_rps"] < args.slo_min_rps:
+        failures.append(f"throughput {summary['throughput_rps']:.1f} req/s < {args.slo_min_rps:.1f} req/s")
+    if summary["requests"] == 0:
+        failures.append("no requests completed")
+    return failures
+
+
+class StubTokenizer:
+    """Whitespace tokenizer with the call signature predict_fraud_batch uses"""
+
+    pad_token_id = 0
+
+    def __call__(self, texts: List[str], truncation: bool = True, max_length: int = 512,
+                 stride: int = 0, return_overflowing_tokens: bool = False, **kwargs):
+        encodings = {"input_ids": [], "attention_mask": [], "overflow_to_sample_mapping": []}
+        body = max_length - 2
+        for owner, text in enumerate(texts):
+            ids = [1000 + zlib.crc32(word.encode("utf-8")) % 29000 for word in text.lower().split()]
+            starts = [0]
+            if return_overflowing_tokens and len(ids) > body:
+                starts = list(range(0, len(ids) - stride, body - stride))
+            for start in starts:
+                window = [101] + ids[start:start + body] + [102]
+                encodings["input_ids"].append(window)
+                encodings["attention_mask"].append([1] * len(window))
+                encodings["overflow_to_sample_mapping"].append(owner)
+        return encodings
+
+
+def install_stub_model(service, batch_ms: float, token_us: float):
+    """Swap model loading for a stub backend whose cost scales with batch and token count"""
+    from backends import InferenceBackend
+    import numpy as np
+
+    class StubBackend(InferenceBackend):
+        name = "stub"
+
+        def logits(self, inputs):
+            ids = inputs["input_ids"].numpy()
+            time.sleep(batch_ms / 1000 + ids.size * token_us / 1e6)
+            # Deterministic per text, spread over all three labels
+            seed = (ids.sum(axis=1) % 997).astype(np.float32) / 997
+            return np.stack([1 - seed, np.full_like(seed, 0.5), seed], axis=1) * 4
+
+    def load_stub():
+        service.activate_model(service.LoadedModel("stub", StubBackend(), StubTokenizer()))
+        service.model_ready = True
+
+    service.load_and_warm_up = load_stub
+
+
+async def wait_until_ready(client: httpx.AsyncClient, timeout: float):
+    """Poll /ready so model loading isn't counted as latency"""
+    deadline = time.perf_counter() + timeout
+    while True:
+        try:
+            if (await client.get("/ready", timeout=5)).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        if time.perf_counter() > deadline:
+            raise RuntimeError(f"Service not ready after {timeout:.0f}s")
+        await asyncio.sleep(0.5)
+
+
+async def run(args) -> Dict[str, Any]:
+    service = None
+    if args.in_process:
+        import os
+        if args.model:
+            os.environ["MODEL_PATH"] = args.model
+        import main as service
+
+        if not args.model:
+            install_stub_model(service, args.stub_batch_ms, args.stub_token_us)
+        if args.no_cache:
+            service.CACHE_ENABLED = False
+        # httpx's ASGI transport doesn't run lifespan events, so start the app by hand
+        await service.startup_event()
+        transport = httpx.ASGITransport(app=service.app)
+        client = httpx.AsyncClient(transport=transport, base_url="http://load-test")
+    else:
+        limits = httpx.Limits(max_connections=max(args.concurrency, args.max_in_flight))
+        client = httpx.AsyncClient(base_url=args.url, limits=limits)
+
+    try:
+        await wait_until_ready(client, args.ready_timeout)
+        generator = MessageGenerator(args.seed, args.synthetic_ratio, args.scam_ratio)
+        results = Results()
+        start = time.perf_counter()
+        if args.rate:
+            await open_loop(client, args, generator, results)
+        else:
+            await closed_loop(client, args, generator, results)
+        return summarize(results, time.perf_counter() - start)
+    finally:
+        await client.aclose()
+        if service is not None:
+            await service.shutdown_event()
+
+
+def print_report(summary: Dict[str, Any], args):
+    mode = f"open loop at {args.rate:g} req/s ({args.arrivals})" if args.rate else f"{args.concurrency} concurrent clients"
+    target = "in-process" + (" (stub model)" if not args.model else "") if args.in_process else args.url
+    latency = summary["latency_ms"]
+    print(f"\n📊 {summary['requests']} requests to {args.endpoint} on {target}, {mode}")
+    print("=" * 60)
+    print(f"Throughput: {summary['throughput_rps']:.1f} req/s ({summary['texts_per_s']:.1f} texts/s) "
+          f"over {summary['duration_s']:.1f}s")
+    print(f"Latency:    p50 {latency['p50']:.1f}ms  p95 {latency['p95']:.1f}ms  "
+          f"p99 {latency['p99']:.1f}ms  max {latency['max']:.1f}ms")
+    print(f"Errors:     {summary['error_rate']:.2%}")
+    print("Statuses:   " + ", ".join(f"{status}={count}" for status, count in summary["status_counts"].items()))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://localhost:8000", help="Service base URL")
+    parser.add_argument("--in-process", action="store_true", help="Drive the ASGI app directly, no network")
+    parser.add_argument("--model", default="", help="With --in-process: load this model instead of the stub")
+    parser.add_argument("--endpoint", choices=["predict", "batch"], default="predict")
+    parser.add_argument("--batch-size", type=int, default=16, help="Texts per /predict/batch request")
+
+    load = parser.add_mutually_exclusive_group()
+    load.add_argument("--concurrency", type=int, default=8, help="Closed-loop clients (default)")
+    load.add_argument("--rate", type=float, default=0.0, help="Open-loop arrival rate in requests/second")
+    parser.add_argument("--arrivals", choices=["poisson", "uniform"], default="poisson",
+                        help="Inter-arrival distribution for --rate")
+    parser.add_argument("--max-in-flight", type=int, default=1000,
+                        help="Open loop: arrivals beyond this many outstanding requests count as errors")
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds to generate load")
+    parser.add_argument("--requests", type=int, default=0, help="Stop after this many requests (0: no limit)")
+    parser.add_argument("--timeout", type=float, default=30.0, help="Per-request timeout in seconds")
+    parser.add_argument("--ready-timeout", type=float, default=300.0, help="Seconds to wait for /ready")
+
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--synthetic-ratio", type=float, default=0.8,
+                        help="Share of synthetic messages; the rest come from the test corpora")
+    parser.add_argument("--scam-ratio", type=float, default=0.5)
+    parser.add_argument("--no-cache", action="store_true", help="With --in-process: disable the result cache")
+    parser.add_argument("--stub-batch-ms", type=float, default=2.0, help="Stub model cost per forward pass")
+    parser.add_argument("--stub-token-us", type=float, default=20.0, help="Stub model cost per token")
+
+    parser.add_argument("--slo-p50-ms", type=float, help="Fail if p50 latency exceeds this")
+    parser.add_argument("--slo-p95-ms", type=float, help="Fail if p95 latency exceeds this")
+    parser.add_argument("--slo-p99-ms", type=float, help="Fail if p99 latency exceeds this")
+    parser.add_argument("--slo-error-rate", type=float, help="Fail if the error rate (0-1) exceeds this")
+    parser.add_argument("--slo-min-rps", type=float, help="Fail if throughput falls below this")
+    parser.add_argument("--json", action="store_true", help="Print the summary as JSON")
+    args = parser.parse_args()
+
+    summary = asyncio.run(run(args))
+    failures = check_slos(summary, args)
+    summary["slo_failures"] = failures
+
+    if args.json:
+        print(json.dumps(summary, indent=2))
+    else:
+        print_report(summary, args)
+        for failure in failures:
+            print(f"❌ SLO missed: {failure}")
+        if not failures:
+            print("✅ All SLOs met")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,128 +1,1159 @@
-from fastapi import FastAPI, HTTPException
-from pydantic import BaseModel
-import torch
-from transformers import AutoTokenizer, AutoModelForSequenceClassification
+import time
+IMPORT_STARTED = time.perf_counter()
+
+from fastapi import FastAPI, Header, HTTPException, Request
+from fastapi.responses import JSONResponse, ORJSONResponse, Response
+from pydantic import BaseModel, ConfigDict, Field
 import numpy as np
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional
+import asyncio
+import gc
+import hmac
 import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing
+
+# torch and transformers are imported lazily (see load_model) so the server
+# binds its port right away while the model loads in the background
+import autotune
+import metrics
+import profiling
+import request_log
+import serialization
+import timing
+from batching import MicroBatcher
+from cache import PredictionCache
+from campaigns import CampaignIndex
+from cascade import CascadeRouter
+from executor import InferenceExecutor, InferenceOverloaded, configure_torch_threads, prefetch
+from inference_server import InferenceClient, RequestTooLarge
+from main_simple import predict_fraud_simple_batch
+from registry import (
+    EXIT_HEADS_FILE, ONNX_FILE, QUANTIZED_WEIGHTS_FILE, TORCHSCRIPT_FILE, ModelRegistry, UnknownModelVersion
+)
+from metrics import MetricsMiddleware
+from streaming import NDJSON_MEDIA_TYPE, DuplexStreamingResponse, score_ndjson
+
+# Configure logging: records are written by a background thread. Successful
+# predictions are logged at LOG_SAMPLE_RATE, errors and requests slower than
+# LOG_SLOW_MS always; message text is logged as a keyed hash by default
+# (LOG_TEXT=redact drops it, LOG_TEXT=raw logs the first 50 characters)
+LOG_FORMAT = os.getenv("ML_LOG_FORMAT", "json").lower()
+LOG_QUEUE_SIZE = int(os.getenv("ML_LOG_QUEUE_SIZE", "10000"))
+LOG_SAMPLE_RATE = float(os.getenv("ML_LOG_SAMPLE_RATE", "0.01"))
+LOG_SLOW_MS = float(os.getenv("ML_LOG_SLOW_MS", "500"))
+LOG_TEXT = os.getenv("ML_LOG_TEXT", "hash").lower()
+LOG_HASH_KEY = os.getenv("ML_LOG_HASH_KEY", "")
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
+request_log.configure_logging(LOG_FORMAT, logging.INFO, LOG_QUEUE_SIZE)
 logger = logging.getLogger(__name__)
+request_logger = request_log.RequestLogger(
+    logging.getLogger("fraudshield.requests"),
+    sample_rate=LOG_SAMPLE_RATE,
+    slow_ms=LOG_SLOW_MS,
+    text_mode=LOG_TEXT,
+    hash_key=LOG_HASH_KEY,
+)
+
+app = FastAPI(title="FraudShield ML Service", version="1.0.0", default_response_class=ORJSONResponse)
+# Routes accept msgpack request bodies as well as JSON (see serialization.py)
+app.router.route_class = serialization.NegotiatedRoute
+app.add_middleware(
+    MetricsMiddleware,
+    paths=["/predict", "/predict/batch", "/predict/stream", "/health", "/ready", "/metrics"]
+)
+
+class LoadedModel:
+    """One model version and everything needed to run it, swapped in and out as a unit"""
+    
+    def __init__(self, version: str, backend, tokenizer, model=None, source: str = ""):
+        self.version = version
+        self.backend = backend
+        self.tokenizer = tokenizer
+        self.model = model
+        self.source = source
+        self.in_flight = 0
+        self._lock = threading.Lock()
+    
+    def acquire(self):
+        with self._lock:
+            self.in_flight += 1
+    
+    def release(self):
+        with self._lock:
+            self.in_flight -= 1
+    
+    def close(self):
+        """Drop the references that keep the weights alive"""
+        self.backend = self.model = self.tokenizer = None
+
+# The model serving predictions; a model call keeps using the version it
+# started on even if another one is activated meanwhile
+active_model: Optional[LoadedModel] = None
+# Held while activating a model and while a call pins the active one, so a
+# swap never sees an idle previous model that a call is about to use
+active_model_lock = threading.Lock()
+
+# Status of the last hot swap (see POST /admin/models/{version}/activate)
+model_swap: Dict[str, Any] = {}
+
+# Readiness: set once the model is loaded and warmed up
+model_ready = False
+startup_error = None
+startup_timings: Dict[str, float] = {}
+
+# Batching configuration
+BATCHING_ENABLED = os.getenv("ML_BATCHING_ENABLED", "true").lower() == "true"
+BATCH_MAX_SIZE = int(os.getenv("ML_BATCH_MAX_SIZE", "16"))
+BATCH_MAX_WAIT_MS = float(os.getenv("ML_BATCH_MAX_WAIT_MS", "5"))
+BULK_MAX_TEXTS = int(os.getenv("ML_BULK_MAX_TEXTS", "256"))
+
+# Streaming NDJSON scoring: records scored per chunk and the longest accepted line
+STREAM_CHUNK_SIZE = int(os.getenv("ML_STREAM_CHUNK_SIZE", "64"))
+STREAM_MAX_LINE_BYTES = int(os.getenv("ML_STREAM_MAX_LINE_BYTES", str(1 << 20)))
+
+# Pipelined scoring: calls with more than BATCH_MAX_SIZE texts are split into
+# chunks that are tokenized on a separate pool while the model runs the
+# previous chunk, with at most PIPELINE_DEPTH chunks prepared ahead
+# (TOKENIZER_THREADS 0 = one per inference worker)
+PIPELINE_ENABLED = os.getenv("ML_PIPELINE_ENABLED", "true").lower() == "true"
+PIPELINE_DEPTH = int(os.getenv("ML_PIPELINE_DEPTH", "2"))
+TOKENIZER_THREADS = int(os.getenv("ML_TOKENIZER_THREADS", "0"))
+
+# Long messages: raw input is clipped to MAX_INPUT_CHARS before tokenizing,
+# then (in long-text mode) scored as overlapping MAX_TOKENS windows instead
+# of being truncated at the first window
+MAX_TOKENS = 512
+MAX_INPUT_CHARS = int(os.getenv("ML_MAX_INPUT_CHARS", "8000"))
+LONG_TEXT_WINDOWS = os.getenv("ML_LONG_TEXT_WINDOWS", "true").lower() == "true"
+WINDOW_OVERLAP = int(os.getenv("ML_WINDOW_OVERLAP_TOKENS", "128"))
+
+# Inference concurrency: workers running forward passes, torch threads per
+# worker (0 = split the cores evenly) and how many calls may wait before 503s
+INFERENCE_WORKERS = int(os.getenv("ML_INFERENCE_WORKERS", "1"))
+TORCH_THREADS = int(os.getenv("ML_TORCH_THREADS", "0"))
+INFERENCE_MAX_PENDING = int(os.getenv("ML_INFERENCE_MAX_PENDING", "256"))
+INTEROP_THREADS = 1
+
+# Startup autotuning of torch threads, batch size and inference workers (see
+# autotune.py): "on" reuses the stored profile for this host shape and
+# calibrates when there is none, "force" always calibrates. Settings given
+# explicitly via their environment variables are kept as they are
+AUTOTUNE = os.getenv("ML_AUTOTUNE", "off").lower()
+AUTOTUNE_PROFILE_PATH = os.getenv("ML_AUTOTUNE_PROFILE", "autotune.json")
+AUTOTUNE_LATENCY_MS = float(os.getenv("ML_AUTOTUNE_LATENCY_MS", "250"))
+AUTOTUNE_BATCH_SIZES = [int(n) for n in os.getenv("ML_AUTOTUNE_BATCH_SIZES", "4,8,16,32").split(",") if n]
+AUTOTUNE_TRIAL_SECONDS = float(os.getenv("ML_AUTOTUNE_TRIAL_SECONDS", "1"))
+AUTOTUNE_TOKENS = int(os.getenv("ML_AUTOTUNE_TOKENS", "128"))
+
+# Dedicated inference process: when a name is set, HTTP workers don't load the
+# model but send texts over shared memory to `python inference_server.py`
+# started with the same name, which batches across all workers
+INFERENCE_SERVER = os.getenv("ML_INFERENCE_SERVER", "")
+INFERENCE_SERVER_SLOTS = int(os.getenv("ML_INFERENCE_SERVER_SLOTS", "8"))
+INFERENCE_RING_BYTES = int(os.getenv("ML_INFERENCE_RING_BYTES", str(16 << 20)))
+INFERENCE_SERVER_TIMEOUT = float(os.getenv("ML_INFERENCE_SERVER_TIMEOUT_SECONDS", "30"))
 
-app = FastAPI(title="FraudShield ML Service", version="1.0.0")
+# Optional int8 inference: "dynamic" quantizes the Linear layers at load time;
+# a weights path loads a state dict saved from an already-quantized model
+QUANTIZED_WEIGHTS_PATH = os.getenv("ML_QUANTIZED_WEIGHTS_PATH", "")
+QUANTIZATION = os.getenv("ML_QUANTIZATION", "dynamic" if QUANTIZED_WEIGHTS_PATH else "").lower()
 
-# Global variables for model and tokenizer
-model = None
-tokenizer = None
+# Inference runtime: "eager" PyTorch, a traced "torchscript" graph, or an
+# exported model on "onnx" Runtime; optional paths cache the converted model.
+# Without ML_ONNX_PATH the export goes to ARTIFACT_DIR, one file per model
+# version; either way it is rebuilt when the model behind it changes.
+BACKEND = os.getenv("ML_BACKEND", "eager").lower()
+TORCHSCRIPT_PATH = os.getenv("ML_TORCHSCRIPT_PATH", "")
+ONNX_PATH = os.getenv("ML_ONNX_PATH", "")
+ARTIFACT_DIR = os.getenv("ML_ARTIFACT_DIR", os.path.join(os.path.expanduser("~"), ".cache", "fraudshield"))
+
+# Early exit (eager backend): heads trained by train_exit_heads.py answer a
+# text from an intermediate layer once their normalized prediction entropy
+# is below EARLY_EXIT_ENTROPY
+EARLY_EXIT = os.getenv("ML_EARLY_EXIT", "false").lower() == "true"
+EARLY_EXIT_HEADS_PATH = os.getenv("ML_EARLY_EXIT_HEADS", "exit_heads.pt")
+EARLY_EXIT_ENTROPY = float(os.getenv("ML_EARLY_EXIT_ENTROPY", "0.2"))
+
+# Model identity; part of every cache key so a new model never serves stale results.
+# MODEL_PATH points at a local artifact directory (config, tokenizer and
+# safetensors weights) so startup never needs the hub cache.
+MODEL_NAME = "bert-base-uncased"
+MODEL_PATH = os.getenv("MODEL_PATH", "")
+MODEL_SOURCE = MODEL_PATH or MODEL_NAME
+
+def source_version(source: str) -> str:
+    """Version for a model directory or hub name: its last path component, marked when quantized"""
+    return os.path.basename(source.rstrip("/")) + ("-int8" if QUANTIZATION else "")
+
+MODEL_VERSION = os.getenv("ML_MODEL_VERSION", source_version(MODEL_SOURCE))
+
+# Optional model registry (see registry.py): a directory of model versions
+# that can be hot-swapped with POST /admin/models/{version}/activate. Its
+# CURRENT version, when set, takes precedence over MODEL_PATH.
+MODEL_REGISTRY = os.getenv("ML_MODEL_REGISTRY", "")
+model_registry = ModelRegistry(MODEL_REGISTRY) if MODEL_REGISTRY else None
+REGISTRY_VERSION = model_registry.current() if model_registry else None
+if REGISTRY_VERSION:
+    try:
+        MODEL_SOURCE = model_registry.path(REGISTRY_VERSION)
+        MODEL_VERSION = REGISTRY_VERSION + ("-int8" if QUANTIZATION else "")
+    except UnknownModelVersion as e:
+        logger.warning(f"Ignoring the registry's CURRENT version: {e}")
+        REGISTRY_VERSION = None
+
+# Cascade: score with the keyword model first and only run BERT when its
+# risk score falls inside [CASCADE_LOW, CASCADE_HIGH)
+CASCADE_ENABLED = os.getenv("ML_CASCADE_ENABLED", "false").lower() == "true"
+CASCADE_LOW = float(os.getenv("ML_CASCADE_LOW", "0.3"))
+CASCADE_HIGH = float(os.getenv("ML_CASCADE_HIGH", "0.8"))
+
+# Campaign index: messages the model scored HIGH/MEDIUM start a cluster, and
+# near duplicates (MinHash similarity >= CAMPAIGN_THRESHOLD) reuse its verdict
+CAMPAIGN_ENABLED = os.getenv("ML_CAMPAIGN_ENABLED", "false").lower() == "true"
+CAMPAIGN_THRESHOLD = float(os.getenv("ML_CAMPAIGN_THRESHOLD", "0.7"))
+CAMPAIGN_MAX_CLUSTERS = int(os.getenv("ML_CAMPAIGN_MAX_CLUSTERS", "10000"))
+CAMPAIGN_TTL_SECONDS = float(os.getenv("ML_CAMPAIGN_TTL_SECONDS", "3600"))
+
+# Admin endpoints (profiling) are disabled unless a token is configured;
+# callers must send it in the X-Admin-Token header
+ADMIN_TOKEN = os.getenv("ML_ADMIN_TOKEN", "")
+MAX_PROFILE_SECONDS = 300
+
+# Token lengths of the synthetic warm-up passes run before reporting ready
+WARMUP_LENGTHS = [int(n) for n in os.getenv("ML_WARMUP_LENGTHS", "16,128,512").split(",") if n]
+
+# Result cache configuration
+CACHE_ENABLED = os.getenv("ML_CACHE_ENABLED", "true").lower() == "true"
+CACHE_MAX_ENTRIES = int(os.getenv("ML_CACHE_MAX_ENTRIES", "100000"))
+CACHE_TTL_SECONDS = float(os.getenv("ML_CACHE_TTL_SECONDS", "3600"))
+CACHE_SNAPSHOT_PATH = os.getenv("ML_CACHE_SNAPSHOT_PATH", "")
+
+# Prediction path metrics, exported on /metrics. Stage times are per model
+# call (one batch), so divide by fraudshield_model_batch_texts for per-text cost.
+STAGE_SECONDS = metrics.histogram(
+    "fraudshield_stage_seconds", "Time spent in each stage of a model call", ["stage"]
+)
+TOKENIZE_SECONDS = STAGE_SECONDS.labels("tokenize")
+FORWARD_SECONDS = STAGE_SECONDS.labels("forward")
+POSTPROCESS_SECONDS = STAGE_SECONDS.labels("postprocess")
+REMOTE_SECONDS = STAGE_SECONDS.labels("inference_server")
+MODEL_BATCH_TEXTS = metrics.histogram(
+    "fraudshield_model_batch_texts", "Texts per model call", buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256)
+)
+INPUT_CHARS = metrics.histogram(
+    "fraudshield_input_chars", "Characters per text sent to the model",
+    buckets=(16, 32, 64, 128, 256, 512, 1024, 2048, 4096, 8192, 16384)
+)
+INPUT_TOKENS = metrics.histogram(
+    "fraudshield_input_tokens", "Tokens per window sent to the model",
+    buckets=(8, 16, 32, 64, 128, 256, 384, 512)
+)
+PREDICTION_ERRORS = metrics.counter("fraudshield_prediction_errors_total", "Model calls that failed")
+metrics.gauge("fraudshield_model_ready", "1 once the model is loaded and warm", function=lambda: int(model_ready))
+metrics.gauge(
+    "fraudshield_startup_seconds", "Duration of each startup phase", ["phase"],
+    function=lambda: dict(startup_timings)
+)
 
 class PredictionRequest(BaseModel):
     text: str
 
 class PredictionResponse(BaseModel):
+    model_config = ConfigDict(protected_namespaces=())
+    
     probabilities: Dict[str, float]
     label: str
     risk_score: float
+    model_version: Optional[str] = None
 
-def load_model():
-    """Load the BERT model and tokenizer"""
-    global model, tokenizer
+class BatchPredictionRequest(BaseModel):
+    texts: List[str] = Field(..., min_length=1, max_length=BULK_MAX_TEXTS)
+
+class BatchPredictionResponse(BaseModel):
+    predictions: List[PredictionResponse]
+
+def onnx_artifact_path(version: str) -> str:
+    """Where the ONNX export of ``version`` is cached"""
+    return ONNX_PATH or os.path.join(ARTIFACT_DIR, f"{version}.onnx")
+
+def registry_artifacts(name: str) -> Dict[str, str]:
+    """Derived artifacts of a registry version, kept in its own directory"""
+    quantized_weights = model_registry.artifact(name, QUANTIZED_WEIGHTS_FILE)
+    return {
+        "onnx_path": model_registry.artifact(name, ONNX_FILE),
+        "torchscript_path": model_registry.artifact(name, TORCHSCRIPT_FILE) if TORCHSCRIPT_PATH else "",
+        "quantized_weights_path": quantized_weights if os.path.exists(quantized_weights) else "",
+        "exit_heads_path": model_registry.artifact(name, EXIT_HEADS_FILE) if EARLY_EXIT else "",
+    }
+
+def build_loaded_model(source: str, version: str, onnx_path: str, torchscript_path: str,
+                       quantized_weights_path: str, local_files_only: bool,
+                       timings: Optional[Dict[str, float]] = None, exit_heads_path: str = "") -> LoadedModel:
+    """Load a model version without activating it"""
+    logger.info(f"Loading BERT model {version} from {source} with the {BACKEND} backend...")
+    import model_loader
     
+    backend, model, tokenizer = model_loader.create_backend(
+        BACKEND,
+        source,
+        QUANTIZATION,
+        quantized_weights_path,
+        onnx_path=onnx_path,
+        torchscript_path=torchscript_path,
+        local_files_only=local_files_only,
+        timings=timings,
+        exit_heads_path=exit_heads_path,
+        exit_entropy=EARLY_EXIT_ENTROPY,
+        model_version=version
+    )
+    return LoadedModel(version, backend, tokenizer, model, source)
+
+def activate_model(loaded: LoadedModel) -> Optional[LoadedModel]:
+    """Route new model calls to ``loaded``; returns the previously active model"""
+    global active_model, MODEL_VERSION
+    with active_model_lock:
+        previous = active_model
+        active_model = loaded
+        MODEL_VERSION = loaded.version
+    return previous
+
+def acquire_model(loaded: Optional[LoadedModel] = None) -> LoadedModel:
+    """Pin ``loaded`` (or the active model) for a model call; release it when done"""
+    if loaded is None:
+        with active_model_lock:
+            loaded = active_model
+            if loaded is not None:
+                loaded.acquire()
+    else:
+        loaded.acquire()
+    if loaded is None:
+        raise HTTPException(status_code=500, detail="Model not loaded")
+    return loaded
+
+def load_model():
+    """Load the configured BERT model and tokenizer and make them active"""
     try:
-        logger.info("Loading BERT model...")
         # Using bert-base-uncased as a starting point
-        # In production, you would load your fine-tuned model
-        model_name = "bert-base-uncased"
-        tokenizer = AutoTokenizer.from_pretrained(model_name)
-        
-        # For demo purposes, we'll use a simple classification head
-        # In production, you'd load your fine-tuned model
-        model = AutoModelForSequenceClassification.from_pretrained(
-            model_name, 
-            num_labels=3  # LOW, MEDIUM, HIGH
-        )
-        
-        # Set to evaluation mode
-        model.eval()
-        logger.info("Model loaded successfully")
+        # In production, you would load your fine-tuned model from MODEL_PATH
+        # or a model registry
+        if REGISTRY_VERSION and MODEL_SOURCE == model_registry.path(REGISTRY_VERSION):
+            artifacts = registry_artifacts(REGISTRY_VERSION)
+        else:
+            artifacts = {
+                "onnx_path": onnx_artifact_path(MODEL_VERSION),
+                "torchscript_path": TORCHSCRIPT_PATH,
+                "quantized_weights_path": QUANTIZED_WEIGHTS_PATH,
+                "exit_heads_path": EARLY_EXIT_HEADS_PATH if EARLY_EXIT else "",
+            }
+        activate_model(build_loaded_model(
+            MODEL_SOURCE,
+            MODEL_VERSION,
+            local_files_only=bool(MODEL_PATH or REGISTRY_VERSION),
+            timings=startup_timings,
+            **artifacts
+        ))
+        logger.info(f"Model loaded successfully (version: {MODEL_VERSION})")
         
     except Exception as e:
         logger.error(f"Error loading model: {e}")
         raise
 
-def predict_fraud(text: str) -> Dict[str, Any]:
-    """Predict fraud risk for given text"""
-    global model, tokenizer
+def synthetic_texts(tokenizer, length: int, count: int) -> List[str]:
+    """``count`` distinct texts of about ``length`` tokens each"""
+    # Trim synthetic text to the target token count (leaving room for
+    # [CLS]/[SEP]); distinct prefixes keep the batch from being deduplicated
+    filler = " ".join(["your account needs attention"] * length)
+    ids = tokenizer(filler, add_special_tokens=False)["input_ids"][:max(1, length - 3)]
+    text = tokenizer.decode(ids)
+    return [f"{i} {text}" for i in range(count)]
+
+def warm_up_model(loaded: LoadedModel):
+    """Run forward passes over representative input lengths and batch sizes"""
+    for length in WARMUP_LENGTHS:
+        texts = synthetic_texts(loaded.tokenizer, length, BATCH_MAX_SIZE)
+        predict_fraud_batch(texts[:1], loaded)
+        predict_fraud_batch(texts, loaded)
+
+def apply_tuned_settings(settings: Dict[str, int]):
+    """Switch torch threads, batch size and inference workers to autotuned values"""
+    global TORCH_THREADS, INTEROP_THREADS, INFERENCE_WORKERS, BATCH_MAX_SIZE
+    TORCH_THREADS = settings["torch_threads"]
+    INTEROP_THREADS = settings["interop_threads"]
+    INFERENCE_WORKERS = settings["workers"]
+    BATCH_MAX_SIZE = settings["batch_size"]
+    inference_executor.resize(INFERENCE_WORKERS)
+    batcher.resize(BATCH_MAX_SIZE, INFERENCE_WORKERS)
+
+def calibrate(loaded: LoadedModel):
+    """Benchmark settings on the loaded model and switch to the best ones"""
+    global BATCH_MAX_SIZE
+    shape = autotuner.shape or autotune.host_shape(MODEL_VERSION, BACKEND, QUANTIZATION)
+    largest = max(autotuner.batch_sizes + [autotuner.fixed.get("batch_size", 0)])
+    texts = synthetic_texts(loaded.tokenizer, AUTOTUNE_TOKENS, largest)
+    # Trials pass whole batches; don't let predict_fraud_batch split them
+    configured, BATCH_MAX_SIZE = BATCH_MAX_SIZE, largest
+    try:
+        settings = autotuner.calibrate(lambda batch: predict_fraud_batch(batch, loaded), texts, shape)
+    finally:
+        BATCH_MAX_SIZE = configured
+    apply_tuned_settings(settings)
+
+def load_and_warm_up():
+    """Blocking startup work, run off the event loop: configure, load, warm up"""
+    global model_ready
     
-    if model is None or tokenizer is None:
-        raise HTTPException(status_code=500, detail="Model not loaded")
+    start = time.perf_counter()
+    import model_loader  # noqa: F401  (pulls in torch and transformers)
+    startup_timings["heavy_imports"] = round(time.perf_counter() - start, 3)
+    
+    if autotuner and AUTOTUNE != "force":
+        # Stored settings apply before torch starts its thread pools
+        stored = autotuner.lookup(autotune.host_shape(MODEL_VERSION, BACKEND, QUANTIZATION))
+        if stored:
+            apply_tuned_settings(stored)
+    
+    configure_torch_threads(INFERENCE_WORKERS, TORCH_THREADS, INTEROP_THREADS)
+    
+    load_model()
     
+    if autotuner and autotuner.settings is None:
+        start = time.perf_counter()
+        calibrate(active_model)
+        configure_torch_threads(INFERENCE_WORKERS, TORCH_THREADS, INTEROP_THREADS)
+        startup_timings["autotune"] = round(time.perf_counter() - start, 3)
+    
+    start = time.perf_counter()
+    warm_up_model(active_model)
+    startup_timings["warmup"] = round(time.perf_counter() - start, 3)
+    startup_timings["ready_since_import"] = round(time.perf_counter() - IMPORT_STARTED, 3)
+    
+    model_ready = True
+    phases = ", ".join(f"{phase}={seconds:.2f}s" for phase, seconds in startup_timings.items())
+    logger.info(f"Model ready ({phases})")
+
+async def warm_start():
+    """Background task that makes the service ready"""
+    global startup_error
     try:
-        # Tokenize input
-        inputs = tokenizer(
-            text, 
-            return_tensors="pt", 
-            truncation=True, 
-            max_length=512,
-            padding=True
-        )
-        
-        # Get predictions
-        with torch.no_grad():
-            outputs = model(**inputs)
-            logits = outputs.logits
-            probabilities = torch.softmax(logits, dim=1)
+        await asyncio.to_thread(load_and_warm_up)
+    except Exception as e:
+        startup_error = str(e)
+        logger.error(f"Startup failed: {e}")
+
+def ensure_ready():
+    """Reject model work until the model is loaded and warm"""
+    ready = inference_client.ready if inference_client else model_ready
+    if not ready:
+        raise HTTPException(status_code=503, detail="Model is still loading")
+
+LABELS = ["LOW", "MEDIUM", "HIGH"]
+
+def build_result(probs: np.ndarray, model_version: str) -> Dict[str, Any]:
+    """Turn one row of class probabilities into a prediction result"""
+    # Create probabilities dict
+    prob_dict = {label: float(prob) for label, prob in zip(LABELS, probs)}
+    
+    # Get predicted label
+    predicted_idx = np.argmax(probs)
+    predicted_label = LABELS[predicted_idx]
+    
+    # Calculate risk score (probability of HIGH risk)
+    risk_score = float(probs[2])  # HIGH risk probability
+    
+    return {
+        "probabilities": prob_dict,
+        "label": predicted_label,
+        "risk_score": risk_score,
+        "model_version": model_version
+    }
+
+def softmax(logits: np.ndarray) -> np.ndarray:
+    """Row-wise softmax shared by every backend"""
+    shifted = logits - logits.max(axis=1, keepdims=True)
+    exp = np.exp(shifted)
+    return exp / exp.sum(axis=1, keepdims=True)
+
+def pad_bucket(encodings, bucket: List[int], pad_token_id: int) -> Dict[str, "torch.Tensor"]:
+    """Right-pad the encodings of one length bucket to its longest member"""
+    import torch
+    
+    width = max(len(encodings["input_ids"][i]) for i in bucket)
+    inputs = {}
+    for key in encodings.keys():
+        if key == "overflow_to_sample_mapping":
+            continue
+        pad_value = pad_token_id if key == "input_ids" else 0
+        padded = np.full((len(bucket), width), pad_value, dtype=np.int64)
+        for row, i in enumerate(bucket):
+            values = encodings[key][i]
+            padded[row, :len(values)] = values
+        inputs[key] = torch.from_numpy(padded)
+    return inputs
+
+def clip_text(text: str) -> str:
+    """Cap raw input size before tokenization, keeping the head and the tail"""
+    if len(text) <= MAX_INPUT_CHARS:
+        return text
+    half = MAX_INPUT_CHARS // 2
+    return text[:half] + " ... " + text[-half:]
+
+tokenizer_executor: Optional[ThreadPoolExecutor] = None
+tokenizer_executor_lock = threading.Lock()
+
+def tokenizer_pool() -> ThreadPoolExecutor:
+    """Threads that tokenize upcoming chunks of a pipelined call, created on first use"""
+    global tokenizer_executor
+    with tokenizer_executor_lock:
+        if tokenizer_executor is None:
+            threads = TOKENIZER_THREADS if TOKENIZER_THREADS > 0 else INFERENCE_WORKERS
+            tokenizer_executor = ThreadPoolExecutor(max_workers=max(1, threads), thread_name_prefix="tokenize")
+        return tokenizer_executor
+
+def pipeline_chunks(texts: List[str]) -> List[List[int]]:
+    """Split texts into groups of BATCH_MAX_SIZE by character length, or keep them together
+    
+    Tokens aren't known before tokenizing, so character length stands in
+    for them when grouping similar lengths into the same chunk.
+    """
+    if not PIPELINE_ENABLED or len(texts) <= BATCH_MAX_SIZE:
+        return [list(range(len(texts)))]
+    order = sorted(range(len(texts)), key=lambda i: len(clip_text(texts[i])))
+    return [order[start:start + BATCH_MAX_SIZE] for start in range(0, len(order), BATCH_MAX_SIZE)]
+
+def prepare_texts(tokenizer, texts: List[str]) -> Dict[str, Any]:
+    """Tokenize texts and pad their windows into length-sorted buckets of at most BATCH_MAX_SIZE"""
+    started = time.perf_counter()
+    # Tokenize without padding so we know each window's real length;
+    # clipping first keeps tokenizer cost bounded for huge pastes
+    encodings = tokenizer(
+        [clip_text(text) for text in texts], 
+        truncation=True, 
+        max_length=MAX_TOKENS,
+        stride=WINDOW_OVERLAP if LONG_TEXT_WINDOWS else 0,
+        return_overflowing_tokens=LONG_TEXT_WINDOWS
+    )
+    if LONG_TEXT_WINDOWS:
+        window_owner = encodings["overflow_to_sample_mapping"]
+    else:
+        window_owner = list(range(len(texts)))
+    
+    lengths = [len(ids) for ids in encodings["input_ids"]]
+    order = sorted(range(len(lengths)), key=lambda i: lengths[i])
+    buckets = []
+    for start in range(0, len(order), BATCH_MAX_SIZE):
+        bucket = order[start:start + BATCH_MAX_SIZE]
+        buckets.append((bucket, pad_bucket(encodings, bucket, tokenizer.pad_token_id)))
+    return {
+        "window_owner": window_owner,
+        "lengths": lengths,
+        "buckets": buckets,
+        "seconds": time.perf_counter() - started,
+    }
+
+def predict_fraud_batch(texts: List[str], loaded: Optional[LoadedModel] = None) -> List[Dict[str, Any]]:
+    """Predict fraud risk for several texts, returning results in input order
+    
+    Identical texts are scored once. Texts are sorted by token length and
+    split into sub-batches of at most BATCH_MAX_SIZE, so each sub-batch is
+    only padded to the longest text in its own length bucket.
+    
+    With more than BATCH_MAX_SIZE distinct texts (and pipelining on), texts
+    are scored in chunks: while the model runs one chunk, the next ones are
+    tokenized and padded on the tokenizer pool.
+    
+    In long-text mode, texts over MAX_TOKENS are split into overlapping
+    windows that are scored alongside everything else; a text's result is
+    that of its riskiest window.
+    
+    Runs on ``loaded`` if given, otherwise on the active model.
+    """
+    # Pin the version for the whole call so a swap can't split it across models
+    loaded = acquire_model(loaded)
+    tokenizer, backend = loaded.tokenizer, loaded.backend
+    try:
+        if not texts:
+            return []
         
-        # Convert to numpy for easier handling
-        probs = probabilities.numpy()[0]
+        unique_texts = list(dict.fromkeys(texts))
+        MODEL_BATCH_TEXTS.observe(len(unique_texts))
+        for text in unique_texts:
+            INPUT_CHARS.observe(len(text))
         
-        # Define labels
-        labels = ["LOW", "MEDIUM", "HIGH"]
+        chunks = pipeline_chunks(unique_texts)
         
-        # Create probabilities dict
-        prob_dict = {label: float(prob) for label, prob in zip(labels, probs)}
+        def prepare(chunk: List[int]) -> Dict[str, Any]:
+            return prepare_texts(tokenizer, [unique_texts[i] for i in chunk])
         
-        # Get predicted label
-        predicted_idx = np.argmax(probs)
-        predicted_label = labels[predicted_idx]
+        if len(chunks) == 1:
+            prepared_chunks = (prepare(chunk) for chunk in chunks)
+        else:
+            prepared_chunks = prefetch(prepare, chunks, tokenizer_pool(), PIPELINE_DEPTH)
         
-        # Calculate risk score (probability of HIGH risk)
-        risk_score = float(probs[2])  # HIGH risk probability
+        # Tokenize time is the tokenizer's own work; in a pipelined call it
+        # overlaps the forward passes of earlier chunks. Forward runs from
+        # model inputs to probabilities; postprocess covers picking each
+        # text's window and building results.
+        tokenize_seconds = 0.0
+        forward_seconds = 0.0
+        postprocess_seconds = 0.0
+        text_probs = np.zeros((len(unique_texts), len(LABELS)), dtype=np.float32)
+        with profiling.model_call(), closing(prepared_chunks):
+            for chunk, prepared in zip(chunks, prepared_chunks):
+                tokenize_seconds += prepared["seconds"]
+                for length in prepared["lengths"]:
+                    INPUT_TOKENS.observe(length)
+                
+                window_probs = np.zeros((len(prepared["lengths"]), len(LABELS)), dtype=np.float32)
+                for bucket, inputs in prepared["buckets"]:
+                    started = time.perf_counter()
+                    window_probs[bucket] = softmax(backend.logits(inputs))
+                    forward_seconds += time.perf_counter() - started
+                
+                # Keep the window with the highest HIGH-risk probability per text
+                started = time.perf_counter()
+                best = {}
+                for window, owner in enumerate(prepared["window_owner"]):
+                    if owner not in best or window_probs[window, 2] > window_probs[best[owner], 2]:
+                        best[owner] = window
+                for owner, window in best.items():
+                    text_probs[chunk[owner]] = window_probs[window]
+                postprocess_seconds += time.perf_counter() - started
+        TOKENIZE_SECONDS.observe(tokenize_seconds)
+        FORWARD_SECONDS.observe(forward_seconds)
+        timing.record("tokenize", tokenize_seconds)
+        timing.record("forward", forward_seconds)
         
-        return {
-            "probabilities": prob_dict,
-            "label": predicted_label,
-            "risk_score": risk_score
+        started = time.perf_counter()
+        results_by_text = {
+            text: build_result(text_probs[i], loaded.version)
+            for i, text in enumerate(unique_texts)
         }
+        results = [results_by_text[text] for text in texts]
+        postprocess_seconds += time.perf_counter() - started
+        POSTPROCESS_SECONDS.observe(postprocess_seconds)
+        timing.record("postprocess", postprocess_seconds)
+        return results
         
     except Exception as e:
+        PREDICTION_ERRORS.inc()
         logger.error(f"Error during prediction: {e}")
         raise HTTPException(status_code=500, detail="Prediction failed")
+    finally:
+        loaded.release()
+
+def predict_fraud(text: str) -> Dict[str, Any]:
+    """Predict fraud risk for given text"""
+    return predict_fraud_batch([text])[0]
+
+def early_exit_backend():
+    """The active model's backend when it exits early, else None"""
+    backend = active_model.backend if active_model else None
+    return backend if getattr(backend, "name", "") == "early_exit" else None
+
+# Blocking model calls run here instead of on the event loop
+inference_executor = InferenceExecutor(
+    max_workers=INFERENCE_WORKERS,
+    max_pending=INFERENCE_MAX_PENDING,
+)
+
+# Micro-batching: concurrent /predict calls share one forward pass
+batcher = MicroBatcher(
+    predict_fraud_batch,
+    max_batch_size=BATCH_MAX_SIZE,
+    max_wait_ms=BATCH_MAX_WAIT_MS,
+    executor=inference_executor,
+    max_queue_size=INFERENCE_MAX_PENDING,
+)
+
+# Set when the model lives in a separate inference server process
+inference_client = (
+    InferenceClient(INFERENCE_SERVER, len(LABELS), timeout=INFERENCE_SERVER_TIMEOUT) if INFERENCE_SERVER else None
+)
+
+autotune_fixed = {
+    name: value
+    for name, variable, value in (
+        ("torch_threads", "ML_TORCH_THREADS", TORCH_THREADS),
+        ("workers", "ML_INFERENCE_WORKERS", INFERENCE_WORKERS),
+        ("batch_size", "ML_BATCH_MAX_SIZE", BATCH_MAX_SIZE),
+    )
+    if variable in os.environ and value > 0
+}
+if INFERENCE_SERVER:
+    # The inference server runs one forward pass at a time
+    autotune_fixed["workers"] = 1
+autotuner = autotune.Autotuner(
+    AUTOTUNE_PROFILE_PATH,
+    latency_budget_ms=AUTOTUNE_LATENCY_MS,
+    batch_sizes=AUTOTUNE_BATCH_SIZES,
+    trial_seconds=AUTOTUNE_TRIAL_SECONDS,
+    fixed=autotune_fixed,
+    interop_threads=INTEROP_THREADS,
+) if AUTOTUNE in ("on", "force") else None
+
+# Obvious clean/scam traffic is answered by the keyword model, reported
+# under this model version
+KEYWORD_MODEL_VERSION = "keywords"
+cascade = CascadeRouter(
+    predict_fraud_simple_batch,
+    low=CASCADE_LOW,
+    high=CASCADE_HIGH,
+)
+
+# Repeated texts (e.g. one scam blasted to many numbers) skip the model
+prediction_cache = PredictionCache(
+    max_entries=CACHE_MAX_ENTRIES,
+    ttl_seconds=CACHE_TTL_SECONDS,
+)
+
+# Scam blasts that vary a name, amount or link share one model verdict
+campaign_index = CampaignIndex(
+    threshold=CAMPAIGN_THRESHOLD,
+    max_clusters=CAMPAIGN_MAX_CLUSTERS,
+    ttl_seconds=CAMPAIGN_TTL_SECONDS,
+)
+
+# Load gauges, read from their owners at scrape time
+metrics.gauge("fraudshield_inference_pending", "Model calls running or queued on the executor",
+              function=lambda: inference_executor.stats()["pending"])
+metrics.counter("fraudshield_inference_rejected_total", "Model calls rejected with 503",
+                function=lambda: inference_executor.stats()["rejected"])
+metrics.gauge("fraudshield_batcher_queue_depth", "Texts waiting for the micro-batcher",
+              function=lambda: batcher.stats()["queue_depth"])
+metrics.gauge("fraudshield_cache_entries", "Entries in the result cache",
+              function=lambda: prediction_cache.stats()["entries"])
+metrics.gauge("fraudshield_campaign_clusters", "Live clusters in the near-duplicate campaign index",
+              function=lambda: campaign_index.stats()["clusters"])
+metrics.counter("fraudshield_early_exit_texts_total",
+                "Texts answered at each encoder layer by early exit (the last layer ran the full model)", ["layer"],
+                function=lambda: early_exit_backend().exit_counts() if early_exit_backend() else {})
+metrics.counter("fraudshield_campaign_hits_total", "Predictions answered from a campaign cluster",
+                function=lambda: campaign_index.stats()["hits"])
+metrics.counter("fraudshield_log_records_dropped_total", "Log records dropped because the log queue was full",
+                function=request_log.dropped_records)
+metrics.counter("fraudshield_cache_requests_total", "Result cache lookups by outcome", ["result"],
+                function=lambda: {
+                    result: prediction_cache.stats()[result] for result in ("hits", "misses", "coalesced")
+                })
+
+async def score_on_server(texts: List[str]) -> List[Dict[str, Any]]:
+    """Score texts in the inference server process"""
+    started = time.perf_counter()
+    # Clip here as local scoring would, so long texts don't fill the request ring
+    probabilities = await inference_client.predict([clip_text(text) for text in texts])
+    elapsed = time.perf_counter() - started
+    REMOTE_SECONDS.observe(elapsed)
+    timing.record("inference_server", elapsed)
+    model_version = inference_client.server_status()["model_version"]
+    return [build_result(row, model_version) for row in probabilities]
+
+async def run_inference(text: str) -> Dict[str, Any]:
+    """Score one text on the model, through the micro-batcher when enabled"""
+    if inference_client:
+        # The server already batches across every worker
+        return (await score_on_server([text]))[0]
+    if BATCHING_ENABLED:
+        return await batcher.submit(text)
+    return await inference_executor.run(predict_fraud, text)
+
+async def run_batch_inference(texts: List[str]) -> List[Dict[str, Any]]:
+    """Score several texts on the model in one call"""
+    if inference_client:
+        return await score_on_server(texts)
+    return await inference_executor.run(predict_fraud_batch, texts)
+
+async def run_campaign_inference(text: str) -> Dict[str, Any]:
+    """Score one text, reusing a campaign cluster's verdict for near duplicates"""
+    if not CAMPAIGN_ENABLED:
+        return await run_inference(text)
+    # Hashing is CPU work; do it off the event loop, on the text the model would see
+    signature = await asyncio.to_thread(campaign_index.signature, clip_text(text))
+    result, signature = campaign_index.lookup(text, MODEL_VERSION, signature)
+    if result is not None:
+        return result
+    result = await run_inference(text)
+    campaign_index.add(signature, result, MODEL_VERSION)
+    return result
+
+async def run_campaign_batch_inference(texts: List[str]) -> List[Dict[str, Any]]:
+    """Score texts in order, running the model only for texts outside known campaigns"""
+    if not CAMPAIGN_ENABLED:
+        return await run_batch_inference(texts)
+    signatures = await asyncio.to_thread(lambda: [campaign_index.signature(clip_text(text)) for text in texts])
+    lookups = [
+        campaign_index.lookup(text, MODEL_VERSION, signature) for text, signature in zip(texts, signatures)
+    ]
+    results = [result for result, _ in lookups]
+    missing = [i for i, result in enumerate(results) if result is None]
+    if missing:
+        computed = await run_batch_inference([texts[i] for i in missing])
+        for i, result in zip(missing, computed):
+            campaign_index.add(lookups[i][1], result, MODEL_VERSION)
+            results[i] = result
+    return results
+
+async def score_with_model(text: str) -> Dict[str, Any]:
+    """Score one text on the model tier, serving repeats from the result cache"""
+    if not CACHE_ENABLED:
+        return await run_campaign_inference(text)
+    return await prediction_cache.get_or_compute(text, MODEL_VERSION, run_campaign_inference)
+
+async def score_texts_with_model(texts: List[str]) -> List[Dict[str, Any]]:
+    """Score texts on the model tier in order, running only cache misses on the model"""
+    if not CACHE_ENABLED:
+        return await run_campaign_batch_inference(texts)
+    
+    results, keys = prediction_cache.lookup_many(texts, MODEL_VERSION)
+    missing = [i for i, result in enumerate(results) if result is None]
+    if missing:
+        computed = await run_campaign_batch_inference([texts[i] for i in missing])
+        for i, result in zip(missing, computed):
+            prediction_cache.put(keys[i], result)
+            results[i] = result
+    return results
+
+async def score_text(text: str) -> Dict[str, Any]:
+    """Score one text, trying the keyword tier first when the cascade is on"""
+    ensure_ready()
+    if not CASCADE_ENABLED:
+        return await score_with_model(text)
+    
+    results, escalated = cascade.route([text])
+    if not escalated:
+        results[0]["model_version"] = KEYWORD_MODEL_VERSION
+        return results[0]
+    start = time.perf_counter()
+    result = await score_with_model(text)
+    cascade.record_model((time.perf_counter() - start) * 1000)
+    return result
+
+async def score_texts(texts: List[str]) -> List[Dict[str, Any]]:
+    """Score a list of texts in order, escalating only uncertain ones when the cascade is on"""
+    ensure_ready()
+    if not CASCADE_ENABLED:
+        return await score_texts_with_model(texts)
+    
+    results, escalated = cascade.route(texts)
+    for result in results:
+        if result is not None:
+            result["model_version"] = KEYWORD_MODEL_VERSION
+    if escalated:
+        start = time.perf_counter()
+        computed = await score_texts_with_model([texts[i] for i in escalated])
+        cascade.record_model((time.perf_counter() - start) * 1000, len(escalated))
+        for i, result in zip(escalated, computed):
+            results[i] = result
+    return results
 
 @app.on_event("startup")
 async def startup_event():
-    """Load model on startup"""
-    load_model()
+    """Start serving immediately; load and warm up the model in the background"""
+    if CACHE_ENABLED and CACHE_SNAPSHOT_PATH:
+        prediction_cache.load(CACHE_SNAPSHOT_PATH)
+    if inference_client:
+        await inference_client.start()
+        return
+    if BATCHING_ENABLED:
+        await batcher.start()
+    app.state.warm_start = asyncio.create_task(warm_start())
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Stop background workers"""
+    if inference_client:
+        await inference_client.stop()
+    await batcher.stop()
+    inference_executor.shutdown()
+    if tokenizer_executor is not None:
+        tokenizer_executor.shutdown(wait=False, cancel_futures=True)
+    if CACHE_ENABLED and CACHE_SNAPSHOT_PATH:
+        prediction_cache.save(CACHE_SNAPSHOT_PATH)
+    request_log.stop_logging()
 
 @app.get("/health")
 async def health_check():
-    """Health check endpoint"""
-    return {"status": "healthy", "model_loaded": model is not None}
+    """Health check endpoint (liveness; see /ready for model readiness)"""
+    return {
+        "status": "healthy",
+        "model_loaded": active_model is not None,
+        "model_version": MODEL_VERSION,
+        "backend": BACKEND,
+        "inference_server": INFERENCE_SERVER or None
+    }
+
+@app.get("/ready")
+async def readiness_check():
+    """Readiness endpoint: 200 only once the model is loaded and warmed up"""
+    if inference_client:
+        server = inference_client.server_status()
+        if server["state"] == "ready":
+            return {"status": "ready", "model_version": server["model_version"], "inference_server": INFERENCE_SERVER}
+        return JSONResponse(
+            status_code=503,
+            content={"status": server["state"], "error": server["error"], "inference_server": INFERENCE_SERVER}
+        )
+    if model_ready:
+        return {"status": "ready", "model_version": MODEL_VERSION, "startup_timings": startup_timings}
+    status = "failed" if startup_error else "loading"
+    return JSONResponse(
+        status_code=503,
+        content={"status": status, "error": startup_error, "startup_timings": startup_timings}
+    )
+
+@app.get("/metrics")
+async def metrics_endpoint():
+    """Prometheus metrics"""
+    return Response(content=metrics.REGISTRY.render(), media_type=metrics.CONTENT_TYPE)
 
-@app.post("/predict", response_model=PredictionResponse)
-async def predict(request: PredictionRequest):
+@app.get("/batching/stats")
+async def batching_stats():
+    """Batch sizes formed by the micro-batcher"""
+    return {"enabled": BATCHING_ENABLED, **batcher.stats()}
+
+@app.get("/inference/stats")
+async def inference_stats():
+    """Load on the inference executor, or on the inference server when one is used"""
+    if inference_client:
+        return {"inference_server": inference_client.stats()}
+    stats = inference_executor.stats()
+    if early_exit_backend():
+        stats["early_exit"] = early_exit_backend().stats()
+    return stats
+
+@app.get("/autotune/stats")
+async def autotune_stats():
+    """Settings chosen by the startup autotuner and the measurements behind them"""
+    if autotuner is None:
+        return {"enabled": False}
+    return {"enabled": True, **autotuner.stats()}
+
+@app.get("/cache/stats")
+async def cache_stats():
+    """Result cache size and hit/miss/eviction counters"""
+    return {"enabled": CACHE_ENABLED, "model_version": MODEL_VERSION, **prediction_cache.stats()}
+
+@app.get("/cascade/stats")
+async def cascade_stats():
+    """Share of traffic answered by each cascade tier and their latencies"""
+    return {"enabled": CASCADE_ENABLED, **cascade.stats()}
+
+@app.get("/campaigns/stats")
+async def campaign_stats(limit: int = 20):
+    """Near-duplicate index size and hit rate, plus the most active campaigns by hit count"""
+    return {
+        "enabled": CAMPAIGN_ENABLED,
+        **campaign_index.stats(),
+        "top_clusters": campaign_index.top_clusters(min(max(limit, 0), 1000)),
+    }
+
+# Documents the msgpack alternative on routes that negotiate it
+MSGPACK_RESPONSE = {200: {"content": {serialization.MSGPACK_MEDIA_TYPE: {}}}}
+
+def encode_response(payload: Dict[str, Any], accept: Optional[str],
+                    request_timing: Optional[timing.RequestTiming]) -> Response:
+    """Encode a prediction response as JSON or msgpack, with a Server-Timing header if timings were requested"""
+    started = time.perf_counter()
+    response = serialization.encode(payload, accept)
+    if request_timing:
+        request_timing.add("serialize", time.perf_counter() - started)
+        response.headers["Server-Timing"] = request_timing.header_value()
+    return response
+
+@app.post("/predict", response_model=PredictionResponse, responses=MSGPACK_RESPONSE)
+async def predict(
+    request: PredictionRequest,
+    x_debug_timing: Optional[str] = Header(None, description="Send 1 or true to get a Server-Timing breakdown"),
+    accept: Optional[str] = Header(None, description="application/msgpack for a msgpack response")
+):
     """Predict fraud risk for text"""
-    logger.info(f"Received prediction request for text: {request.text[:50]}...")
+    started = time.perf_counter()
+    request_timing = timing.start() if timing.requested(x_debug_timing) else None
     
     try:
-        result = predict_fraud(request.text)
-        logger.info(f"Prediction completed: {result['label']} (score: {result['risk_score']:.3f})")
-        return PredictionResponse(**result)
+        result = await score_text(request.text)
+        request_logger.log("/predict", started, [request.text], results=[result])
+        return encode_response(serialization.prediction_payload(result), accept, request_timing)
         
+    except HTTPException as e:
+        request_logger.log("/predict", started, [request.text], status=e.status_code, error=str(e.detail))
+        raise
+    except InferenceOverloaded as e:
+        request_logger.log("/predict", started, [request.text], status=503, error=str(e))
+        raise HTTPException(status_code=503, detail=str(e))
+    except RequestTooLarge as e:
+        request_logger.log("/predict", started, [request.text], status=413, error=str(e))
+        raise HTTPException(status_code=413, detail=str(e))
     except Exception as e:
-        logger.error(f"Prediction error: {e}")
+        request_logger.log("/predict", started, [request.text], status=500, error=str(e))
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/predict/batch", response_model=BatchPredictionResponse, responses=MSGPACK_RESPONSE)
+async def predict_batch(
+    request: BatchPredictionRequest,
+    x_debug_timing: Optional[str] = Header(None, description="Send 1 or true to get a Server-Timing breakdown"),
+    accept: Optional[str] = Header(None, description="application/msgpack for a msgpack response")
+):
+    """Predict fraud risk for a list of texts, preserving input order"""
+    started = time.perf_counter()
+    request_timing = timing.start() if timing.requested(x_debug_timing) else None
+    
+    try:
+        results = await score_texts(request.texts)
+        request_logger.log("/predict/batch", started, request.texts, results=results)
+        payload = {"predictions": [serialization.prediction_payload(result) for result in results]}
+        return encode_response(payload, accept, request_timing)
+        
+    except HTTPException as e:
+        request_logger.log("/predict/batch", started, request.texts, status=e.status_code, error=str(e.detail))
+        raise
+    except InferenceOverloaded as e:
+        request_logger.log("/predict/batch", started, request.texts, status=503, error=str(e))
+        raise HTTPException(status_code=503, detail=str(e))
+    except RequestTooLarge as e:
+        request_logger.log("/predict/batch", started, request.texts, status=413, error=str(e))
+        raise HTTPException(status_code=413, detail=str(e))
+    except Exception as e:
+        request_logger.log("/predict/batch", started, request.texts, status=500, error=str(e))
+        raise HTTPException(status_code=500, detail=str(e))
+
+def check_admin_token(token: str):
+    """Reject admin calls unless ML_ADMIN_TOKEN is set and matches"""
+    if not ADMIN_TOKEN or not hmac.compare_digest(token, ADMIN_TOKEN):
+        raise HTTPException(status_code=403, detail="Admin token required")
+
+@app.post("/admin/profile")
+async def capture_profile(
+    kind: str = "cpu",
+    seconds: float = 10.0,
+    requests: int = 0,
+    x_admin_token: str = Header("")
+):
+    """Profile the live service and download the result
+    
+    ``kind=cpu`` returns sampled stacks in collapsed (flamegraph) format;
+    ``kind=torch`` returns a Chrome trace of the model calls. Capture stops
+    after ``seconds`` or once ``requests`` more prediction requests have
+    completed, whichever comes first.
+    """
+    check_admin_token(x_admin_token)
+    if kind not in profiling.PROFILE_KINDS:
+        raise HTTPException(status_code=422, detail=f"kind must be one of {', '.join(profiling.PROFILE_KINDS)}")
+    
+    def completed_predictions() -> float:
+        return sum(
+            metrics.HTTP_REQUESTS.total(path=path) for path in ("/predict", "/predict/batch", "/predict/stream")
+        )
+    
+    seconds = min(max(seconds, 0.1), MAX_PROFILE_SECONDS)
+    logger.info(f"Capturing {kind} profile for up to {seconds:.1f}s / {requests or 'any number of'} requests")
+    try:
+        data, filename, media_type = await profiling.capture(kind, seconds, requests, completed_predictions)
+    except profiling.ProfilerBusy as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return Response(
+        content=data,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+def load_registry_version(name: str, version: str) -> LoadedModel:
+    """Blocking part of a swap: load a registry version and warm it up, off the event loop"""
+    candidate = build_loaded_model(
+        model_registry.path(name),
+        version,
+        local_files_only=True,
+        **registry_artifacts(name)
+    )
+    warm_up_model(candidate)
+    return candidate
+
+async def swap_model(name: str):
+    """Load, warm up and activate a registry version, then free the previous one once idle"""
+    global model_swap
+    
+    version = name + ("-int8" if QUANTIZATION else "")
+    started = time.perf_counter()
+    model_swap = {"version": version, "state": "loading", "error": None, "started_at": time.time()}
+    try:
+        candidate = await asyncio.to_thread(load_registry_version, name, version)
+    except Exception as e:
+        model_swap.update(state="failed", error=str(e))
+        logger.error(f"Loading model {version} failed; still serving {MODEL_VERSION}: {e}")
+        return
+    
+    previous = activate_model(candidate)
+    model_swap.update(state="draining", previous_version=previous.version if previous else None,
+                      load_seconds=round(time.perf_counter() - started, 3))
+    logger.info(f"Model {version} activated (was {model_swap['previous_version']})")
+    try:
+        await asyncio.to_thread(model_registry.set_current, name)
+    except OSError as e:
+        logger.warning(f"Could not record {name} as the registry's CURRENT version: {e}")
+    
+    if previous is not None:
+        # Model calls that started on the previous version finish on it
+        while previous.in_flight:
+            await asyncio.sleep(0.05)
+        previous.close()
+        previous = None
+        await asyncio.to_thread(gc.collect)
+    model_swap.update(state="done", total_seconds=round(time.perf_counter() - started, 3))
+
+@app.get("/admin/models")
+async def list_models(x_admin_token: str = Header("")):
+    """Versions in the model registry, the active version and the status of the last swap"""
+    check_admin_token(x_admin_token)
+    if model_registry is None:
+        raise HTTPException(status_code=404, detail="No model registry configured (set ML_MODEL_REGISTRY)")
+    return {
+        "active_version": MODEL_VERSION,
+        "current": model_registry.current(),
+        "versions": await asyncio.to_thread(model_registry.versions),
+        "swap": model_swap,
+    }
+
+@app.post("/admin/models/{version}/activate", status_code=202)
+async def activate_model_version(version: str, x_admin_token: str = Header("")):
+    """Load a registry version in the background, warm it up and swap it in
+    
+    Returns right away; poll GET /admin/models for progress. Requests keep
+    being served by the current version until the new one is warm.
+    """
+    check_admin_token(x_admin_token)
+    if model_registry is None:
+        raise HTTPException(status_code=404, detail="No model registry configured (set ML_MODEL_REGISTRY)")
+    if inference_client:
+        raise HTTPException(
+            status_code=409,
+            detail="The model runs in the inference server process; set CURRENT and restart it instead"
+        )
+    try:
+        model_registry.path(version)
+    except UnknownModelVersion as e:
+        raise HTTPException(status_code=404, detail=str(e.args[0]))
+    if not model_ready:
+        raise HTTPException(status_code=409, detail="The initial model is still loading")
+    swap_task = getattr(app.state, "model_swap", None)
+    if swap_task is not None and not swap_task.done():
+        raise HTTPException(status_code=409, detail="A model swap is already running")
+    
+    app.state.model_swap = asyncio.create_task(swap_model(version))
+    await asyncio.sleep(0)
+    return model_swap
+
+@app.post("/predict/stream")
+async def predict_stream(request: Request):
+    """Score an NDJSON upload of {"text": ..., "id": ...} records, streaming NDJSON results back"""
+    ensure_ready()
+    logger.info("Received streaming prediction request")
+    return DuplexStreamingResponse(
+        score_ndjson(request.stream(), score_texts, STREAM_CHUNK_SIZE, STREAM_MAX_LINE_BYTES),
+        media_type=NDJSON_MEDIA_TYPE
+    )
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000) 
\ No newline at end of file
@@ -1,67 +1,172 @@
 from fastapi import FastAPI, HTTPException
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 import numpy as np
-from typing import Dict, Any
+from typing import Dict, Any, List
+import hashlib
 import logging
-import random
+import os
+import time
+from scipy import sparse
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
+import request_log
+from keyword_matcher import build_matcher
+
+# Configure logging (same ML_LOG_* settings as main.py)
+request_log.configure_logging(
+    os.getenv("ML_LOG_FORMAT", "json").lower(),
+    logging.INFO,
+    int(os.getenv("ML_LOG_QUEUE_SIZE", "10000"))
+)
 logger = logging.getLogger(__name__)
+request_logger = request_log.RequestLogger(
+    logging.getLogger("fraudshield.requests"),
+    sample_rate=float(os.getenv("ML_LOG_SAMPLE_RATE", "0.01")),
+    slow_ms=float(os.getenv("ML_LOG_SLOW_MS", "500")),
+    text_mode=os.getenv("ML_LOG_TEXT", "hash").lower(),
+    hash_key=os.getenv("ML_LOG_HASH_KEY", ""),
+)
 
 app = FastAPI(title="FraudShield ML Service", version="1.0.0")
 
+BULK_MAX_TEXTS = int(os.getenv("ML_BULK_MAX_TEXTS", "256"))
+
 class PredictionRequest(BaseModel):
     text: str
 
+class KeywordMatch(BaseModel):
+    keyword: str
+    start: int
+    end: int
+
 class PredictionResponse(BaseModel):
     probabilities: Dict[str, float]
     label: str
     risk_score: float
+    matches: List[KeywordMatch] = []
 
-def predict_fraud_simple(text: str) -> Dict[str, Any]:
-    """Simple fraud prediction based on keywords"""
+class BatchPredictionRequest(BaseModel):
+    texts: List[str] = Field(..., min_length=1, max_length=BULK_MAX_TEXTS)
+
+class BatchPredictionResponse(BaseModel):
+    predictions: List[PredictionResponse]
+
+# Define fraud-related keywords
+FRAUD_KEYWORDS = [
+    'suspended', 'account', 'verify', 'immediately', 'urgent', 'action required',
+    'security', 'compromised', 'locked', 'unlock', 'verify identity', 'click here',
+    'prize', 'won', 'claim', 'personal information', 'social security', 'credit card',
+    'bank account', 'password', 'login', 'suspicious', 'fraud', 'scam'
+]
+
+# Keywords can be replaced by a file (one per line) and optionally matched as
+# whole words only; all of them are found in a single pass over the text
+KEYWORDS_PATH = os.getenv("ML_KEYWORDS_PATH", "")
+KEYWORD_WORD_BOUNDARY = os.getenv("ML_KEYWORD_WORD_BOUNDARY", "false").lower() == "true"
+keyword_matcher = build_matcher(FRAUD_KEYWORDS, KEYWORDS_PATH, KEYWORD_WORD_BOUNDARY)
+
+LABELS = np.array(["LOW", "MEDIUM", "HIGH"])
+
+# Fixed class probabilities for each label, indexed like LABELS
+LABEL_PROBABILITIES = np.array([
+    [0.7, 0.25, 0.05],   # LOW
+    [0.2, 0.6, 0.2],     # MEDIUM
+    [0.05, 0.15, 0.8],   # HIGH
+])
+
+def low_risk_jitter(text: str) -> float:
+    """Deterministic value in [0, 1) derived from the text, used for LOW scores"""
+    digest = hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big") / 2**64
+
+def keyword_count_matrix(texts: List[str]):
+    """Scan texts into a sparse (texts x keywords) count matrix
     
-    # Define fraud-related keywords
-    fraud_keywords = [
-        'suspended', 'account', 'verify', 'immediately', 'urgent', 'action required',
-        'security', 'compromised', 'locked', 'unlock', 'verify identity', 'click here',
-        'prize', 'won', 'claim', 'personal information', 'social security', 'credit card',
-        'bank account', 'password', 'login', 'suspicious', 'fraud', 'scam'
-    ]
+    Also returns each text's word count, LOW-score jitter and keyword matches.
+    """
+    rows, cols = [], []
+    word_counts = np.zeros(len(texts), dtype=np.int64)
+    jitter = np.zeros(len(texts))
+    all_matches = []
     
-    # Count fraud keywords in text
-    text_lower = text.lower()
-    fraud_count = sum(1 for keyword in fraud_keywords if keyword in text_lower)
+    for row, text in enumerate(texts):
+        matches, word_counts[row] = keyword_matcher.scan(text)
+        jitter[row] = low_risk_jitter(text)
+        for keyword, _, _ in matches:
+            rows.append(row)
+            cols.append(keyword_matcher.index[keyword])
+        all_matches.append(matches)
     
+    counts = sparse.csr_matrix(
+        (np.ones(len(rows)), (rows, cols)),
+        shape=(len(texts), len(keyword_matcher.keywords))
+    )
+    counts.sum_duplicates()
+    return counts, word_counts, jitter, all_matches
+
+def score_keyword_counts(fraud_count: np.ndarray, total_words: np.ndarray, jitter: np.ndarray):
+    """Vectorized risk rules: label index (see LABELS) and risk score per text"""
     # Calculate risk score based on keyword density
-    total_words = len(text.split())
-    keyword_density = fraud_count / max(total_words, 1)
+    keyword_density = fraud_count / np.maximum(total_words, 1)
     
     # Determine risk level
-    if keyword_density > 0.1 or fraud_count >= 3:
-        risk_score = min(0.9, 0.3 + keyword_density * 2)
-        label = "HIGH"
-    elif keyword_density > 0.05 or fraud_count >= 1:
-        risk_score = min(0.7, 0.2 + keyword_density * 3)
-        label = "MEDIUM"
-    else:
-        risk_score = max(0.1, 0.1 + random.random() * 0.2)
-        label = "LOW"
+    high = (keyword_density > 0.1) | (fraud_count >= 3)
+    medium = ~high & ((keyword_density > 0.05) | (fraud_count >= 1))
+    label_idx = np.where(high, 2, np.where(medium, 1, 0))
+    
+    risk_score = np.where(
+        high,
+        np.minimum(0.9, 0.3 + keyword_density * 2),
+        np.where(
+            medium,
+            np.minimum(0.7, 0.2 + keyword_density * 3),
+            np.maximum(0.1, 0.1 + jitter * 0.2)
+        )
+    )
+    return label_idx, risk_score
+
+def build_results(label_idx: np.ndarray, risk_score: np.ndarray, all_matches) -> List[Dict[str, Any]]:
+    """Assemble per-text result dicts from the vectorized scores"""
+    probabilities = LABEL_PROBABILITIES[label_idx]
+    return [
+        {
+            "probabilities": dict(zip(LABELS.tolist(), probabilities[i].tolist())),
+            "label": str(LABELS[label_idx[i]]),
+            "risk_score": float(risk_score[i]),
+            "matches": [
+                {"keyword": keyword, "start": start, "end": end}
+                for keyword, start, end in all_matches[i]
+            ]
+        }
+        for i in range(len(all_matches))
+    ]
+
+def predict_fraud_simple_batch(texts: List[str]) -> List[Dict[str, Any]]:
+    """Keyword fraud prediction for many texts, vectorized over the batch"""
+    if not texts:
+        return []
+    
+    counts, total_words, jitter, all_matches = keyword_count_matrix(texts)
     
-    # Create probabilities
-    if label == "HIGH":
-        probabilities = {"LOW": 0.05, "MEDIUM": 0.15, "HIGH": 0.8}
-    elif label == "MEDIUM":
-        probabilities = {"LOW": 0.2, "MEDIUM": 0.6, "HIGH": 0.2}
-    else:
-        probabilities = {"LOW": 0.7, "MEDIUM": 0.25, "HIGH": 0.05}
+    # Number of distinct fraud keywords in each text
+    fraud_count = counts.getnnz(axis=1)
     
-    return {
-        "probabilities": probabilities,
-        "label": label,
-        "risk_score": risk_score
-    }
+    label_idx, risk_score = score_keyword_counts(fraud_count, total_words, jitter)
+    return build_results(label_idx, risk_score, all_matches)
+
+def predict_fraud_simple(text: str) -> Dict[str, Any]:
+    """Simple fraud prediction based on keywords"""
+    
+    # A single text skips the sparse matrix but goes through the same
+    # scoring rules, so it matches predict_fraud_simple_batch exactly
+    matches, total_words = keyword_matcher.scan(text)
+    fraud_count = len({keyword for keyword, _, _ in matches})
+    
+    label_idx, risk_score = score_keyword_counts(
+        np.array([fraud_count]),
+        np.array([total_words]),
+        np.array([low_risk_jitter(text)])
+    )
+    return build_results(label_idx, risk_score, [matches])[0]
 
 @app.get("/health")
 async def health_check():
@@ -71,15 +176,31 @@ async def health_check():
 @app.post("/predict", response_model=PredictionResponse)
 async def predict(request: PredictionRequest):
     """Predict fraud risk for text"""
-    logger.info(f"Received prediction request for text: {request.text[:50]}...")
+    started = time.perf_counter()
     
     try:
         result = predict_fraud_simple(request.text)
-        logger.info(f"Prediction completed: {result['label']} (score: {result['risk_score']:.3f})")
+        request_logger.log("/predict", started, [request.text], results=[result])
         return PredictionResponse(**result)
         
     except Exception as e:
-        logger.error(f"Prediction error: {e}")
+        request_logger.log("/predict", started, [request.text], status=500, error=str(e))
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/predict/batch", response_model=BatchPredictionResponse)
+async def predict_batch(request: BatchPredictionRequest):
+    """Predict fraud risk for a list of texts, preserving input order"""
+    started = time.perf_counter()
+    
+    try:
+        results = predict_fraud_simple_batch(request.texts)
+        request_logger.log("/predict/batch", started, request.texts, results=results)
+        return BatchPredictionResponse(
+            predictions=[PredictionResponse(**result) for result in results]
+        )
+        
+    except Exception as e:
+        request_logger.log("/predict/batch", started, request.texts, status=500, error=str(e))
         raise HTTPException(status_code=500, detail=str(e))
 
 if __name__ == "__main__":
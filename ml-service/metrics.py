@@ -0,0 +1,252 @@
+"""Minimal Prometheus metrics: counters, gauges and histograms in text format
+
+Recording a value is a dict lookup, a bisect and a few additions under an
+uncontended lock, so metrics can sit on the prediction hot path. Values that
+already live elsewhere (queue depths, cache counters, startup timings) are
+read through callbacks at scrape time instead of being mirrored.
+"""
+
+import threading
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Seconds, from tokenizing a short SMS up to a slow bulk batch
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+LabelValues = Tuple[str, ...]
+
+
+def format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = (),
+                 function: Optional[Callable[[], object]] = None):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self.function = function
+        self._children: Dict[LabelValues, object] = {}
+        self._lock = threading.Lock()
+        if not self.labelnames and function is None:
+            self._children[()] = self._new_child()
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def labels(self, *values: str, **kwargs: str):
+        """Child metric for one combination of label values (bind these once, outside hot loops)"""
+        key = tuple(str(v) for v in values) or tuple(str(kwargs[name]) for name in self.labelnames)
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def samples(self) -> List[str]:
+        if self.function is not None:
+            # Callback: a number, or a dict of label values (tuple or single string) to numbers
+            value = self.function()
+            items = value.items() if isinstance(value, dict) else [((), value)]
+            return [
+                f"{self.name}{format_labels(self.labelnames, key if isinstance(key, tuple) else (key,))} "
+                f"{format_value(v)}"
+                for key, v in items
+            ]
+        lines = []
+        for key, child in list(self._children.items()):
+            lines.extend(child.samples(self.name, self.labelnames, key))
+        return lines
+
+    def total(self, **labels: str) -> float:
+        """Sum of counter/gauge children whose labels match ``labels``"""
+        positions = [(self.labelnames.index(name), str(value)) for name, value in labels.items()]
+        return sum(
+            child.value for key, child in list(self._children.items())
+            if all(key[i] == value for i, value in positions)
+        )
+
+    def render(self) -> str:
+        header = f"# HELP {self.name} {self.help}\n# TYPE {self.name} {self.kind}\n"
+        return header + "".join(line + "\n" for line in self.samples())
+
+    # Shortcuts for metrics without labels
+    def inc(self, amount: float = 1):
+        self._children[()].inc(amount)
+
+    def dec(self, amount: float = 1):
+        self._children[()].dec(amount)
+
+    def set(self, value: float):
+        self._children[()].set(value)
+
+    def observe(self, value: float):
+        self._children[()].observe(value)
+
+
+class _Value:
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1):
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount: float = 1):
+        with self._lock:
+            self.value -= amount
+
+    def set(self, value: float):
+        self.value = value
+
+    def samples(self, name: str, labelnames: Sequence[str], key: LabelValues) -> List[str]:
+        return [f"{name}{format_labels(labelnames, key)} {format_value(self.value)}"]
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def _new_child(self):
+        return _Value()
+
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def _new_child(self):
+        return _Value()
+
+
+class _Histogram:
+    def __init__(self, bounds: Tuple[float, ...]):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        index = bisect_left(self.bounds, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+
+    def samples(self, name: str, labelnames: Sequence[str], key: LabelValues) -> List[str]:
+        with self._lock:
+            counts = list(self.counts)
+            total = self.sum
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.bounds + (float("inf"),), counts):
+            cumulative += count
+            le = 'le="' + format_value(bound) + '"'
+            lines.append(f"{name}_bucket{format_labels(labelnames, key, le)} {cumulative}")
+        lines.append(f"{name}_sum{format_labels(labelnames, key)} {format_value(total)}")
+        lines.append(f"{name}_count{format_labels(labelnames, key)} {cumulative}")
+        return lines
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.bounds = tuple(sorted(buckets))
+        super().__init__(name, help_text, labelnames)
+
+    def _new_child(self):
+        return _Histogram(self.bounds)
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: List[Metric] = []
+
+    def register(self, metric: Metric) -> Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        return "".join(metric.render() for metric in self._metrics)
+
+
+REGISTRY = Registry()
+
+
+def counter(name: str, help_text: str, labelnames: Sequence[str] = (), function=None) -> Counter:
+    return REGISTRY.register(Counter(name, help_text, labelnames, function))
+
+
+def gauge(name: str, help_text: str, labelnames: Sequence[str] = (), function=None) -> Gauge:
+    return REGISTRY.register(Gauge(name, help_text, labelnames, function))
+
+
+def histogram(name: str, help_text: str, labelnames: Sequence[str] = (),
+              buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+    return REGISTRY.register(Histogram(name, help_text, labelnames, buckets))
+
+
+# Shared by the batching and executor modules
+QUEUE_WAIT_SECONDS = histogram(
+    "fraudshield_queue_wait_seconds",
+    "Time a prediction waited before its model call started",
+    ["queue"],
+)
+
+HTTP_REQUESTS = counter("fraudshield_http_requests_total", "HTTP requests by path and status code", ["path", "status"])
+HTTP_REQUEST_SECONDS = histogram("fraudshield_http_request_seconds", "HTTP request latency", ["path"])
+HTTP_IN_FLIGHT = gauge("fraudshield_http_requests_in_flight", "HTTP requests being served")
+
+
+class MetricsMiddleware:
+    """ASGI middleware counting requests by path and status, timing them and tracking in-flight requests
+
+    Only ``paths`` get their own label; anything else is reported as "other"
+    to keep label cardinality bounded.
+    """
+
+    def __init__(self, app, paths: Sequence[str]):
+        self.app = app
+        self.paths = set(paths)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        path = scope["path"] if scope["path"] in self.paths else "other"
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        start = time.perf_counter()
+        HTTP_IN_FLIGHT.inc()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            HTTP_IN_FLIGHT.dec()
+            HTTP_REQUEST_SECONDS.labels(path).observe(time.perf_counter() - start)
+            HTTP_REQUESTS.labels(path, str(status)).inc()
@@ -0,0 +1,128 @@
+"""Model construction; importing this module pulls in torch and transformers
+
+main.py imports it lazily, from the background loading task, so the server
+can bind its port before the heavy libraries are loaded.
+"""
+
+import logging
+import os
+import time
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+import torch
+from transformers import AutoConfig, AutoModelForSequenceClassification, AutoTokenizer
+
+from backends import (
+    BACKENDS,
+    EagerBackend,
+    OnnxBackend,
+    TorchScriptBackend,
+    artifact_is_current,
+    artifact_key,
+    export_onnx,
+    quantize_onnx,
+)
+
+logger = logging.getLogger(__name__)
+
+
+@contextmanager
+def timed(timings: Optional[Dict[str, float]], phase: str):
+    """Record how long a block takes under ``timings[phase]`` (seconds)"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        if timings is not None:
+            timings[phase] = round(time.perf_counter() - start, 3)
+
+
+def quantize_model(fp32_model):
+    """Apply dynamic int8 quantization to the model's Linear layers"""
+    return torch.ao.quantization.quantize_dynamic(
+        fp32_model,
+        {torch.nn.Linear},
+        dtype=torch.qint8
+    )
+
+
+def build_model(model_source: str, quantization: str = "", quantized_weights_path: str = "",
+                local_files_only: bool = False, timings: Optional[Dict[str, float]] = None):
+    """Build the tokenizer and classifier, optionally int8-quantized
+
+    ``model_source`` is a hub name or a local directory; local directories
+    holding safetensors weights are memory-mapped rather than read and copied.
+    """
+    with timed(timings, "tokenizer_load"):
+        model_tokenizer = AutoTokenizer.from_pretrained(model_source, local_files_only=local_files_only)
+
+    with timed(timings, "model_load"):
+        if quantized_weights_path:
+            # Pre-quantized artifact: rebuild the quantized module structure from
+            # the config, then load the saved int8 weights into it
+            config = AutoConfig.from_pretrained(model_source, num_labels=3, local_files_only=local_files_only)
+            classifier = quantize_model(AutoModelForSequenceClassification.from_config(config).eval())
+            classifier.load_state_dict(torch.load(quantized_weights_path))
+        else:
+            # For demo purposes, we'll use a simple classification head
+            # In production, you'd load your fine-tuned model
+            classifier = AutoModelForSequenceClassification.from_pretrained(
+                model_source,
+                num_labels=3,  # LOW, MEDIUM, HIGH
+                local_files_only=local_files_only
+            )
+            # Set to evaluation mode
+            classifier.eval()
+            if quantization == "dynamic":
+                classifier = quantize_model(classifier)
+            elif quantization:
+                raise ValueError(f"Unknown quantization mode: {quantization}")
+
+    return classifier, model_tokenizer
+
+
+def create_backend(name: str, model_source: str, quantization: str = "", quantized_weights_path: str = "",
+                   onnx_path: str = "", torchscript_path: str = "", local_files_only: bool = False,
+                   timings: Optional[Dict[str, float]] = None, exit_heads_path: str = "",
+                   exit_entropy: float = 0.2, model_version: str = ""):
+    """Build the inference backend plus the model (None for ONNX) and tokenizer that feed it
+
+    With ``exit_heads_path`` the eager backend stops early for texts an
+    intermediate exit head is confident about (see early_exit.py). Cached
+    ONNX and TorchScript files are reused only if they were built from the
+    same model source, version and quantization, and rebuilt otherwise.
+    """
+    if exit_heads_path and name != "eager":
+        raise ValueError(f"Early exit needs the eager backend, not {name}")
+    key = artifact_key(model_source, model_version, quantization)
+    if name == "onnx":
+        if not onnx_path:
+            raise ValueError("The onnx backend needs a path to export the model to")
+        # ONNX Runtime does its own int8 quantization, so export from fp32
+        with timed(timings, "tokenizer_load"):
+            model_tokenizer = AutoTokenizer.from_pretrained(model_source, local_files_only=local_files_only)
+        if not artifact_is_current(onnx_path, key):
+            fp32_model, _ = build_model(model_source, local_files_only=local_files_only)
+            with timed(timings, "onnx_export"):
+                export_onnx(fp32_model, model_tokenizer, onnx_path, key)
+        with timed(timings, "backend_init"):
+            session_path = quantize_onnx(onnx_path, key) if quantization else onnx_path
+            backend = OnnxBackend(session_path, torch.get_num_threads())
+        return backend, None, model_tokenizer
+
+    classifier, model_tokenizer = build_model(
+        model_source, quantization, quantized_weights_path, local_files_only, timings
+    )
+    with timed(timings, "backend_init"):
+        if name == "torchscript":
+            backend = TorchScriptBackend(classifier, model_tokenizer, torchscript_path, key)
+        elif name == "eager" and exit_heads_path:
+            from early_exit import EarlyExitBackend, ExitHeads
+
+            backend = EarlyExitBackend(classifier, ExitHeads.load(exit_heads_path), exit_entropy)
+        elif name == "eager":
+            backend = EagerBackend(classifier)
+        else:
+            raise ValueError(f"Unknown inference backend: {name} (expected one of {', '.join(BACKENDS)})")
+    return backend, classifier, model_tokenizer
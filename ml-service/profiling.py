@@ -0,0 +1,154 @@
+"""On-demand profile capture for a running service
+
+Two kinds of capture:
+
+- ``cpu``: a sampling profiler that snapshots every thread's Python stack at
+  a fixed interval and returns them in collapsed-stack format (one
+  ``frame;frame;frame count`` line per stack), which flamegraph.pl,
+  speedscope and similar tools read directly.
+- ``torch``: the PyTorch profiler around every model call made during the
+  capture, merged into a single Chrome trace (chrome://tracing, Perfetto).
+  The profiler only sees the thread that starts it, so each model call is
+  profiled on its own inference thread; with a separate inference server
+  process the model calls happen there and this capture stays empty.
+  Torch can't run two profiler sessions at once, so while a capture runs
+  model calls are profiled one at a time, even with several inference
+  workers.
+
+Only one capture runs at a time.
+"""
+
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager, nullcontext
+from typing import Callable, List, Optional, Tuple
+
+PROFILE_KINDS = ("cpu", "torch")
+
+# Overlapping torch profiler sessions crash the process; this is held for
+# each profiled model call, including one that outlives its capture
+_torch_profiler_lock = threading.Lock()
+
+
+class ProfilerBusy(RuntimeError):
+    """Raised when a capture is requested while another one is running"""
+
+
+class SamplingProfiler:
+    """Samples the Python stacks of all threads from a background thread"""
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self.samples: Counter = Counter()
+        self._stopping = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> bytes:
+        self._stopping.set()
+        self._thread.join()
+        lines = [f"{stack} {count}" for stack, count in self.samples.most_common()]
+        return ("\n".join(lines) + "\n").encode("utf-8")
+
+    def _run(self):
+        own_id = threading.get_ident()
+        while not self._stopping.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                    frame = frame.f_back
+                stack.append(names.get(thread_id, str(thread_id)))
+                self.samples[";".join(reversed(stack))] += 1
+
+
+class TorchCapture:
+    """Collects one torch profiler trace per model call and merges them"""
+
+    def __init__(self):
+        self.events: List[dict] = []
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def model_call(self):
+        import torch
+
+        with _torch_profiler_lock:
+            profiler = torch.profiler.profile(activities=[torch.profiler.ProfilerActivity.CPU], record_shapes=True)
+            with profiler:
+                yield
+            # Traces from separate profilers share a time base, so events can be concatenated
+            with tempfile.NamedTemporaryFile(suffix=".json") as f:
+                profiler.export_chrome_trace(f.name)
+                with open(f.name, encoding="utf-8") as trace:
+                    events = json.load(trace).get("traceEvents", [])
+        with self._lock:
+            self.events.extend(events)
+            self.calls += 1
+
+    def stop(self) -> bytes:
+        with self._lock:
+            return json.dumps({"traceEvents": self.events, "displayTimeUnit": "ms"}).encode("utf-8")
+
+
+_active_capture: Optional[object] = None
+_torch_capture: Optional[TorchCapture] = None
+
+
+def model_call():
+    """Wrap a model call; records it when a torch capture is running"""
+    capture = _torch_capture
+    return capture.model_call() if capture is not None else nullcontext()
+
+
+async def capture(kind: str, seconds: float, requests: int = 0,
+                  completed_requests: Callable[[], float] = lambda: 0) -> Tuple[bytes, str, str]:
+    """Profile for ``seconds``, or until ``requests`` more requests complete if that comes first
+
+    Returns the profile bytes, a file name and a media type.
+    """
+    global _active_capture, _torch_capture
+
+    if kind not in PROFILE_KINDS:
+        raise ValueError(f"Unknown profile kind: {kind} (expected one of {', '.join(PROFILE_KINDS)})")
+    if _active_capture is not None:
+        raise ProfilerBusy("A profile capture is already running")
+
+    if kind == "cpu":
+        profiler = SamplingProfiler()
+        profiler.start()
+        _active_capture = profiler
+    else:
+        profiler = TorchCapture()
+        _active_capture = _torch_capture = profiler
+
+    try:
+        baseline = completed_requests()
+        deadline = time.monotonic() + seconds
+        while time.monotonic() < deadline:
+            if requests and completed_requests() - baseline >= requests:
+                break
+            await asyncio.sleep(0.05)
+    finally:
+        _torch_capture = None
+        _active_capture = None
+        # Stopping joins the sampler thread, so keep it off the event loop
+        data = await asyncio.to_thread(profiler.stop)
+
+    if kind == "cpu":
+        return data, "profile.collapsed", "text/plain"
+    return data, "trace.json", "application/json"
@@ -0,0 +1,91 @@
+"""Directory-based model registry
+
+Each version is a subdirectory of the registry root holding one model
+artifact (config, weights and tokenizer, as written by save_pretrained):
+
+    models/
+      CURRENT                  <- name of the active version
+      bert-fraud-2024-05-01/
+      bert-fraud-2024-06-12/
+
+The directory name is the model version reported in responses and used in
+cache keys. Artifacts derived from a version (ONNX export, TorchScript
+trace, pre-quantized weights, early-exit heads) live inside its directory,
+so versions never share them. CURRENT is rewritten atomically after a successful swap, so a
+restart comes back on the last activated version.
+"""
+
+import os
+import re
+import time
+from typing import Any, Dict, List, Optional
+
+CURRENT_FILE = "CURRENT"
+VERSION_PATTERN = re.compile(r"^[A-Za-z0-9][A-Za-z0-9._-]{0,63}$")
+
+# Per-version locations of derived artifacts
+ONNX_FILE = "model.onnx"
+TORCHSCRIPT_FILE = "model.torchscript.pt"
+QUANTIZED_WEIGHTS_FILE = "quantized.pt"
+EXIT_HEADS_FILE = "exit_heads.pt"
+
+
+class UnknownModelVersion(KeyError):
+    """Raised for a version that is not a valid model directory in the registry"""
+
+
+class ModelRegistry:
+    def __init__(self, root: str):
+        self.root = root
+
+    def path(self, version: str) -> str:
+        """Directory of ``version``; the name must be a plain directory name holding a config.json"""
+        if not VERSION_PATTERN.match(version):
+            raise UnknownModelVersion(f"Invalid model version name: {version!r}")
+        path = os.path.join(self.root, version)
+        if not os.path.isfile(os.path.join(path, "config.json")):
+            raise UnknownModelVersion(f"No model version {version!r} in {self.root}")
+        return path
+
+    def artifact(self, version: str, filename: str) -> str:
+        return os.path.join(self.path(version), filename)
+
+    def versions(self) -> List[Dict[str, Any]]:
+        """Every valid version with its size and modification time, oldest first"""
+        if not os.path.isdir(self.root):
+            return []
+        versions = []
+        for name in os.listdir(self.root):
+            try:
+                path = self.path(name)
+            except UnknownModelVersion:
+                continue
+            size = sum(
+                os.path.getsize(os.path.join(directory, filename))
+                for directory, _, filenames in os.walk(path)
+                for filename in filenames
+            )
+            versions.append({
+                "version": name,
+                "size_mb": round(size / (1 << 20), 1),
+                "modified": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(os.path.getmtime(path))),
+            })
+        return sorted(versions, key=lambda v: v["modified"])
+
+    def current(self) -> Optional[str]:
+        """The version named in CURRENT, if it exists"""
+        try:
+            with open(os.path.join(self.root, CURRENT_FILE), encoding="utf-8") as f:
+                version = f.read().strip()
+        except OSError:
+            return None
+        return version or None
+
+    def set_current(self, version: str):
+        """Record ``version`` as the one to load on startup (written atomically)"""
+        self.path(version)
+        path = os.path.join(self.root, CURRENT_FILE)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(version + "\n")
+        os.replace(tmp_path, path)
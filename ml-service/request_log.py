@@ -0,0 +1,180 @@
+"""Structured, non-blocking request logging
+
+Log records are put on a bounded queue and written by a background thread
+(logging's QueueHandler/QueueListener), so a slow stdout or log shipper
+never stalls a request; when the queue is full records are dropped and
+counted rather than blocking. With the JSON format every record is one JSON
+object per line, and fields passed as ``extra={"fields": {...}}`` become
+top-level keys.
+
+Per-request logs go through RequestLogger: successful requests are sampled,
+errors and slow requests are always logged. Message text never reaches the
+logs verbatim unless asked for: by default it is replaced by a keyed hash
+(stable for one key, so repeats of the same message can be correlated) and
+its length.
+"""
+
+import hashlib
+import hmac
+import json
+import logging
+import os
+import queue
+import random
+import sys
+import time
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any, Dict, List, Optional
+
+TEXT_MODES = ("hash", "redact", "raw")
+
+# Attributes every LogRecord has; anything else came in through ``extra``
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record, with ``fields`` and other extras merged in"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key == "fields":
+                entry.update(value)
+            elif key not in _RECORD_ATTRIBUTES:
+                entry[key] = value
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class DroppingQueueHandler(QueueHandler):
+    """QueueHandler that drops records instead of blocking or erroring when the queue is full"""
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+_listener: Optional[QueueListener] = None
+_handler: Optional[DroppingQueueHandler] = None
+
+
+def configure_logging(log_format: str = "json", level: int = logging.INFO, queue_size: int = 10000):
+    """Route all logging through a bounded queue drained by a background writer thread"""
+    global _listener, _handler
+
+    output = logging.StreamHandler(sys.stderr)
+    if log_format == "json":
+        output.setFormatter(JsonFormatter())
+    else:
+        output.setFormatter(logging.Formatter("%(levelname)s:%(name)s:%(message)s"))
+
+    stop_logging()
+    _handler = DroppingQueueHandler(queue.Queue(maxsize=max(1, queue_size)))
+    _listener = QueueListener(_handler.queue, output, respect_handler_level=False)
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(_handler)
+    root.setLevel(level)
+    _listener.start()
+
+
+def stop_logging():
+    """Flush queued records and stop the writer thread"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def dropped_records() -> int:
+    return _handler.dropped if _handler is not None else 0
+
+
+class RequestLogger:
+    """Sampled per-request logging with message text hashed or redacted"""
+
+    def __init__(self, logger: logging.Logger, sample_rate: float = 0.01, slow_ms: float = 500.0,
+                 text_mode: str = "hash", hash_key: str = ""):
+        if text_mode not in TEXT_MODES:
+            raise ValueError(f"Unknown text mode: {text_mode} (expected one of {', '.join(TEXT_MODES)})")
+        self.logger = logger
+        self.sample_rate = min(max(sample_rate, 0.0), 1.0)
+        self.slow_ms = slow_ms
+        self.text_mode = text_mode
+        # Without a configured key, hashes are only comparable within one process
+        self.hash_key = hash_key.encode("utf-8") if hash_key else os.urandom(16)
+        self.sampled_out = 0
+
+    def describe_text(self, text: str) -> Dict[str, Any]:
+        """Loggable stand-in for a message: its length plus a keyed hash or a prefix"""
+        described: Dict[str, Any] = {"chars": len(text)}
+        if self.text_mode == "hash":
+            described["sha"] = hmac.new(self.hash_key, text.encode("utf-8"), hashlib.sha256).hexdigest()[:16]
+        elif self.text_mode == "raw":
+            described["text"] = text[:50]
+        return described
+
+    def log(self, endpoint: str, started: float, texts: List[str], status: int = 200,
+            results: Optional[List[Dict[str, Any]]] = None, error: Optional[str] = None):
+        """Log one request: always on error or when slow, otherwise sampled"""
+        latency_ms = (time.perf_counter() - started) * 1000
+        slow = latency_ms >= self.slow_ms
+        failed = error is not None or status >= 500
+        if not (failed or slow or random.random() < self.sample_rate):
+            self.sampled_out += 1
+            return
+
+        fields: Dict[str, Any] = {
+            "event": "prediction",
+            "endpoint": endpoint,
+            "status": status,
+            "latency_ms": round(latency_ms, 2),
+            "texts": len(texts),
+        }
+        if len(texts) == 1:
+            fields["input"] = self.describe_text(texts[0])
+        if results:
+            if len(results) == 1:
+                fields["label"] = results[0]["label"]
+                fields["risk_score"] = round(results[0]["risk_score"], 4)
+            else:
+                labels: Dict[str, int] = {}
+                for result in results:
+                    labels[result["label"]] = labels.get(result["label"], 0) + 1
+                fields["labels"] = labels
+        if error is not None:
+            fields["error"] = error
+        if slow:
+            fields["slow"] = True
+        if not (failed or slow):
+            fields["sample_rate"] = self.sample_rate
+
+        # Overload rejections (503) are expected under load; other server errors are not
+        if status >= 500 and status != 503:
+            level = logging.ERROR
+        else:
+            level = logging.WARNING if failed or slow else logging.INFO
+        self.logger.log(level, "prediction request", extra={"fields": fields})
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "sample_rate": self.sample_rate,
+            "slow_ms": self.slow_ms,
+            "text_mode": self.text_mode,
+            "sampled_out": self.sampled_out,
+            "dropped_records": dropped_records(),
+        }
@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+"""
+Re-score a message dump offline with the service's model
+
+Reads CSV, JSONL or Parquet input in streaming chunks, scores each chunk in
+a pool of worker processes (each loads the model the same way main.py does
+and runs predict_fraud_batch), and appends results to a JSONL or CSV output
+as chunks finish, in input order.
+
+Progress is checkpointed next to the output after every chunk. Re-running
+the same command after an interruption resumes from the last checkpoint;
+pass --restart to start over.
+
+    python score_offline.py messages.parquet scores.jsonl --workers 4
+"""
+
+import argparse
+import csv
+import json
+import multiprocessing
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+Row = Tuple[Any, Optional[str]]  # (id, text)
+
+CSV_FIELDS = ["id", "label", "risk_score", "prob_low", "prob_medium", "prob_high", "error"]
+
+
+def read_rows(path: str, text_column: str, id_column: Optional[str], chunk_size: int) -> Iterator[List[Row]]:
+    """Yield (id, text) rows in chunks; rows without an id column are numbered from 0"""
+
+    def chunks(records: Iterator[Dict[str, Any]]) -> Iterator[List[Row]]:
+        chunk = []
+        for number, record in enumerate(records):
+            text = record.get(text_column)
+            chunk.append((record.get(id_column) if id_column else number, text if isinstance(text, str) else None))
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+    if path.endswith(".parquet"):
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise SystemExit("Reading Parquet requires the pyarrow package")
+        columns = [text_column] + ([id_column] if id_column else [])
+        batches = pq.ParquetFile(path).iter_batches(batch_size=chunk_size, columns=columns)
+        yield from chunks(record for batch in batches for record in batch.to_pylist())
+        return
+
+    with open(path, newline="", encoding="utf-8") as f:
+        if path.endswith(".csv"):
+            yield from chunks(csv.DictReader(f))
+        else:
+            yield from chunks(json.loads(line) for line in f if line.strip())
+
+
+def skip_rows(chunks: Iterator[List[Row]], rows: int) -> Iterator[List[Row]]:
+    """Drop the first ``rows`` rows (already scored by an earlier run)"""
+    for chunk in chunks:
+        if rows >= len(chunk):
+            rows -= len(chunk)
+            continue
+        yield chunk[rows:]
+        rows = 0
+
+
+def init_worker(model_source: Optional[str], workers: int, torch_threads: int):
+    """Load the model once per worker process"""
+    global service
+    import main as service
+    from executor import configure_torch_threads
+
+    if model_source:
+        # Everything main derived from MODEL_PATH at import has to follow,
+        # or rows would be stamped with the default model's version
+        service.MODEL_SOURCE = model_source
+        service.MODEL_PATH = model_source if os.path.isdir(model_source) else ""
+        service.MODEL_VERSION = service.source_version(model_source)
+        service.REGISTRY_VERSION = None
+    configure_torch_threads(workers, torch_threads)
+    service.load_model()
+
+
+def score_chunk(texts: List[str]) -> List[Dict[str, Any]]:
+    return service.predict_fraud_batch(texts)
+
+
+def format_results(rows: List[Row], results: List[Dict[str, Any]], as_csv: bool) -> str:
+    """Render one chunk of results for the output file"""
+    scored = iter(results)
+    lines = []
+    for row_id, text in rows:
+        if text is None:
+            record = {"id": row_id, "error": "missing text"}
+        else:
+            record = {"id": row_id, **next(scored)}
+        if not as_csv:
+            lines.append(json.dumps(record) + "\n")
+            continue
+        probabilities = record.get("probabilities", {})
+        values = [
+            row_id, record.get("label", ""), record.get("risk_score", ""),
+            probabilities.get("LOW", ""), probabilities.get("MEDIUM", ""), probabilities.get("HIGH", ""),
+            record.get("error", ""),
+        ]
+        lines.append(",".join(csv_escape(value) for value in values) + "\n")
+    return "".join(lines)
+
+
+def csv_escape(value: Any) -> str:
+    value = str(value)
+    if any(c in value for c in ',"\n\r'):
+        return '"' + value.replace('"', '""') + '"'
+    return value
+
+
+def load_checkpoint(path: str, input_path: str) -> Optional[Dict[str, Any]]:
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as f:
+        checkpoint = json.load(f)
+    if checkpoint.get("input") != os.path.abspath(input_path):
+        raise SystemExit(f"{path} belongs to a run over {checkpoint.get('input')}; pass --restart to discard it")
+    return checkpoint
+
+
+def save_checkpoint(path: str, checkpoint: Dict[str, Any]):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(checkpoint, f)
+    os.replace(tmp_path, path)
+
+
+def write_chunk(out, entry, as_csv: bool, checkpoint: Dict[str, Any], checkpoint_path: str) -> int:
+    """Append one finished chunk to the output and checkpoint past it"""
+    rows, future = entry
+    out.write(format_results(rows, future.result(), as_csv).encode("utf-8"))
+    out.flush()
+    os.fsync(out.fileno())
+    checkpoint["rows_done"] += len(rows)
+    checkpoint["output_bytes"] = out.tell()
+    save_checkpoint(checkpoint_path, checkpoint)
+    return len(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("input", help="CSV, JSONL or Parquet file of messages")
+    parser.add_argument("output", help="Results file; .csv writes CSV, anything else JSONL")
+    parser.add_argument("--text-column", default="text")
+    parser.add_argument("--id-column", help="Column copied to the output as id (default: row number)")
+    parser.add_argument("--model", help="Model name or directory (default: MODEL_PATH or main.MODEL_NAME)")
+    parser.add_argument("--workers", type=int, default=max(1, (os.cpu_count() or 1) // 2),
+                        help="Scoring processes, each with its own copy of the model")
+    parser.add_argument("--torch-threads", type=int, default=0, help="Torch threads per worker (0 = cores / workers)")
+    parser.add_argument("--chunk-size", type=int, default=256, help="Rows per chunk sent to a worker")
+    parser.add_argument("--restart", action="store_true", help="Ignore any checkpoint and start over")
+    args = parser.parse_args()
+
+    checkpoint_path = args.output + ".checkpoint"
+    as_csv = args.output.endswith(".csv")
+    checkpoint = None if args.restart else load_checkpoint(checkpoint_path, args.input)
+
+    if checkpoint:
+        # Drop anything written after the last checkpoint, then append
+        out = open(args.output, "r+b")
+        out.truncate(checkpoint["output_bytes"])
+        out.seek(checkpoint["output_bytes"])
+        print(f"↩️  Resuming after {checkpoint['rows_done']} rows")
+    else:
+        out = open(args.output, "wb")
+        if as_csv:
+            out.write((",".join(CSV_FIELDS) + "\n").encode("utf-8"))
+        checkpoint = {"input": os.path.abspath(args.input), "rows_done": 0, "output_bytes": out.tell()}
+
+    chunks = skip_rows(
+        read_rows(args.input, args.text_column, args.id_column, args.chunk_size), checkpoint["rows_done"]
+    )
+
+    print(f"🧮 Scoring {args.input} with {args.workers} workers...")
+    start = time.perf_counter()
+    rows_scored = 0
+    # Spawned workers: forking a process that already imported torch is unsafe
+    pool = ProcessPoolExecutor(
+        max_workers=args.workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=init_worker,
+        initargs=(args.model, args.workers, args.torch_threads),
+    )
+    in_flight = deque()
+    try:
+        for rows in chunks:
+            texts = [text for _, text in rows if text is not None]
+            in_flight.append((rows, pool.submit(score_chunk, texts)))
+            # Keep every worker busy without reading the whole input ahead
+            while len(in_flight) > 2 * args.workers or (in_flight and in_flight[0][1].done()):
+                rows_scored += write_chunk(out, in_flight.popleft(), as_csv, checkpoint, checkpoint_path)
+        while in_flight:
+            rows_scored += write_chunk(out, in_flight.popleft(), as_csv, checkpoint, checkpoint_path)
+        elapsed = time.perf_counter() - start
+        os.remove(checkpoint_path)
+    except KeyboardInterrupt:
+        print(f"\n⏸️  Interrupted after {checkpoint['rows_done']} rows; rerun to resume")
+        pool.shutdown(wait=False, cancel_futures=True)
+        raise SystemExit(130)
+    finally:
+        out.close()
+    pool.shutdown()
+
+    print(f"✅ Scored {rows_scored} rows in {elapsed:.1f}s ({rows_scored / elapsed if elapsed else 0:.1f} rows/sec)")
+    print(f"💾 Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
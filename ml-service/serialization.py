@@ -0,0 +1,104 @@
+"""Fast request/response encoding for the prediction endpoints
+
+Responses are encoded straight from the result dicts with orjson, or with
+msgpack when the client's Accept header prefers it, and returned as a ready
+Response so FastAPI doesn't validate and re-encode them through the
+response model (the models stay on the routes for the OpenAPI schema).
+
+Request bodies may be JSON or msgpack (Content-Type: application/msgpack).
+NegotiatedRoute decodes msgpack bodies into the same Python objects the
+JSON path produces, so the usual pydantic request models validate both.
+"""
+
+from typing import Any, Callable, Coroutine, Dict, Optional
+
+import msgpack
+import orjson
+from fastapi import Request, Response
+from fastapi.routing import APIRoute
+
+JSON_MEDIA_TYPE = "application/json"
+MSGPACK_MEDIA_TYPE = "application/msgpack"
+MSGPACK_MEDIA_TYPES = {MSGPACK_MEDIA_TYPE, "application/x-msgpack", "application/vnd.msgpack"}
+
+# Scope key marking a request whose body arrived as msgpack
+BODY_FORMAT_KEY = "fraudshield.body_format"
+
+
+def media_type(header: Optional[str]) -> str:
+    """Bare media type of a Content-Type header, lowercased"""
+    return (header or "").split(";", 1)[0].strip().lower()
+
+
+def wants_msgpack(accept: Optional[str]) -> bool:
+    """True when the Accept header ranks msgpack above JSON (JSON wins ties and */*)"""
+    if not accept:
+        return False
+    msgpack_q = json_q = 0.0
+    for item in accept.split(","):
+        kind, _, params = item.partition(";")
+        kind = kind.strip().lower()
+        q = 1.0
+        for param in params.split(";"):
+            name, _, value = param.partition("=")
+            if name.strip() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if kind in MSGPACK_MEDIA_TYPES:
+            msgpack_q = max(msgpack_q, q)
+        elif kind in (JSON_MEDIA_TYPE, "application/*", "*/*"):
+            json_q = max(json_q, q)
+    return msgpack_q > json_q
+
+
+def encode(payload: Any, accept: Optional[str] = None) -> Response:
+    """Encode ``payload`` as msgpack or JSON, whichever the client prefers"""
+    if wants_msgpack(accept):
+        return Response(content=msgpack.packb(payload), media_type=MSGPACK_MEDIA_TYPE)
+    return Response(content=orjson.dumps(payload), media_type=JSON_MEDIA_TYPE)
+
+
+def prediction_payload(result: Dict[str, Any]) -> Dict[str, Any]:
+    """The public fields of a prediction result (drops internal extras such as keyword matches)"""
+    return {
+        "probabilities": result["probabilities"],
+        "label": result["label"],
+        "risk_score": result["risk_score"],
+        "model_version": result.get("model_version"),
+    }
+
+
+class NegotiatedRequest(Request):
+    """Request whose JSON body is parsed with orjson, or unpacked from msgpack"""
+
+    async def json(self) -> Any:
+        if not hasattr(self, "_json"):
+            body = await self.body()
+            if self.scope.get(BODY_FORMAT_KEY) == "msgpack":
+                self._json = msgpack.unpackb(body)
+            else:
+                # orjson's decode error subclasses json.JSONDecodeError, so FastAPI still answers 422
+                self._json = orjson.loads(body)
+        return self._json
+
+
+class NegotiatedRoute(APIRoute):
+    """Route that accepts msgpack request bodies alongside JSON"""
+
+    def get_route_handler(self) -> Callable[[Request], Coroutine[Any, Any, Response]]:
+        handler = super().get_route_handler()
+
+        async def negotiated_handler(request: Request) -> Response:
+            scope = request.scope
+            if media_type(request.headers.get("content-type")) in MSGPACK_MEDIA_TYPES:
+                # FastAPI only parses bodies it sees as JSON; relabel and decode ourselves
+                scope = dict(scope)
+                scope["headers"] = [
+                    (name, value) for name, value in scope["headers"] if name != b"content-type"
+                ] + [(b"content-type", JSON_MEDIA_TYPE.encode())]
+                scope[BODY_FORMAT_KEY] = "msgpack"
+            return await handler(NegotiatedRequest(scope, request.receive))
+
+        return negotiated_handler
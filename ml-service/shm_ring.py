@@ -0,0 +1,116 @@
+import sys
+from multiprocessing import resource_tracker, shared_memory
+from typing import Optional
+
+import numpy as np
+
+# Ring header: three uint64 words (head, tail, capacity) ahead of the data
+HEADER_BYTES = 24
+LENGTH_BYTES = 4
+
+
+def create_segment(name: str, size: int) -> shared_memory.SharedMemory:
+    """Create a named shared memory segment, replacing a stale one left by a crash"""
+    try:
+        stale = attach_segment(name)
+    except FileNotFoundError:
+        pass
+    else:
+        stale.close()
+        stale.unlink()
+    return shared_memory.SharedMemory(name=name, create=True, size=size)
+
+
+def attach_segment(name: str) -> shared_memory.SharedMemory:
+    """Attach to a segment owned by another process without taking over its cleanup"""
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name=name, track=False)
+    segment = shared_memory.SharedMemory(name=name)
+    # Before 3.13 every attaching process registers the segment with its
+    # resource tracker, which would unlink it when that process exits
+    resource_tracker.unregister(segment._name, "shared_memory")
+    return segment
+
+
+class ShmRing:
+    """Single-producer, single-consumer byte ring in shared memory
+
+    Records are length-prefixed byte strings. ``head`` and ``tail`` are
+    ever-increasing byte counters; only the producer advances ``head`` and
+    only the consumer advances ``tail``, each published with one aligned
+    8-byte store after the record bytes are in place, so no lock is needed.
+    Records may wrap around the end of the buffer.
+    """
+
+    def __init__(self, segment: shared_memory.SharedMemory, owner: bool = False):
+        self.segment = segment
+        self.owner = owner
+        self._index = np.ndarray((3,), dtype=np.uint64, buffer=segment.buf)
+        self.capacity = int(self._index[2])
+        self._data = segment.buf[HEADER_BYTES:HEADER_BYTES + self.capacity]
+
+    @classmethod
+    def create(cls, name: str, capacity: int) -> "ShmRing":
+        segment = create_segment(name, HEADER_BYTES + capacity)
+        index = np.ndarray((3,), dtype=np.uint64, buffer=segment.buf)
+        index[:] = (0, 0, capacity)
+        del index
+        return cls(segment, owner=True)
+
+    @classmethod
+    def attach(cls, name: str) -> "ShmRing":
+        return cls(attach_segment(name))
+
+    def used(self) -> int:
+        return int(self._index[0]) - int(self._index[1])
+
+    def _copy_in(self, position: int, data: bytes):
+        offset = position % self.capacity
+        first = min(len(data), self.capacity - offset)
+        self._data[offset:offset + first] = data[:first]
+        if first < len(data):
+            self._data[:len(data) - first] = data[first:]
+
+    def _copy_out(self, position: int, size: int) -> bytes:
+        offset = position % self.capacity
+        first = min(size, self.capacity - offset)
+        if first == size:
+            return bytes(self._data[offset:offset + size])
+        return bytes(self._data[offset:]) + bytes(self._data[:size - first])
+
+    def fits(self, record: bytes) -> bool:
+        """Whether the record fits in the ring at all, i.e. once it is empty"""
+        return LENGTH_BYTES + len(record) <= self.capacity
+
+    def put(self, record: bytes) -> bool:
+        """Append one record; returns False if the ring has no room for it"""
+        size = LENGTH_BYTES + len(record)
+        if size > self.capacity - self.used():
+            return False
+        head = int(self._index[0])
+        self._copy_in(head, len(record).to_bytes(LENGTH_BYTES, "little"))
+        self._copy_in(head + LENGTH_BYTES, record)
+        self._index[0] = head + size
+        return True
+
+    def get(self) -> Optional[bytes]:
+        """Pop the oldest record, or None if the ring is empty"""
+        tail = int(self._index[1])
+        if int(self._index[0]) == tail:
+            return None
+        length = int.from_bytes(self._copy_out(tail, LENGTH_BYTES), "little")
+        record = self._copy_out(tail + LENGTH_BYTES, length)
+        self._index[1] = tail + LENGTH_BYTES + length
+        return record
+
+    def discard(self):
+        """Drop everything currently queued (consumer side only)"""
+        self._index[1] = self._index[0]
+
+    def close(self):
+        # Views into the buffer must be released before the mapping can close
+        self._data.release()
+        del self._index
+        self.segment.close()
+        if self.owner:
+            self.segment.unlink()
@@ -0,0 +1,140 @@
+import asyncio
+import json
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from starlette.responses import StreamingResponse
+from starlette.types import Receive, Scope, Send
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+
+class DuplexStreamingResponse(StreamingResponse):
+    """StreamingResponse whose body iterator is still reading the request body
+
+    The stock response listens for client disconnects by calling
+    ``receive()`` alongside the body iterator, which would swallow request
+    body messages. Here the iterator owns ``receive`` (reading the request
+    stream raises ClientDisconnect if the client goes away).
+    """
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        await self.stream_response(send)
+        if self.background is not None:
+            await self.background()
+
+
+class LineTooLong(ValueError):
+    """Raised for an input line longer than the configured limit"""
+
+
+async def iter_lines(chunks: AsyncIterator[bytes], max_line_bytes: int) -> AsyncIterator[Any]:
+    """Split a byte stream into lines without holding more than one line in memory
+
+    Yields each line as bytes, or a LineTooLong instance in place of a line
+    that exceeded ``max_line_bytes`` (the rest of that line is skipped).
+    """
+    buffer = bytearray()
+    skipping = False
+    async for chunk in chunks:
+        start = 0
+        while True:
+            newline = chunk.find(b"\n", start)
+            if newline < 0:
+                if not skipping:
+                    buffer += chunk[start:]
+                    if len(buffer) > max_line_bytes:
+                        buffer.clear()
+                        skipping = True
+                break
+            if skipping:
+                skipping = False
+                yield LineTooLong(f"Line exceeds {max_line_bytes} bytes")
+            else:
+                buffer += chunk[start:newline]
+                if len(buffer) > max_line_bytes:
+                    yield LineTooLong(f"Line exceeds {max_line_bytes} bytes")
+                else:
+                    yield bytes(buffer)
+                buffer.clear()
+            start = newline + 1
+    if skipping:
+        yield LineTooLong(f"Line exceeds {max_line_bytes} bytes")
+    elif buffer.strip():
+        yield bytes(buffer)
+
+
+def parse_record(line: bytes) -> Tuple[Optional[str], Any]:
+    """Return (text, id) for one input record; raises ValueError if it is malformed"""
+    try:
+        record = json.loads(line)
+    except ValueError:
+        raise ValueError("Invalid JSON")
+    if not isinstance(record, dict) or not isinstance(record.get("text"), str):
+        raise ValueError('Expected an object with a string "text" field')
+    return record["text"], record.get("id")
+
+
+async def score_ndjson(
+    chunks: AsyncIterator[bytes],
+    score_texts: Callable[[List[str]], Awaitable[List[Dict[str, Any]]]],
+    chunk_size: int = 64,
+    max_line_bytes: int = 1 << 20,
+) -> AsyncIterator[bytes]:
+    """Score an NDJSON stream of {"text": ..., "id": ...} records, yielding NDJSON results
+
+    Records are scored in chunks of ``chunk_size`` texts. While one chunk is
+    being scored the next one is read, so at most two chunks are held in
+    memory however large the upload is. Each output line carries the 1-based
+    input ``line`` number, the ``id`` if one was given, and either the
+    prediction or an ``error``.
+    """
+
+    async def run(entries: List[Dict[str, Any]], texts: List[str]) -> bytes:
+        if texts:
+            try:
+                results = iter(await score_texts(texts))
+            except Exception as e:
+                detail = str(getattr(e, "detail", e))
+                results = iter([{"error": detail}] * len(texts))
+            for entry in entries:
+                if "error" not in entry:
+                    entry.update(next(results))
+        return b"".join(json.dumps(entry).encode("utf-8") + b"\n" for entry in entries)
+
+    pending: Optional[asyncio.Task] = None
+    entries: List[Dict[str, Any]] = []
+    texts: List[str] = []
+    line_number = 0
+
+    try:
+        async for line in iter_lines(chunks, max_line_bytes):
+            line_number += 1
+            if isinstance(line, LineTooLong):
+                entries.append({"line": line_number, "error": str(line)})
+            elif line.strip():
+                try:
+                    text, record_id = parse_record(line)
+                except ValueError as e:
+                    entries.append({"line": line_number, "error": str(e)})
+                else:
+                    entry = {"line": line_number}
+                    if record_id is not None:
+                        entry["id"] = record_id
+                    entries.append(entry)
+                    texts.append(text)
+
+            if len(entries) >= chunk_size:
+                if pending is not None:
+                    yield await pending
+                pending = asyncio.create_task(run(entries, texts))
+                entries, texts = [], []
+
+        if pending is not None:
+            yield await pending
+            pending = None
+        if entries:
+            yield await run(entries, texts)
+    finally:
+        # Client went away mid-stream: don't leave a chunk scoring in the background
+        if pending is not None and not pending.done():
+            pending.cancel()
@@ -0,0 +1,23 @@
+import os
+import sys
+
+import pytest
+
+# The service modules live next to this directory, not in a package
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture(scope="session")
+def tiny_model_dir(tmp_path_factory):
+    """Save benchmark.py's random 2-layer BERT (seeded) as a local model directory"""
+    pytest.importorskip("transformers")
+    from benchmark import build_tiny_model
+
+    def save(seed: int = 0) -> str:
+        directory = tmp_path_factory.mktemp(f"tiny-{seed}")
+        model, tokenizer = build_tiny_model(seed)
+        model.save_pretrained(directory)
+        tokenizer.save_pretrained(directory)
+        return str(directory)
+
+    return save
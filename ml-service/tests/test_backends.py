@@ -0,0 +1,62 @@
+"""Cached ONNX and TorchScript artifacts follow the model they were built from"""
+
+import os
+
+import numpy as np
+import pytest
+
+torch = pytest.importorskip("torch")
+
+from model_loader import create_backend  # noqa: E402
+
+
+def logits_for(backend, tokenizer, texts=("verify your account now", "see you tomorrow")):
+    inputs = tokenizer(list(texts), padding=True, return_tensors="pt")
+    return backend.logits(dict(inputs))
+
+
+@pytest.fixture(scope="module")
+def models(tiny_model_dir):
+    return tiny_model_dir(0), tiny_model_dir(1)
+
+
+def test_onnx_export_is_rebuilt_for_another_model(models, tmp_path):
+    pytest.importorskip("onnxruntime")
+    path = str(tmp_path / "cache" / "model.onnx")
+    first, second = models
+
+    create_backend("onnx", first, onnx_path=path, model_version="first")
+    exported_at = os.path.getmtime(path)
+    create_backend("onnx", first, onnx_path=path, model_version="first")
+    assert os.path.getmtime(path) == exported_at
+
+    backend, _, tokenizer = create_backend("onnx", second, onnx_path=path, model_version="second")
+    expected, _, _ = create_backend("eager", second)
+    np.testing.assert_allclose(logits_for(backend, tokenizer), logits_for(expected, tokenizer), atol=1e-4)
+
+
+def test_onnx_export_without_sidecar_is_not_trusted(models, tmp_path):
+    pytest.importorskip("onnxruntime")
+    path = tmp_path / "model.onnx"
+    path.write_bytes(b"not a model")
+
+    backend, _, tokenizer = create_backend("onnx", models[0], onnx_path=str(path), model_version="first")
+    assert logits_for(backend, tokenizer).shape == (2, 3)
+    assert (tmp_path / "model.onnx.json").exists()
+
+
+def test_torchscript_trace_is_rebuilt_when_quantization_changes(models, tmp_path):
+    path = str(tmp_path / "model.torchscript.pt")
+    backend, _, tokenizer = create_backend("torchscript", models[0], torchscript_path=path, model_version="first")
+    fp32 = logits_for(backend, tokenizer)
+
+    backend, _, _ = create_backend("torchscript", models[0], "dynamic", torchscript_path=path,
+                                   model_version="first-int8")
+    expected, _, _ = create_backend("eager", models[0], "dynamic")
+    np.testing.assert_allclose(logits_for(backend, tokenizer), logits_for(expected, tokenizer), atol=1e-4)
+    assert not np.allclose(logits_for(backend, tokenizer), fp32, atol=1e-7)
+
+
+def test_onnx_backend_needs_a_path(models):
+    with pytest.raises(ValueError):
+        create_backend("onnx", models[0])
@@ -0,0 +1,160 @@
+"""Micro-batcher: batches flush on size or deadline and results reach their callers"""
+
+import asyncio
+import time
+
+import pytest
+
+from batching import MicroBatcher
+from executor import InferenceExecutor, InferenceOverloaded
+
+
+class RecordingModel:
+    """predict_batch stand-in that remembers every batch it was given"""
+
+    def __init__(self, delay: float = 0.0, error: Exception = None):
+        self.batches = []
+        self.delay = delay
+        self.error = error
+
+    def __call__(self, texts):
+        self.batches.append(list(texts))
+        if self.delay:
+            time.sleep(self.delay)
+        if self.error:
+            raise self.error
+        return [{"text": text} for text in texts]
+
+
+async def with_batcher(model, body, **options):
+    batcher = MicroBatcher(model, **options)
+    await batcher.start()
+    try:
+        return await body(batcher)
+    finally:
+        await batcher.stop()
+
+
+def test_full_batch_flushes_without_waiting_for_the_deadline():
+    model = RecordingModel()
+
+    async def body(batcher):
+        started = time.perf_counter()
+        results = await asyncio.gather(*(batcher.submit(f"t{i}") for i in range(4)))
+        return results, time.perf_counter() - started
+
+    results, elapsed = asyncio.run(with_batcher(model, body, max_batch_size=4, max_wait_ms=5000))
+    assert [result["text"] for result in results] == ["t0", "t1", "t2", "t3"]
+    assert model.batches == [["t0", "t1", "t2", "t3"]]
+    assert elapsed < 1.0
+
+
+def test_partial_batch_flushes_at_the_deadline():
+    model = RecordingModel()
+
+    async def body(batcher):
+        started = time.perf_counter()
+        results = await asyncio.gather(batcher.submit("a"), batcher.submit("b"))
+        return results, time.perf_counter() - started
+
+    results, elapsed = asyncio.run(with_batcher(model, body, max_batch_size=16, max_wait_ms=50))
+    assert [result["text"] for result in results] == ["a", "b"]
+    assert model.batches == [["a", "b"]]
+    assert 0.04 <= elapsed < 1.0
+
+
+def test_overflow_goes_to_the_next_batch():
+    model = RecordingModel()
+
+    async def body(batcher):
+        return await asyncio.gather(*(batcher.submit(str(i)) for i in range(5)))
+
+    results = asyncio.run(with_batcher(model, body, max_batch_size=2, max_wait_ms=10))
+    assert [result["text"] for result in results] == ["0", "1", "2", "3", "4"]
+    assert [len(batch) for batch in model.batches] == [2, 2, 1]
+
+
+def test_batch_error_fails_every_caller_in_it():
+    model = RecordingModel(error=ValueError("model broke"))
+
+    async def body(batcher):
+        return await asyncio.gather(batcher.submit("a"), batcher.submit("b"), return_exceptions=True)
+
+    results = asyncio.run(with_batcher(model, body, max_batch_size=2, max_wait_ms=10))
+    assert all(isinstance(result, ValueError) for result in results)
+
+
+def test_cancelled_callers_are_dropped_from_the_batch():
+    model = RecordingModel()
+
+    async def body(batcher):
+        abandoned = asyncio.ensure_future(batcher.submit("gone"))
+        await asyncio.sleep(0)
+        abandoned.cancel()
+        return await batcher.submit("kept")
+
+    result = asyncio.run(with_batcher(model, body, max_batch_size=4, max_wait_ms=20))
+    assert result == {"text": "kept"}
+    assert model.batches == [["kept"]]
+
+
+def test_full_queue_is_rejected():
+    model = RecordingModel(delay=0.2)
+    executor = InferenceExecutor(max_workers=1)
+
+    async def body(batcher):
+        first = asyncio.ensure_future(batcher.submit("running"))
+        await asyncio.sleep(0.05)
+        queued = asyncio.ensure_future(batcher.submit("queued"))
+        await asyncio.sleep(0)
+        with pytest.raises(InferenceOverloaded):
+            await batcher.submit("rejected")
+        return await asyncio.gather(first, queued)
+
+    try:
+        results = asyncio.run(with_batcher(model, body, max_batch_size=1, max_wait_ms=0,
+                                           executor=executor, max_queue_size=1))
+    finally:
+        executor.shutdown()
+    assert [result["text"] for result in results] == ["running", "queued"]
+
+
+def test_stop_fails_running_and_queued_requests():
+    model = RecordingModel(delay=0.2)
+    executor = InferenceExecutor(max_workers=1)
+
+    async def run():
+        batcher = MicroBatcher(model, max_batch_size=1, max_wait_ms=0, executor=executor)
+        await batcher.start()
+        running = asyncio.ensure_future(batcher.submit("running"))
+        await asyncio.sleep(0.05)
+        waiting = asyncio.ensure_future(batcher.submit("waiting"))
+        await asyncio.sleep(0)
+        await batcher.stop()
+        return await asyncio.gather(running, waiting, return_exceptions=True)
+
+    try:
+        running, waiting = asyncio.run(run())
+    finally:
+        executor.shutdown()
+    assert isinstance(running, RuntimeError) and isinstance(waiting, RuntimeError)
+
+
+def test_submit_before_start_fails():
+    async def run():
+        await MicroBatcher(RecordingModel()).submit("text")
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(run())
+
+
+def test_stats_count_batch_sizes():
+    model = RecordingModel()
+
+    async def body(batcher):
+        await asyncio.gather(*(batcher.submit(str(i)) for i in range(3)))
+        return batcher.stats()
+
+    stats = asyncio.run(with_batcher(model, body, max_batch_size=2, max_wait_ms=10))
+    assert stats["batches"] == 2 and stats["requests"] == 3
+    assert stats["batch_size_counts"] == {"1": 1, "2": 1}
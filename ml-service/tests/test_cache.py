@@ -0,0 +1,151 @@
+"""Result cache: TTL, LRU eviction, request coalescing and snapshots"""
+
+import asyncio
+
+import pytest
+
+import cache
+from cache import PredictionCache
+
+
+class Clock:
+    """Stand-in for time.time that only moves when told to"""
+
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(cache.time, "time", clock)
+    return clock
+
+
+def test_entries_expire_after_the_ttl(clock):
+    results = PredictionCache(ttl_seconds=10)
+    results.put("key", {"label": "HIGH"})
+
+    clock.now += 9.9
+    assert results.get("key") == {"label": "HIGH"}
+    clock.now += 0.1
+    assert results.get("key") is None
+    assert results.stats()["expirations"] == 1 and results.stats()["entries"] == 0
+
+
+def test_least_recently_used_entry_is_evicted():
+    results = PredictionCache(max_entries=2)
+    results.put("a", {"n": 1})
+    results.put("b", {"n": 2})
+    results.get("a")
+    results.put("c", {"n": 3})
+
+    assert results.get("b") is None
+    assert results.get("a") == {"n": 1} and results.get("c") == {"n": 3}
+    assert results.stats()["evictions"] == 1
+
+
+def test_keys_depend_on_model_version_and_text():
+    key = PredictionCache.make_key("hello", "v1")
+    assert key == PredictionCache.make_key("hello", "v1")
+    assert key != PredictionCache.make_key("hello", "v2")
+    assert key != PredictionCache.make_key("hello ", "v1")
+    assert "hello" not in key
+
+
+def test_concurrent_misses_share_one_computation():
+    results = PredictionCache()
+    calls = []
+
+    async def compute(text):
+        calls.append(text)
+        await asyncio.sleep(0.05)
+        return {"text": text}
+
+    async def run():
+        return await asyncio.gather(*(results.get_or_compute("same", "v1", compute) for _ in range(5)))
+
+    values = asyncio.run(run())
+    assert calls == ["same"]
+    assert values == [{"text": "same"}] * 5
+    stats = results.stats()
+    assert (stats["misses"], stats["coalesced"], stats["in_flight"]) == (1, 4, 0)
+
+
+def test_errors_reach_every_waiter_and_are_not_cached():
+    results = PredictionCache()
+    calls = []
+
+    async def failing(text):
+        calls.append(text)
+        await asyncio.sleep(0.05)
+        raise ValueError("model broke")
+
+    async def succeeding(text):
+        return {"text": text}
+
+    async def run():
+        failures = await asyncio.gather(
+            *(results.get_or_compute("text", "v1", failing) for _ in range(3)), return_exceptions=True
+        )
+        retried = await results.get_or_compute("text", "v1", succeeding)
+        return failures, retried
+
+    failures, retried = asyncio.run(run())
+    assert len(calls) == 1
+    assert all(isinstance(failure, ValueError) for failure in failures)
+    assert retried == {"text": "text"}
+    assert results.stats()["in_flight"] == 0
+
+
+def test_waiter_takes_over_when_the_computing_caller_is_cancelled():
+    results = PredictionCache()
+    calls = []
+
+    async def compute(text):
+        calls.append(text)
+        await asyncio.sleep(0.05)
+        return {"text": text, "call": len(calls)}
+
+    async def run():
+        first = asyncio.ensure_future(results.get_or_compute("text", "v1", compute))
+        await asyncio.sleep(0.01)
+        second = asyncio.ensure_future(results.get_or_compute("text", "v1", compute))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        return await second
+
+    assert asyncio.run(run()) == {"text": "text", "call": 2}
+
+
+def test_lookup_many_counts_hits_and_misses():
+    results = PredictionCache()
+    results.put(PredictionCache.make_key("known", "v1"), {"label": "LOW"})
+
+    values, keys = results.lookup_many(["known", "unknown"], "v1")
+    assert values == [{"label": "LOW"}, None]
+    assert keys[1] == PredictionCache.make_key("unknown", "v1")
+    assert (results.hits, results.misses) == (1, 1)
+
+
+def test_snapshot_round_trip_skips_expired_entries(clock, tmp_path):
+    path = str(tmp_path / "cache.json")
+    results = PredictionCache(ttl_seconds=10)
+    results.put("old", {"n": 1})
+    clock.now += 5
+    results.put("new", {"n": 2})
+    results.save(path)
+
+    clock.now += 6
+    restored = PredictionCache(ttl_seconds=10)
+    assert restored.load(path) == 1
+    assert restored.get("new") == {"n": 2} and restored.get("old") is None
+
+
+def test_unreadable_snapshot_is_ignored(tmp_path):
+    path = tmp_path / "cache.json"
+    path.write_text("{not json")
+    assert PredictionCache().load(str(path)) == 0
@@ -0,0 +1,110 @@
+"""Campaign index: near duplicates share a verdict, per model version, within bounds"""
+
+import numpy as np
+import pytest
+
+import campaigns
+from campaigns import CampaignIndex, normalize
+
+TEMPLATE = (
+    "Dear {name}, your bank account has been suspended due to suspicious activity. "
+    "Verify your identity within 24 hours at {link} or pay a ${amount} reactivation fee."
+)
+HIGH = {"label": "HIGH", "risk_score": 0.93}
+
+
+def variant(name="Alice", link="http://secure-bank.xyz/a1", amount="49.99"):
+    return TEMPLATE.format(name=name, link=link, amount=amount)
+
+
+def score(index, text, model_version="v1", result=HIGH):
+    """Look a text up and, on a miss, record it as the model would"""
+    found, signature = index.lookup(text, model_version)
+    if found is None:
+        index.add(signature, result, model_version)
+    return found
+
+
+def test_normalize_masks_links_and_digits():
+    assert normalize("Pay  $120 at WWW.Evil.com/x NOW") == "pay $0 at <url> now"
+
+
+def test_near_duplicate_reuses_the_verdict():
+    index = CampaignIndex()
+    assert score(index, variant()) is None
+    assert score(index, variant("Bob", "https://other.io/zz", "1200")) == HIGH
+    assert index.stats()["hits"] == 1
+
+
+def test_unrelated_text_misses():
+    index = CampaignIndex()
+    score(index, variant())
+    assert score(index, "Running 10 minutes late, save me a seat at the cafe please") is None
+
+
+def test_clusters_are_keyed_by_model_version():
+    index = CampaignIndex()
+    score(index, variant(), model_version="v1")
+    found, _ = index.lookup(variant("Bob"), "v2")
+    assert found is None
+    found, _ = index.lookup(variant("Bob"), "v1")
+    assert found == HIGH
+
+
+def test_only_tracked_labels_start_clusters():
+    index = CampaignIndex()
+    score(index, variant(), result={"label": "LOW", "risk_score": 0.1})
+    assert index.stats()["clusters"] == 0
+
+
+def test_idle_clusters_expire(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(campaigns.time, "time", lambda: now[0])
+    index = CampaignIndex(ttl_seconds=60)
+    score(index, variant())
+
+    now[0] += 59
+    assert score(index, variant("Bob")) == HIGH
+    now[0] += 61
+    assert index.lookup(variant("Carol"), "v1")[0] is None
+    assert index.stats()["expirations"] == 1
+
+
+def test_least_recently_matched_cluster_is_evicted():
+    index = CampaignIndex(max_clusters=2)
+    first = variant()
+    second = "You have won a prize! Claim your reward now by sending your credit card details to us"
+    third = "Your package is held at customs; pay the release fee today or it will be returned to sender"
+    for text in (first, second):
+        score(index, text)
+    score(index, first)  # touches the first cluster
+    score(index, third)
+
+    assert index.stats()["evictions"] == 1
+    assert index.lookup(second, "v1")[0] is None
+    assert index.lookup(first, "v1")[0] == HIGH
+
+
+def test_precomputed_signature_matches_lookup():
+    index = CampaignIndex()
+    text = variant()
+    _, signature = index.lookup(text, "v1")
+    np.testing.assert_array_equal(signature, index.signature(text))
+    assert index.lookup(text, "v1", signature)[1] is signature
+
+
+def test_chunked_signature_equals_the_full_matrix_minimum(monkeypatch):
+    index = CampaignIndex()
+    text = " ".join(variant(name=f"user{i}") for i in range(40))
+    hashes = campaigns.shingle_hashes(normalize(text))
+    full = (((index._a * hashes[None, :] + index._b) % campaigns._MERSENNE_PRIME) & campaigns._MAX_HASH).min(axis=1)
+
+    monkeypatch.setattr(campaigns, "SIGNATURE_CHUNK", 7)
+    np.testing.assert_array_equal(index.signature(text), full.astype(np.uint32))
+
+
+def test_invalid_settings_are_rejected():
+    with pytest.raises(ValueError):
+        CampaignIndex(num_perm=64, bands=10)
+    with pytest.raises(ValueError):
+        CampaignIndex(threshold=0)
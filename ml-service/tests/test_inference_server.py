@@ -0,0 +1,153 @@
+"""Inference server and client talking over shared memory in one process"""
+
+import asyncio
+import os
+import threading
+import uuid
+
+import numpy as np
+import pytest
+
+from executor import InferenceOverloaded
+from inference_server import (
+    SEQUENCE_MASK,
+    InferenceClient,
+    InferenceServer,
+    RequestTooLarge,
+    decode_request,
+    encode_request,
+    encode_response,
+    fifo_path,
+)
+
+LABELS = ["LOW", "MEDIUM", "HIGH"]
+
+
+def fake_predict_batch(texts):
+    """Probabilities derived from the text, so answers can be told apart"""
+    return [
+        {"probabilities": {"LOW": len(text) / 1000, "MEDIUM": 0.0, "HIGH": 1 - len(text) / 1000}}
+        for text in texts
+    ]
+
+
+@pytest.fixture
+def server():
+    server = InferenceServer(f"fs-test-{uuid.uuid4().hex[:8]}", slots=1, request_ring_bytes=4096,
+                             response_ring_bytes=4096, max_wait_ms=1)
+    server.threads = []
+    yield server
+    server.stopping.set()
+    for thread in server.threads:
+        thread.join()
+    server.close()
+
+
+def serve_in_background(server, predict_batch=fake_predict_batch):
+    thread = threading.Thread(target=server.serve, args=(predict_batch, LABELS), daemon=True)
+    thread.start()
+    server.threads.append(thread)
+
+
+def test_requests_are_answered_in_order_of_their_texts(server):
+    serve_in_background(server)
+
+    async def run():
+        client = InferenceClient(server.name, len(LABELS))
+        client.connect()
+        try:
+            return await client.predict(["a", "bb", "ccc"])
+        finally:
+            client.disconnect("done")
+
+    probabilities = asyncio.run(run())
+    assert probabilities[:, 0].tolist() == [0.001, 0.002, 0.003]
+
+
+def test_request_bigger_than_the_ring_is_rejected_as_too_large(server):
+    async def run():
+        client = InferenceClient(server.name, len(LABELS))
+        client.connect()
+        try:
+            with pytest.raises(RequestTooLarge):
+                await client.predict(["x" * 5000])
+            assert client.stats()["rejected"] == 0
+        finally:
+            client.disconnect("done")
+
+    asyncio.run(run())
+
+
+def test_stale_requests_left_in_a_slot_do_not_answer_the_next_owner(server):
+    async def run():
+        first = InferenceClient(server.name, len(LABELS))
+        first.connect()
+        first._requests.put(encode_request(first._connection_tag, ["stale request"]))
+        first.disconnect("crashed")
+
+        second = InferenceClient(server.name, len(LABELS))
+        second.connect()
+        try:
+            serve_in_background(server)
+            probabilities = await second.predict(["fresh"])
+            await asyncio.sleep(0.05)
+            return probabilities, second.stats()
+        finally:
+            second.disconnect("done")
+
+    probabilities, stats = asyncio.run(run())
+    assert probabilities[0, 0] == pytest.approx(len("fresh") / 1000)
+    assert stats["orphaned_responses"] == 1
+
+
+def test_connections_tag_their_request_ids(server):
+    async def run():
+        tags = []
+        for _ in range(3):
+            client = InferenceClient(server.name, len(LABELS))
+            client.connect()
+            tags.append(client._connection_tag)
+            client.disconnect("done")
+        return tags
+
+    tags = asyncio.run(run())
+    assert all(tag & SEQUENCE_MASK == 0 for tag in tags)
+    assert len(set(tags)) == 3
+
+
+def test_unanswered_request_times_out(server):
+    async def run():
+        client = InferenceClient(server.name, len(LABELS), timeout=0.2)
+        client.connect()
+        try:
+            # No server loop is running, as if it had dropped the response
+            with pytest.raises(InferenceOverloaded):
+                await client.predict(["hello"])
+            return client.stats()
+        finally:
+            client.disconnect("done")
+
+    stats = asyncio.run(run())
+    assert stats["timed_out"] == 1 and stats["pending"] == 0
+
+
+def test_dropped_response_is_counted(server):
+    response = encode_response(1, np.zeros((100, len(LABELS))))
+    while server.responses[0].put(response):
+        pass
+    server.respond(0, response)
+    assert server.dropped == 1
+
+
+def test_request_encoding_round_trips():
+    texts = ["", "plain", "ünïcödé ✅", "x" * 300]
+    assert decode_request(encode_request(2 ** 63 + 5, texts)) == (2 ** 63 + 5, texts)
+
+
+def test_fifos_are_removed_on_close():
+    server = InferenceServer(f"fs-test-{uuid.uuid4().hex[:8]}", slots=2, request_ring_bytes=1024,
+                             response_ring_bytes=1024)
+    paths = [fifo_path(server.name), fifo_path(server.name, 0), fifo_path(server.name, 1)]
+    assert all(os.path.exists(path) for path in paths)
+    server.close()
+    assert not any(os.path.exists(path) for path in paths)
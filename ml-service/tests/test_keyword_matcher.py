@@ -0,0 +1,60 @@
+"""Keyword matching: canonical keywords, exact spans and baseline scoring"""
+
+from keyword_matcher import KeywordMatcher
+from main_simple import FRAUD_KEYWORDS, keyword_matcher, predict_fraud_simple, predict_fraud_simple_batch
+
+# 'İ' lowercases to two characters, which switches scan() to case-insensitive
+# matching; 'ſ' (long s) matches 's' there but doesn't lowercase to it
+LENGTH_CHANGING_TEXT = "İ ſcam alert: verify your paſſword"
+
+
+def baseline_fraud_count(text: str) -> int:
+    """Distinct keywords found as substrings, as the original scorer counted them"""
+    text_lower = text.lower()
+    return sum(1 for keyword in FRAUD_KEYWORDS if keyword in text_lower)
+
+
+def test_fold_equivalent_match_reports_canonical_keyword():
+    matches, _ = keyword_matcher.scan(LENGTH_CHANGING_TEXT)
+    keywords = {keyword for keyword, _, _ in matches}
+    assert {"scam", "password"} <= keywords
+    assert keywords <= set(keyword_matcher.index)
+
+
+def test_spans_stay_on_original_text():
+    matcher = KeywordMatcher(["scam"])
+    matches, _ = matcher.scan(LENGTH_CHANGING_TEXT)
+    assert matches == [("scam", 2, 6)]
+    assert LENGTH_CHANGING_TEXT[2:6] == "ſcam"
+
+
+def test_batch_and_single_scoring_agree():
+    texts = [LENGTH_CHANGING_TEXT, "İ ſcam", "Hello, see you tomorrow"]
+    batch = predict_fraud_simple_batch(texts)
+    for text, result in zip(texts, batch):
+        single = predict_fraud_simple(text)
+        assert result["label"] == single["label"]
+        assert abs(result["risk_score"] - single["risk_score"]) < 1e-9
+
+
+def test_keywords_match_inside_words_by_default():
+    matches, _ = KeywordMatcher(["account", "scam"]).scan("Accountant accounts scammer")
+    assert [keyword for keyword, _, _ in matches] == ["account", "account", "scam"]
+
+
+def test_word_boundary_is_opt_in():
+    matcher = KeywordMatcher(["account", "scam"], word_boundary=True)
+    matches, _ = matcher.scan("Accountant accounts scammer; account scam")
+    assert [(keyword, start) for keyword, start, _ in matches] == [("account", 29), ("scam", 37)]
+
+
+def test_default_scoring_matches_baseline_substring_counts():
+    texts = [
+        "Your accounts were verified by a scammer",
+        "Unlocking the prizes: login with your passwords now",
+        "Please verify identity at the bank account page, urgent",
+    ]
+    for text, result in zip(texts, predict_fraud_simple_batch(texts)):
+        fraud_count = baseline_fraud_count(text)
+        assert fraud_count >= 1
+        assert len({match["keyword"] for match in result["matches"]}) == fraud_count
@@ -0,0 +1,101 @@
+"""Model registry and hot swap: the previous model is freed only once idle"""
+
+import asyncio
+
+import pytest
+
+import main
+from registry import ModelRegistry, UnknownModelVersion
+
+
+def make_version(root, name):
+    directory = root / name
+    directory.mkdir()
+    (directory / "config.json").write_text("{}")
+    return directory
+
+
+class FakeBackend:
+    name = "fake"
+
+
+def fake_model(version):
+    return main.LoadedModel(version, FakeBackend(), tokenizer=object())
+
+
+@pytest.fixture
+def registry(tmp_path, monkeypatch):
+    for name in ("v1", "v2"):
+        make_version(tmp_path, name)
+    registry = ModelRegistry(str(tmp_path))
+    monkeypatch.setattr(main, "model_registry", registry)
+    monkeypatch.setattr(main, "QUANTIZATION", "")
+    monkeypatch.setattr(main, "active_model", None)
+    monkeypatch.setattr(main, "MODEL_VERSION", main.MODEL_VERSION)
+    monkeypatch.setattr(main, "model_swap", {})
+    monkeypatch.setattr(main, "load_registry_version", lambda name, version: fake_model(version))
+    return registry
+
+
+def test_registry_rejects_invalid_and_missing_versions(registry, tmp_path):
+    assert registry.path("v1") == str(tmp_path / "v1")
+    for name in ("../v1", "", "v3", ".hidden"):
+        with pytest.raises(UnknownModelVersion):
+            registry.path(name)
+
+
+def test_current_round_trips_and_must_exist(registry):
+    assert registry.current() is None
+    registry.set_current("v2")
+    assert registry.current() == "v2"
+    with pytest.raises(UnknownModelVersion):
+        registry.set_current("v3")
+    assert registry.current() == "v2"
+    assert sorted(version["version"] for version in registry.versions()) == ["v1", "v2"]
+
+
+def test_swap_waits_for_in_flight_calls_before_freeing_the_old_model(registry):
+    previous = fake_model("v1")
+    main.activate_model(previous)
+
+    async def run():
+        pinned = main.acquire_model()
+        swap = asyncio.create_task(main.swap_model("v2"))
+        await asyncio.sleep(0.2)
+        during = dict(main.model_swap), previous.backend is not None, main.active_model.version
+        pinned.release()
+        await asyncio.wait_for(swap, 5)
+        return during
+
+    swap_state, still_loaded, active_version = asyncio.run(run())
+    assert swap_state["state"] == "draining" and still_loaded
+    assert active_version == "v2"
+    assert main.model_swap["state"] == "done"
+    assert previous.backend is None and previous.in_flight == 0
+    assert main.active_model.version == "v2" and main.MODEL_VERSION == "v2"
+    assert registry.current() == "v2"
+
+
+def test_calls_started_after_activation_use_the_new_model(registry):
+    main.activate_model(fake_model("v1"))
+    previous = main.activate_model(fake_model("v2"))
+    pinned = main.acquire_model()
+    try:
+        assert pinned.version == "v2" and previous.in_flight == 0
+    finally:
+        pinned.release()
+
+
+def test_failed_load_keeps_serving_the_current_model(registry, monkeypatch):
+    current = fake_model("v1")
+    main.activate_model(current)
+
+    def broken(name, version):
+        raise RuntimeError("weights missing")
+
+    monkeypatch.setattr(main, "load_registry_version", broken)
+    asyncio.run(main.swap_model("v2"))
+
+    assert main.model_swap["state"] == "failed" and "weights missing" in main.model_swap["error"]
+    assert main.active_model is current and current.backend is not None
+    assert registry.current() is None
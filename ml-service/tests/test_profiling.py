@@ -0,0 +1,83 @@
+"""Profile captures while several inference workers are busy"""
+
+import asyncio
+import json
+import subprocess
+import sys
+import textwrap
+from pathlib import Path
+
+import pytest
+
+from profiling import ProfilerBusy, capture
+
+SERVICE_DIR = Path(__file__).resolve().parent.parent
+
+# Runs in a child process: overlapping torch profiler sessions segfault, which
+# would otherwise take the whole test run down
+TORCH_CAPTURE_SCRIPT = textwrap.dedent("""
+    import asyncio, json, sys
+
+    import torch
+
+    import profiling
+    from executor import InferenceExecutor
+
+    model = torch.nn.Sequential(torch.nn.Linear(64, 64), torch.nn.ReLU(), torch.nn.Linear(64, 3))
+    inputs = torch.randn(16, 64)
+
+    def model_call():
+        with profiling.model_call(), torch.no_grad():
+            return model(inputs)
+
+    # The first profiler session in a process is slow to start; keep that out of the capture
+    with torch.profiler.profile():
+        model_call()
+
+    async def main():
+        executor = InferenceExecutor(max_workers=3)
+        stop = False
+
+        async def client():
+            while not stop:
+                await executor.run(model_call)
+
+        clients = [asyncio.create_task(client()) for _ in range(6)]
+        data, _, _ = await profiling.capture("torch", 1.0)
+        stop = True
+        await asyncio.gather(*clients)
+        executor.shutdown()
+        print(json.dumps({"events": len(json.loads(data)["traceEvents"])}))
+
+    asyncio.run(main())
+""")
+
+
+def test_torch_capture_with_several_workers():
+    pytest.importorskip("torch")
+    result = subprocess.run(
+        [sys.executable, "-c", TORCH_CAPTURE_SCRIPT],
+        cwd=SERVICE_DIR, capture_output=True, text=True, timeout=120,
+    )
+    assert result.returncode == 0, result.stderr[-2000:]
+    assert json.loads(result.stdout.strip().splitlines()[-1])["events"] > 0
+
+
+def test_cpu_capture_returns_collapsed_stacks():
+    async def run():
+        return await capture("cpu", 0.2)
+
+    data, filename, media_type = asyncio.run(run())
+    assert filename == "profile.collapsed" and media_type == "text/plain"
+    assert all(line.rsplit(" ", 1)[1].isdigit() for line in data.decode().splitlines() if line)
+
+
+def test_only_one_capture_at_a_time():
+    async def run():
+        first = asyncio.create_task(capture("cpu", 0.3))
+        await asyncio.sleep(0.05)
+        with pytest.raises(ProfilerBusy):
+            await capture("cpu", 0.1)
+        await first
+
+    asyncio.run(run())
@@ -0,0 +1,38 @@
+"""Offline re-scoring records which model produced each row"""
+
+import pytest
+
+import main
+import score_offline
+
+
+@pytest.fixture
+def service(monkeypatch):
+    """main with its model settings restored afterwards and loading stubbed out"""
+    for name in ("MODEL_SOURCE", "MODEL_PATH", "MODEL_VERSION", "REGISTRY_VERSION", "QUANTIZATION"):
+        monkeypatch.setattr(main, name, getattr(main, name))
+    monkeypatch.setattr(main, "load_model", lambda: None)
+    monkeypatch.setattr("executor.configure_torch_threads", lambda *args: 1)
+    return main
+
+
+def test_model_directory_sets_version_and_local_loading(service, tmp_path):
+    model_dir = tmp_path / "fraud-v7"
+    model_dir.mkdir()
+    service.QUANTIZATION = "dynamic"
+
+    score_offline.init_worker(f"{model_dir}/", 1, 1)
+
+    assert service.MODEL_SOURCE == f"{model_dir}/"
+    assert service.MODEL_PATH == f"{model_dir}/"
+    assert service.MODEL_VERSION == "fraud-v7-int8"
+    assert service.REGISTRY_VERSION is None
+
+
+def test_hub_model_name_is_not_loaded_as_local_files(service):
+    service.QUANTIZATION = ""
+
+    score_offline.init_worker("prajjwal1/bert-tiny", 1, 1)
+
+    assert service.MODEL_PATH == ""
+    assert service.MODEL_VERSION == "bert-tiny"
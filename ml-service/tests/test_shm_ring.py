@@ -0,0 +1,86 @@
+"""Shared-memory ring: record framing, wrap-around and full-ring handling"""
+
+import uuid
+
+import pytest
+
+from shm_ring import LENGTH_BYTES, ShmRing
+
+
+@pytest.fixture
+def ring_pair():
+    """A ring and a second handle attached to it, as producer and consumer processes would have"""
+    name = f"fs-test-ring-{uuid.uuid4().hex[:8]}"
+    owner = ShmRing.create(name, 64)
+    consumer = ShmRing.attach(name)
+    yield owner, consumer
+    consumer.close()
+    owner.close()
+
+
+def test_records_come_out_in_order(ring_pair):
+    producer, consumer = ring_pair
+    for record in (b"one", b"", b"three"):
+        assert producer.put(record)
+    assert [consumer.get(), consumer.get(), consumer.get(), consumer.get()] == [b"one", b"", b"three", None]
+
+
+def test_records_wrap_around_the_end_of_the_buffer(ring_pair):
+    producer, consumer = ring_pair
+    # 7 records of 20 bytes (length prefix included) cross the 64-byte end twice
+    for i in range(7):
+        record = bytes([i]) * (20 - LENGTH_BYTES)
+        assert producer.put(record)
+        assert consumer.get() == record
+    assert consumer.used() == 0
+
+
+def test_length_prefix_can_wrap_too(ring_pair):
+    producer, consumer = ring_pair
+    assert producer.put(b"x" * (62 - LENGTH_BYTES))
+    assert consumer.get() == b"x" * (62 - LENGTH_BYTES)
+    # The next length prefix starts 2 bytes before the end of the buffer
+    assert producer.put(b"wrapped")
+    assert consumer.get() == b"wrapped"
+
+
+def test_full_ring_rejects_records_until_space_is_freed(ring_pair):
+    producer, consumer = ring_pair
+    record = b"r" * (16 - LENGTH_BYTES)
+    for _ in range(4):
+        assert producer.put(record)
+    assert not producer.put(b"")
+    assert consumer.get() == record
+    assert producer.put(record)
+    assert producer.used() == 64
+
+
+def test_fits_reports_records_that_can_never_be_stored(ring_pair):
+    producer, _ = ring_pair
+    assert producer.fits(b"x" * (64 - LENGTH_BYTES))
+    assert not producer.fits(b"x" * (65 - LENGTH_BYTES))
+    assert not producer.put(b"x" * (65 - LENGTH_BYTES))
+
+
+def test_discard_drops_queued_records(ring_pair):
+    producer, consumer = ring_pair
+    producer.put(b"stale")
+    producer.put(b"stale too")
+    consumer.discard()
+    assert consumer.get() is None
+    producer.put(b"fresh")
+    assert consumer.get() == b"fresh"
+
+
+def test_create_replaces_a_stale_segment():
+    name = f"fs-test-ring-{uuid.uuid4().hex[:8]}"
+    stale = ShmRing.create(name, 32)
+    stale.put(b"left over")
+    stale.owner = False  # as if its process had crashed without cleaning up
+    stale.close()
+
+    ring = ShmRing.create(name, 32)
+    try:
+        assert ring.get() is None and ring.capacity == 32
+    finally:
+        ring.close()
@@ -0,0 +1,86 @@
+"""Streaming NDJSON scoring: line splitting, per-line errors and chunked scoring"""
+
+import asyncio
+import json
+
+from streaming import LineTooLong, iter_lines, score_ndjson
+
+
+async def byte_chunks(*chunks):
+    for chunk in chunks:
+        yield chunk
+
+
+def collect(async_iterator):
+    async def run():
+        return [item async for item in async_iterator]
+
+    return asyncio.run(run())
+
+
+def score_stream(*chunks, chunk_size=64, max_line_bytes=1 << 20, score_texts=None):
+    calls = []
+
+    async def fake_score(texts):
+        calls.append(list(texts))
+        return [{"label": "HIGH" if "scam" in text else "LOW"} for text in texts]
+
+    output = collect(score_ndjson(byte_chunks(*chunks), score_texts or fake_score, chunk_size, max_line_bytes))
+    lines = [json.loads(line) for part in output for line in part.splitlines()]
+    return lines, calls
+
+
+def test_lines_split_across_chunks_are_joined():
+    lines = collect(iter_lines(byte_chunks(b'{"a"', b": 1}\n{", b'"b": 2}\n', b'{"c": 3}'), 100))
+    assert lines == [b'{"a": 1}', b'{"b": 2}', b'{"c": 3}']
+
+
+def test_overlong_line_is_replaced_and_the_rest_of_it_skipped():
+    lines = collect(iter_lines(byte_chunks(b"short\n", b"x" * 8, b"x" * 8, b"x\nafter\n"), 10))
+    assert lines[0] == b"short"
+    assert isinstance(lines[1], LineTooLong)
+    assert lines[2] == b"after"
+
+
+def test_each_line_gets_a_result_or_its_own_error():
+    lines, calls = score_stream(
+        b'{"text": "this is a scam", "id": "m1"}\n',
+        b"not json\n",
+        b'{"id": "no text"}\n',
+        b"\n",
+        b'{"text": "see you tomorrow"}\n',
+    )
+    assert calls == [["this is a scam", "see you tomorrow"]]
+    assert lines == [
+        {"line": 1, "id": "m1", "label": "HIGH"},
+        {"line": 2, "error": "Invalid JSON"},
+        {"line": 3, "error": 'Expected an object with a string "text" field'},
+        {"line": 5, "label": "LOW"},
+    ]
+
+
+def test_overlong_line_is_reported_without_stopping_the_stream():
+    lines, _ = score_stream(b'{"text": "' + b"x" * 50 + b'"}\n{"text": "ok"}\n', max_line_bytes=32)
+    assert lines == [{"line": 1, "error": "Line exceeds 32 bytes"}, {"line": 2, "label": "LOW"}]
+
+
+def test_records_are_scored_in_chunks_in_input_order():
+    records = b"".join(json.dumps({"text": f"text {i}", "id": i}).encode() + b"\n" for i in range(7))
+    lines, calls = score_stream(records, chunk_size=3)
+    assert [len(call) for call in calls] == [3, 3, 1]
+    assert [line["id"] for line in lines] == list(range(7))
+
+
+def test_scoring_failure_becomes_an_error_on_that_chunk_only():
+    async def flaky_score(texts):
+        if "bad" in texts:
+            raise RuntimeError("model broke")
+        return [{"label": "LOW"} for _ in texts]
+
+    records = b'{"text": "good"}\n{"text": "bad"}\n{"text": "good again"}\n'
+    lines, _ = score_stream(records, chunk_size=1, score_texts=flaky_score)
+    assert lines == [
+        {"line": 1, "label": "LOW"},
+        {"line": 2, "error": "model broke"},
+        {"line": 3, "label": "LOW"},
+    ]
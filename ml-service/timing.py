@@ -0,0 +1,61 @@
+"""Opt-in per-request stage timings, returned to the client as a Server-Timing header
+
+A request that asks for timings gets a RequestTiming bound in its context.
+Every stage that runs on its behalf adds its duration there, including the
+queue wait in the micro-batcher and the model call on the executor thread
+(the executor runs calls in a copy of the caller's context). A batched
+model call counts fully towards every request in the batch. Requests that
+don't ask pay for one context variable lookup per stage.
+"""
+
+import time
+from contextvars import ContextVar, Token
+from typing import Dict, Iterable, Optional, Tuple
+
+TIMING_HEADER = "X-Debug-Timing"
+
+_current: ContextVar[Tuple["RequestTiming", ...]] = ContextVar("request_timings", default=())
+
+
+class RequestTiming:
+    """Stage durations collected for one request"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stages: Dict[str, float] = {}
+
+    def add(self, stage: str, seconds: float):
+        self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+    def header_value(self) -> str:
+        """Server-Timing value: one entry per stage plus the total, in milliseconds"""
+        entries = [f"{stage};dur={seconds * 1000:.3f}" for stage, seconds in self.stages.items()]
+        entries.append(f"total;dur={(time.perf_counter() - self.started) * 1000:.3f}")
+        return ", ".join(entries)
+
+
+def requested(header_value: Optional[str]) -> bool:
+    """Whether an X-Debug-Timing value asks for timings (only "1" or "true")"""
+    return (header_value or "").strip().lower() in ("1", "true")
+
+
+def start() -> RequestTiming:
+    """Start collecting timings for the current request"""
+    request_timing = RequestTiming()
+    _current.set((request_timing,))
+    return request_timing
+
+
+def current() -> Tuple[RequestTiming, ...]:
+    """Timings bound in this context (empty unless a request asked for them)"""
+    return _current.get()
+
+
+def bind(timings: Iterable[RequestTiming]) -> Token:
+    """Attribute work in this context to several requests at once (e.g. one batch)"""
+    return _current.set(tuple(timings))
+
+
+def record(stage: str, seconds: float):
+    for request_timing in _current.get():
+        request_timing.add(stage, seconds)
@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+"""
+Train early-exit heads for the service's model and report layers vs accuracy
+
+Heads on intermediate encoder layers (see early_exit.py) learn to
+reproduce the full model's predictions on a corpus, so no labels are
+needed. Only the heads train: the model's [CLS] states are computed once
+and reused for every epoch.
+
+A held-out part of the corpus is then replayed at several entropy
+thresholds. For each threshold the report gives the average number of
+encoder layers executed, where texts exited, how often the early answer
+agrees with the full model and, when the corpus has labels, accuracy.
+Finally predict_fraud_batch is timed with and without early exit at
+--threshold.
+
+Corpus files are JSONL ({"text": ..., "label": ...}) or CSV with text and
+label columns, as for compare_quantization.py. Without one, synthetic
+messages from load_test.py are used.
+
+    python train_exit_heads.py --corpus messages.jsonl --output models/v3/exit_heads.pt
+"""
+
+import argparse
+import json
+import os
+import random
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from compare_quantization import load_corpus
+from load_test import MessageGenerator
+
+
+def load_model(service, model_source: Optional[str], tiny: bool):
+    from model_loader import build_model
+
+    if tiny:
+        from benchmark import build_tiny_model
+
+        return build_tiny_model()
+    source = model_source or service.MODEL_SOURCE
+    return build_model(source, local_files_only=os.path.isdir(source))
+
+
+def extract_features(service, model, tokenizer, texts: List[str], layers: List[int],
+                     batch_size: int) -> Tuple[Dict[int, "torch.Tensor"], "torch.Tensor"]:
+    """[CLS] states at each exit layer and the full model's logits, for every text"""
+    import torch
+    from early_exit import cls_states
+
+    states = {layer: [] for layer in layers}
+    logits = []
+    for start in range(0, len(texts), batch_size):
+        inputs = tokenizer(
+            [service.clip_text(text) for text in texts[start:start + batch_size]],
+            truncation=True,
+            max_length=service.MAX_TOKENS,
+            padding=True,
+            return_tensors="pt",
+        )
+        for layer, state in cls_states(model, inputs, layers).items():
+            states[layer].append(state)
+        with torch.no_grad():
+            logits.append(model(**inputs).logits)
+    return {layer: torch.cat(parts) for layer, parts in states.items()}, torch.cat(logits)
+
+
+def train_heads(heads, states: Dict[int, "torch.Tensor"], targets: "torch.Tensor", epochs: int, lr: float,
+                seed: int) -> List[float]:
+    """Fit every head to the full model's probabilities (soft cross-entropy); returns loss per epoch"""
+    import torch
+
+    torch.manual_seed(seed)
+    optimizer = torch.optim.Adam(heads.parameters(), lr=lr)
+    heads.train()
+    losses = []
+    for _ in range(epochs):
+        order = torch.randperm(len(targets))
+        total = 0.0
+        for start in range(0, len(order), 64):
+            rows = order[start:start + 64]
+            loss = sum(
+                -(targets[rows] * torch.log_softmax(heads(layer, states[layer][rows]), dim=-1)).sum(dim=-1).mean()
+                for layer in heads.layers
+            )
+            optimizer.zero_grad()
+            loss.backward()
+            optimizer.step()
+            total += loss.item() * len(rows)
+        losses.append(round(total / len(order) / len(heads.layers), 5))
+    heads.eval()
+    return losses
+
+
+def evaluate(heads, states: Dict[int, "torch.Tensor"], final_logits: "torch.Tensor", num_layers: int,
+             gold: List[Optional[int]], thresholds: List[float]) -> List[Dict[str, Any]]:
+    """Replay the exit rule at each threshold on held-out texts"""
+    import torch
+    from early_exit import simulate_exits
+
+    with torch.no_grad():
+        head_logits = {layer: heads(layer, states[layer]) for layer in heads.layers}
+    full_labels = final_logits.argmax(dim=-1)
+    labeled = [i for i, label in enumerate(gold) if label is not None]
+    gold_labels = torch.tensor([gold[i] for i in labeled], dtype=torch.long)
+
+    def accuracy(predicted):
+        return round(float((predicted[labeled] == gold_labels).float().mean()), 4) if labeled else None
+
+    rows = [{
+        "threshold": None,
+        "mean_layers": float(num_layers),
+        "layer_fraction": 1.0,
+        "exits_by_layer": {str(num_layers): len(full_labels)},
+        "agreement": 1.0,
+        "accuracy": accuracy(full_labels),
+    }]
+    for threshold in thresholds:
+        replay = simulate_exits(head_logits, final_logits, num_layers, threshold)
+        labels = replay["logits"].argmax(dim=-1)
+        exit_layers = replay["exit_layer"]
+        rows.append({
+            "threshold": threshold,
+            "mean_layers": round(float(exit_layers.float().mean()), 3),
+            "layer_fraction": round(float(exit_layers.float().mean()) / num_layers, 4),
+            "exits_by_layer": {
+                str(layer): int((exit_layers == layer).sum())
+                for layer in sorted(set(heads.layers) | {num_layers}) if layer <= num_layers
+            },
+            "agreement": round(float((labels == full_labels).float().mean()), 4),
+            "accuracy": accuracy(labels),
+        })
+    return rows
+
+
+def time_predictions(service, backend, tokenizer, model, texts: List[str], repeats: int) -> float:
+    """Milliseconds per message through predict_fraud_batch on ``backend``"""
+    service.activate_model(service.LoadedModel(backend.name, backend, tokenizer, model))
+    batches = [texts[i:i + service.BATCH_MAX_SIZE] for i in range(0, len(texts), service.BATCH_MAX_SIZE)]
+    service.predict_fraud_batch(batches[0])
+    start = time.perf_counter()
+    for _ in range(repeats):
+        for batch in batches:
+            service.predict_fraud_batch(batch)
+    return round((time.perf_counter() - start) * 1000 / (repeats * len(texts)), 3)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--corpus", help="JSONL or CSV file with text (and optionally label)")
+    parser.add_argument("--model", help="Model name or directory (default: MODEL_PATH or main.MODEL_NAME)")
+    parser.add_argument("--tiny", action="store_true", help="Use benchmark.py's random 2-layer BERT (no download)")
+    parser.add_argument("--synthetic", type=int, default=2000, help="Synthetic messages to use without --corpus")
+    parser.add_argument("--layers", help="Comma-separated exit layers (default: every other layer below the last)")
+    parser.add_argument("--epochs", type=int, default=10)
+    parser.add_argument("--lr", type=float, default=1e-3)
+    parser.add_argument("--batch-size", type=int, default=16, help="Texts per forward pass while extracting features")
+    parser.add_argument("--eval-fraction", type=float, default=0.2, help="Share of the corpus held out for the report")
+    parser.add_argument("--thresholds", default="0.05,0.1,0.2,0.3,0.5", help="Entropy thresholds to report")
+    parser.add_argument("--threshold", type=float, default=0.2, help="Threshold to time against the full model")
+    parser.add_argument("--repeats", type=int, default=2, help="Timed passes over the held-out texts")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="exit_heads.pt", help="Where to save the heads (ML_EARLY_EXIT_HEADS)")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    args = parser.parse_args()
+
+    import main as service
+    from backends import EagerBackend
+    from early_exit import EarlyExitBackend, ExitHeads, encoder_parts
+    from executor import configure_torch_threads
+
+    configure_torch_threads(service.INFERENCE_WORKERS, service.TORCH_THREADS)
+    if not args.json:
+        print(f"🚀 Loading {'tiny random' if args.tiny else 'configured'} model...")
+    model, tokenizer = load_model(service, args.model, args.tiny)
+    num_layers = len(encoder_parts(model)[1])
+    if args.layers:
+        layers = [int(layer) for layer in args.layers.split(",") if layer]
+    else:
+        layers = list(range(2, num_layers, 2)) or [1]
+    if any(layer < 1 or layer >= num_layers for layer in layers):
+        parser.error(f"Exit layers must be between 1 and {num_layers - 1}")
+
+    if args.corpus:
+        corpus = load_corpus(args.corpus)
+    else:
+        corpus = [(text, None) for text in MessageGenerator(seed=args.seed).messages(args.synthetic)]
+    corpus = list(dict(corpus).items())
+    random.Random(args.seed).shuffle(corpus)
+    held_out = max(1, int(len(corpus) * args.eval_fraction))
+    train, test = corpus[held_out:], corpus[:held_out]
+    if not train:
+        parser.error("Corpus too small to hold out an evaluation split")
+
+    if not args.json:
+        print(f"🧮 Extracting features for {len(corpus)} messages at layers {layers}...")
+    train_states, train_logits = extract_features(service, model, tokenizer, [t for t, _ in train], layers,
+                                                  args.batch_size)
+    test_states, test_logits = extract_features(service, model, tokenizer, [t for t, _ in test], layers,
+                                                args.batch_size)
+
+    import torch
+
+    heads = ExitHeads(layers, train_states[layers[0]].shape[-1], train_logits.shape[-1])
+    heads.init_from(model)
+    losses = train_heads(heads, train_states, torch.softmax(train_logits, dim=-1), args.epochs, args.lr, args.seed)
+    heads.save(args.output, model_source="tiny" if args.tiny else (args.model or service.MODEL_SOURCE),
+               trained_on=len(train), epochs=args.epochs)
+
+    gold = [service.LABELS.index(label) if label in service.LABELS else None for _, label in test]
+    thresholds = [float(t) for t in args.thresholds.split(",") if t]
+    rows = evaluate(heads, test_states, test_logits, num_layers, gold, thresholds)
+
+    test_texts = [text for text, _ in test]
+    full_ms = time_predictions(service, EagerBackend(model), tokenizer, model, test_texts, args.repeats)
+    early_backend = EarlyExitBackend(model, heads, args.threshold)
+    early_ms = time_predictions(service, early_backend, tokenizer, model, test_texts, args.repeats)
+
+    report = {
+        "messages": {"train": len(train), "held_out": len(test)},
+        "num_layers": num_layers,
+        "exit_layers": layers,
+        "train_loss": losses,
+        "thresholds": rows,
+        "timing": {
+            "threshold": args.threshold,
+            "full_ms_per_message": full_ms,
+            "early_exit_ms_per_message": early_ms,
+            "speedup": round(full_ms / early_ms, 2) if early_ms else None,
+            "mean_layers": round(early_backend.stats()["mean_layers"], 3),
+        },
+        "output": args.output,
+    }
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+
+    print(f"\n📊 Held-out messages: {len(test)} (trained on {len(train)}), {num_layers} encoder layers")
+    print("=" * 72)
+    print(f"  {'threshold':>9}  {'layers':>6}  {'of full':>7}  {'agreement':>9}  {'accuracy':>8}  exits by layer")
+    for row in rows:
+        threshold = "full" if row["threshold"] is None else f"{row['threshold']:.2f}"
+        accuracy = "-" if row["accuracy"] is None else f"{row['accuracy']:.2%}"
+        exits = " ".join(f"{layer}:{count}" for layer, count in row["exits_by_layer"].items())
+        print(f"  {threshold:>9}  {row['mean_layers']:>6.2f}  {row['layer_fraction']:>7.0%}  "
+              f"{row['agreement']:>9.2%}  {accuracy:>8}  {exits}")
+    timing = report["timing"]
+    print(f"\n⏱️  predict_fraud_batch: {timing['full_ms_per_message']:.3f}ms/message full, "
+          f"{timing['early_exit_ms_per_message']:.3f}ms/message with early exit at {timing['threshold']} "
+          f"({timing['speedup']}x, {timing['mean_layers']} layers on average)")
+    print(f"\n💾 Heads saved to {args.output} (set ML_EARLY_EXIT=true and ML_EARLY_EXIT_HEADS to use them)")
+
+
+if __name__ == "__main__":
+    main()